@@ -1,12 +1,14 @@
 import logging
 from fastapi import FastAPI
 from modules.mongodb_connector import MongoDBConnector
+from modules.response_cache import cached
 from config import MONGODB_AURORA_INFO_COLLECTION_NAME
 
 app = FastAPI()
 logging.basicConfig(level=logging.INFO)
 
 @app.get("/")
+@cached(MONGODB_AURORA_INFO_COLLECTION_NAME, ttl=300)
 async def get_all_aurora_cluster():
     logging.info("Connecting to MongoDB...")
     db = await MongoDBConnector.get_database()
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel, Field
 from typing import Optional
+from datetime import datetime, timezone
 from modules.crypto_utils import encrypt_password
 from modules.mongodb_connector import MongoDBConnector
 from config import MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME
@@ -19,6 +20,7 @@ class RDSInstance(BaseModel):
     user: str
     password: str
     db: Optional[str] = Field(default="information_schema")
+    slow_query_capture_mode: Optional[str] = Field(default=None, pattern="^(processlist|performance_schema)$")
 
 
 @app.get("/list_instances/")
@@ -43,8 +45,11 @@ async def add_instance(rds_instance: RDSInstance):
         "region": rds_instance.region or "ap-northeast-2",
         "user": rds_instance.user,
         "password": encrypted_password_base64,
-        "db": rds_instance.db
+        "db": rds_instance.db,
+        "updated_at": datetime.now(timezone.utc)
     }
+    if rds_instance.slow_query_capture_mode:
+        instance_data["slow_query_capture_mode"] = rds_instance.slow_query_capture_mode
 
     result = await collection.update_one(
         {"instance_name": rds_instance.instance_name},
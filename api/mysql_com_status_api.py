@@ -1,18 +1,21 @@
+from datetime import datetime, timedelta
 from modules.mongodb_connector import MongoDBConnector
+from modules.metric_store import get_metric_store
+from modules.response_cache import cached
 from fastapi import FastAPI, HTTPException, Query
-from config import MONGODB_STATUS_COLLECTION_NAME
+from typing import Optional
+import pytz
+from modules.downsampling import (
+    grafana_window, bucket_expression, downsample_series, DEFAULT_MAX_DATA_POINTS, MAX_DATA_POINTS_LIMIT
+)
+from config import MONGODB_STATUS_COLLECTION_NAME, MONGODB_COMMAND_MIX_COLLECTION_NAME
 
 app = FastAPI()
 
 
 async def get_command_status(instance_name):
-    db = await MongoDBConnector.get_database()
-    collection = db[MONGODB_STATUS_COLLECTION_NAME]
-    document = await collection.find({'instance_name': instance_name},
-                                     {'_id': 0}).sort('timestamp', -1).limit(1).to_list(length=1)
-    if document:
-        return document[0]
-    return None
+    store = await get_metric_store(MONGODB_STATUS_COLLECTION_NAME)
+    return await store.find_latest(instance_name, projection={'status_snapshot': 0})
 
 
 def transform_data_to_table_format(data):
@@ -24,13 +27,17 @@ def transform_data_to_table_format(data):
                 "total": details.get("total", 0),
                 "avgForHours": details.get("avgForHours", 0),
                 "avgForSeconds": details.get("avgForSeconds", 0),
-                "percentage": details.get("percentage", 0)
+                "percentage": details.get("percentage", 0),
+                "delta": details.get("delta"),
+                "ratePerSecond": details.get("ratePerSecond"),
+                "intervalSeconds": data.get("interval_seconds")
             }
             transformed_data.append(row)
     return transformed_data
 
 
 @app.get("/")
+@cached(MONGODB_STATUS_COLLECTION_NAME, ttl=60)
 async def read_status(instance_name: str = Query(None, description="The name of the instance to retrieve")):
     if instance_name:
         data = await get_command_status(instance_name)
@@ -39,3 +46,76 @@ async def read_status(instance_name: str = Query(None, description="The name of
             return transformed_data
         raise HTTPException(status_code=404, detail="Item not found")
     raise HTTPException(status_code=400, detail="Missing instance name")
+
+
+ROLLUP_RESOLUTION_MS = (('1m', 60 * 1000), ('1h', 3600 * 1000), ('1d', 86400 * 1000))
+
+
+def choose_resolution(size_ms: int) -> str:
+    """버킷 크기보다 작거나 같은 롤업 중 가장 거친 것을 골라 읽는 문서 수를 줄인다."""
+    chosen = ROLLUP_RESOLUTION_MS[0][0]
+    for resolution, resolution_ms in ROLLUP_RESOLUTION_MS:
+        if resolution_ms <= size_ms:
+            chosen = resolution
+    return chosen
+
+
+@app.get("/mix")
+@cached(MONGODB_COMMAND_MIX_COLLECTION_NAME, ttl=60)
+async def read_command_mix(
+    instance_name: str = Query(..., description="The name of the instance to retrieve"),
+    resolution: Optional[str] = Query(None, pattern="^(1m|1h|1d)$",
+                                      description="Rollup resolution (chosen from the time range if omitted)"),
+    hours: int = Query(24, ge=1, le=24 * 90, description="How many hours back to retrieve when from is omitted"),
+    start: Optional[str] = Query(None, alias="from", description="Grafana $__from (epoch ms) or ISO 8601"),
+    end: Optional[str] = Query(None, alias="to", description="Grafana $__to (epoch ms) or ISO 8601"),
+    interval_ms: Optional[int] = Query(None, ge=1, description="Grafana $__interval_ms"),
+    max_data_points: int = Query(DEFAULT_MAX_DATA_POINTS, ge=1, le=MAX_DATA_POINTS_LIMIT,
+                                 description="Panel maxDataPoints"),
+    downsample: str = Query("bucket", pattern="^(bucket|lttb)$")
+):
+    if start is None:
+        start = str(int((datetime.now(pytz.utc) - timedelta(hours=hours)).timestamp() * 1000))
+    try:
+        range_start, range_end, size_ms = grafana_window(start, end, max_data_points, interval_ms, downsample)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    resolution = resolution or choose_resolution(size_ms)
+
+    db = await MongoDBConnector.get_database()
+    collection = db[MONGODB_COMMAND_MIX_COLLECTION_NAME]
+    # 롤업 문서를 명령별로 펼친 뒤 패널 해상도에 맞는 버킷으로 다시 합침 (min/max는 그대로, 평균은 합계/개수로 재계산)
+    pipeline = [
+        {'$match': {
+            'instance_name': instance_name, 'resolution': resolution,
+            'bucket_start': {'$gte': range_start, '$lt': range_end}
+        }},
+        {'$project': {'_id': 0, 'bucket_start': 1, 'samples': 1, 'commands': {'$objectToArray': '$commands'}}},
+        {'$unwind': '$commands'},
+        {'$group': {
+            '_id': {'command': '$commands.k', 'time': bucket_expression('bucket_start', size_ms)},
+            'min': {'$min': '$commands.v.min'},
+            'max': {'$max': '$commands.v.max'},
+            'sum': {'$sum': '$commands.v.sum'},
+            'count': {'$sum': '$commands.v.count'},
+            'samples': {'$sum': '$samples'},
+        }},
+        {'$project': {
+            '_id': 0,
+            'time': '$_id.time',
+            'timestamp': {'$dateToString': {'date': {'$toDate': '$_id.time'}, 'format': '%Y-%m-%d %H:%M:%S',
+                                            'timezone': 'Asia/Seoul'}},
+            'command': '$_id.command',
+            'min': 1,
+            'max': 1,
+            'avg': {'$cond': [{'$gt': ['$count', 0]}, {'$round': [{'$divide': ['$sum', '$count']}, 2]}, None]},
+            'samples': 1,
+        }},
+        {'$sort': {'command': 1, 'time': 1}},
+    ]
+    rows = await collection.aggregate(pipeline).to_list(length=None)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if downsample == 'lttb':
+        rows = downsample_series(rows, 'command', 'time', 'avg', max_data_points)
+    return rows
@@ -1,54 +1,144 @@
-from modules.mongodb_connector import MongoDBConnector
+import json
+from modules.metric_store import get_metric_store
+from modules.response_cache import cached
+from modules.downsampling import (
+    grafana_window, bucket_expression, downsample_series, DEFAULT_MAX_DATA_POINTS, MAX_DATA_POINTS_LIMIT
+)
 from fastapi import FastAPI, HTTPException, Query
-from typing import List
-from datetime import timedelta, datetime
+from fastapi.responses import StreamingResponse, JSONResponse
+from typing import List, Optional
+from datetime import timedelta, datetime, timezone
 from config import MONGODB_DISK_USAGE_COLLECTION_NAME
 
 app = FastAPI()
 
-kst_delta = timedelta(hours=9)
-
-async def get_all_metrics_status(instance_name: str, metric_names: List[str] = None):
-    db = await MongoDBConnector.get_database()
-    collection = db[MONGODB_DISK_USAGE_COLLECTION_NAME]
-    query = {'instance_name': instance_name}
-    projection = {'_id': 0, 'timestamp': 1, 'metrics': 1}
-    cursor = collection.find(query, projection).sort('timestamp', -1)
-    documents = await cursor.to_list(length=None)
-    if documents:
-        return documents
-    return None
-
-def transform_data_to_table_format(data: List[dict], metric_names: List[str] = None):
-    transformed_data = []
-    for entry in data:
-        timestamp = entry.get("timestamp")
-        if timestamp:
-            timestamp = timestamp + kst_delta  # Convert to KST
-            timestamp = timestamp.strftime('%Y-%m-%d %H:%M:%S')  # Format the timestamp
-        if "metrics" in entry:
-            for metric in entry["metrics"]:
-                if metric_names and metric["name"] not in metric_names:
-                    continue
-                row = {
-                    "timestamp": timestamp,
-                    "name": metric["name"],
-                    "value": metric.get("value", 0),
-                    "avgForHours": metric.get("avg_for_hours", 0),
-                    "avgForSeconds": metric.get("avg_for_seconds", 0)
-                }
-                transformed_data.append(row)
-    return transformed_data
+KST_TIMEZONE = 'Asia/Seoul'
+# MongoDB 날짜는 밀리초 단위라 경계를 포함/제외할 때 1ms만큼 이동
+ONE_MS = timedelta(milliseconds=1)
+
+
+def encode_cursor(timestamp: datetime) -> str:
+    return str(int(timestamp.replace(tzinfo=timezone.utc).timestamp() * 1000))
+
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # 시간대 없이 들어온 from/to는 UTC로 보고, 커서와 비교할 수 있도록 모두 UTC aware로 맞춤
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def decode_cursor(cursor: str) -> datetime:
+    try:
+        return datetime.fromtimestamp(int(cursor) / 1000, timezone.utc)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def build_row_stages(metric_names: Optional[List[str]]) -> List[dict]:
+    """수집 문서를 지표 한 건당 한 행으로 펼치고 KST 문자열로 시각을 변환하는 단계."""
+    metrics = '$metrics'
+    if metric_names:
+        metrics = {'$filter': {'input': '$metrics', 'as': 'metric', 'cond': {'$in': ['$$metric.name', metric_names]}}}
+    return [
+        {'$project': {'_id': 0, 'timestamp': 1, 'interval_seconds': 1, 'metrics': metrics}},
+        {'$unwind': '$metrics'},
+        {'$project': {
+            '_id': 0,
+            'timestamp': {'$dateToString': {'date': '$timestamp', 'format': '%Y-%m-%d %H:%M:%S',
+                                            'timezone': KST_TIMEZONE}},
+            'name': '$metrics.name',
+            'value': {'$ifNull': ['$metrics.value', 0]},
+            'avgForHours': {'$ifNull': ['$metrics.avg_for_hours', 0]},
+            'avgForSeconds': {'$ifNull': ['$metrics.avg_for_seconds', 0]},
+            'delta': {'$ifNull': ['$metrics.delta', None]},
+            'ratePerSecond': {'$ifNull': ['$metrics.rate_per_second', None]},
+            'intervalSeconds': {'$ifNull': ['$interval_seconds', None]},
+        }},
+    ]
+
+
+async def stream_rows(first_row: dict, iterator):
+    yield '[' + json.dumps(first_row)
+    async for row in iterator:
+        yield ',' + json.dumps(row)
+    yield ']'
+
 
 @app.get("/")
 async def read_status(
     instance_name: str = Query(None, description="The name of the instance to retrieve"),
-    metric_name: List[str] = Query(None, description="List of metric names to retrieve", alias="metric")
+    metric_name: List[str] = Query(None, description="List of metric names to retrieve", alias="metric"),
+    start: Optional[datetime] = Query(None, alias="from", description="Range start (inclusive)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Range end (exclusive)"),
+    limit: int = Query(1000, ge=1, le=10000, description="Maximum number of snapshots per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page")
 ):
-    if instance_name:
-        data = await get_all_metrics_status(instance_name, metric_name)
-        if data:
-            transformed_data = transform_data_to_table_format(data, metric_name)
-            return transformed_data
+    if not instance_name:
+        raise HTTPException(status_code=400, detail="Missing instance name")
+
+    start, end = to_utc(start), to_utc(end)
+    if cursor:
+        # 이전 페이지 경계 시각까지 포함
+        cursor_end = decode_cursor(cursor) + ONE_MS
+        end = min(end, cursor_end) if end else cursor_end
+
+    store = await get_metric_store(MONGODB_DISK_USAGE_COLLECTION_NAME)
+
+    # limit번째 다음 스냅샷 시각을 페이지 경계로 삼아 페이지를 자르고, 다음 페이지는 그 시각부터 시작
+    boundary = await store.nth_timestamp(instance_name, start, end, limit)
+    page_start = boundary + ONE_MS if boundary else start
+
+    stages = store.pipeline(instance_name, page_start, end) + build_row_stages(metric_name)
+    iterator = store.aggregate(stages).__aiter__()
+    try:
+        first_row = await iterator.__anext__()
+    except StopAsyncIteration:
+        first_row = None
+
+    headers = {'X-Next-Cursor': encode_cursor(boundary)} if boundary else {}
+    if first_row is None:
+        # 지표 필터에 걸러져 이 페이지만 비어 있을 수 있으므로 다음 페이지가 있으면 빈 목록을 반환
+        if boundary:
+            return JSONResponse(content=[], headers=headers)
         raise HTTPException(status_code=404, detail="Item not found")
-    raise HTTPException(status_code=400, detail="Missing instance name")
\ No newline at end of file
+    return StreamingResponse(stream_rows(first_row, iterator), media_type='application/json', headers=headers)
+
+
+@app.get("/series")
+@cached(MONGODB_DISK_USAGE_COLLECTION_NAME, ttl=60)
+async def read_series(
+    instance_name: str = Query(..., description="The name of the instance to retrieve"),
+    metric_name: List[str] = Query(None, description="List of metric names to retrieve", alias="metric"),
+    start: Optional[str] = Query(None, alias="from", description="Grafana $__from (epoch ms) or ISO 8601"),
+    end: Optional[str] = Query(None, alias="to", description="Grafana $__to (epoch ms) or ISO 8601"),
+    interval_ms: Optional[int] = Query(None, ge=1, description="Grafana $__interval_ms"),
+    max_data_points: int = Query(DEFAULT_MAX_DATA_POINTS, ge=1, le=MAX_DATA_POINTS_LIMIT,
+                                 description="Panel maxDataPoints"),
+    field: str = Query("rate_per_second", pattern="^(value|delta|rate_per_second|avg_for_seconds)$"),
+    downsample: str = Query("bucket", pattern="^(bucket|lttb)$")
+):
+    """지표별 시계열. 응답 점 개수는 데이터 보관 기간과 관계없이 지표당 max_data_points개 이하이다."""
+    try:
+        range_start, range_end, size_ms = grafana_window(start, end, max_data_points, interval_ms, downsample)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    store = await get_metric_store(MONGODB_DISK_USAGE_COLLECTION_NAME)
+    metrics = '$metrics'
+    if metric_name:
+        metrics = {'$filter': {'input': '$metrics', 'as': 'metric', 'cond': {'$in': ['$$metric.name', metric_name]}}}
+    stages = store.pipeline(instance_name, range_start, range_end) + [
+        {'$project': {'_id': 0, 'timestamp': 1, 'metrics': metrics}},
+        {'$unwind': '$metrics'},
+        {'$group': {
+            '_id': {'name': '$metrics.name', 'time': bucket_expression('timestamp', size_ms)},
+            'value': {'$avg': f'$metrics.{field}'},
+        }},
+        {'$project': {'_id': 0, 'time': '$_id.time', 'name': '$_id.name', 'value': {'$round': ['$value', 2]}}},
+        {'$sort': {'name': 1, 'time': 1}},
+    ]
+    rows = await store.aggregate(stages).to_list(length=None)
+    if downsample == 'lttb':
+        rows = downsample_series(rows, 'name', 'time', 'value', max_data_points)
+    return rows
@@ -1,8 +1,10 @@
 from fastapi import FastAPI, Query, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 from datetime import datetime, timedelta
 import logging
 from modules.mongodb_connector import MongoDBConnector
+from modules.response_cache import cached
 from modules.time_utils import convert_utc_to_kst, get_kst_time
 from config import MONGODB_SLOWLOG_COLLECTION_NAME
 
@@ -21,9 +23,12 @@ class SlowQueryItem(BaseModel):
     sql_text: str
     start: datetime
     end: datetime
+    fingerprint: Optional[str] = None
+    digest: Optional[str] = None
 
 
 @app.get("/", tags=["Slow Queries"])
+@cached(MONGODB_SLOWLOG_COLLECTION_NAME, ttl=30)
 async def get_slow_queries(days: int = Query(1, ge=1, le=30, description="Number of days to look back")):
     try:
         db = await MongoDBConnector.get_database()
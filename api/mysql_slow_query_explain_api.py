@@ -1,18 +1,29 @@
-import re
+import asyncio
 import sqlparse
 import json
-import pymysql.cursors
 from pydantic import BaseModel, Field
 from fastapi import FastAPI, HTTPException, Query, Response
-from datetime import datetime, timezone, timedelta
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 
 from modules.mongodb_connector import MongoDBConnector
-from modules.crypto_utils import decrypt_password
+from modules.explain_executor import explain_executor
+from modules.plan_store import (
+    explain_slow_query, attach_plan_bodies, get_stats as get_plan_cache_stats, SOURCE_MANUAL
+)
 from modules.load_instance import load_instances_from_mongodb
-from config import MONGODB_SLOWLOG_COLLECTION_NAME, MONGODB_PLAN_COLLECTION_NAME
+from modules.response_cache import cached, bump_data_version
+from modules.downsampling import parse_grafana_time
+from config import (
+    MONGODB_SLOWLOG_COLLECTION_NAME, MONGODB_PLAN_COLLECTION_NAME,
+    EXPLAIN_BATCH_MAX_CONCURRENCY, EXPLAIN_BATCH_MAX_ITEMS
+)
 
 app = FastAPI()
 kst_delta = timedelta(hours=9)
+# 모든 일괄 EXPLAIN 요청이 함께 쓰는 전체 동시 실행 제한 (인스턴스별 제한은 explain_executor가 적용)
+batch_semaphore = asyncio.Semaphore(EXPLAIN_BATCH_MAX_CONCURRENCY)
 
 
 async def get_collection():
@@ -36,41 +47,51 @@ class Item(BaseModel):
     explain_result: str
 
 
-class SQLQueryExecutor:
-    @staticmethod
-    def remove_sql_comments(sql_text):
-        return re.sub(r'/\*.*?\*/', '', sql_text, flags=re.DOTALL)
+class SlowQueryKey(BaseModel):
+    instance: str
+    pid: int
+    start: datetime
 
-    @staticmethod
-    def validate_sql_query(sql_text):
-        query_without_comments = SQLQueryExecutor.remove_sql_comments(sql_text).strip()
-        if not query_without_comments.lower().startswith("select"):
-            raise ValueError("SELECT 쿼리만 가능합니다.")
-        if "into" in query_without_comments.lower().split("from")[0]:
-            raise ValueError("SELECT ... INTO ... FROM 형태의 프로시저 쿼리는 실행할 수 없습니다.")
-        return query_without_comments
 
-    @staticmethod
-    async def execute(rds_info, sql_text, db_name):
-        decrypted_password = decrypt_password(rds_info["password"])
-        try:
-            validated_sql = SQLQueryExecutor.validate_sql_query(sql_text)
-            connection = pymysql.connect(
-                host=rds_info["host"],
-                port=rds_info["port"],
-                user=rds_info["user"],
-                password=decrypted_password,
-                database=db_name,
-                cursorclass=pymysql.cursors.DictCursor
-            )
-            with connection.cursor() as cursor:
-                explain_query = f"EXPLAIN FORMAT=JSON {validated_sql}"
-                cursor.execute(explain_query)
-                execution_plan = cursor.fetchall()
-            connection.close()
-            return execution_plan
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"SQL 실행 중 에러 발생: {str(e)}")
+class BatchExplainRequest(BaseModel):
+    """keys로 슬로우 쿼리를 직접 지정하거나, from(필수)/to 구간과 필터로 고른다."""
+    keys: Optional[List[SlowQueryKey]] = Field(None, min_length=1, max_length=EXPLAIN_BATCH_MAX_ITEMS)
+    start: Optional[str] = Field(None, alias="from", description="Epoch ms or ISO 8601")
+    end: Optional[str] = Field(None, alias="to", description="Epoch ms or ISO 8601")
+    instance: Optional[str] = None
+    db: Optional[str] = None
+    user: Optional[str] = None
+    digest: Optional[str] = None
+    min_time: Optional[int] = Field(None, ge=0, description="Minimum execution time (seconds)")
+    # 같은 인스턴스/쿼리 형태는 실행 시간이 가장 긴 PID 하나만 EXPLAIN
+    distinct_digest: bool = True
+    limit: int = Field(50, ge=1, le=EXPLAIN_BATCH_MAX_ITEMS)
+
+
+def explain_error(e: Exception) -> Tuple[int, str]:
+    """플랜 캐시/EXPLAIN 실행기 오류를 (응답 코드, 메시지)로 변환한다."""
+    if isinstance(e, ValueError):
+        return 400, str(e)
+    if isinstance(e, ConnectionError):
+        return 503, f"인스턴스에 연결할 수 없습니다: {str(e)}"
+    if isinstance(e, asyncio.TimeoutError):
+        return 504, "EXPLAIN 실행 시간이 초과되었습니다."
+    return 500, f"SQL 실행 중 에러 발생: {str(e)}"
+
+
+async def run_explain(rds_info, document):
+    try:
+        return await explain_slow_query(rds_info, document, SOURCE_MANUAL)
+    except Exception as e:
+        status_code, detail = explain_error(e)
+        raise HTTPException(status_code=status_code, detail=detail)
+
+
+def to_utc(value: datetime) -> datetime:
+    # 슬로우 쿼리 start는 시간대 없는 UTC(밀리초 단위)로 저장되어 있고, 목록 API는 KST로 내려줌
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
 
 
 class MarkdownGenerator:
@@ -91,13 +112,22 @@ class MarkdownGenerator:
 
 
 @app.post("/explain")
-async def execute_sql(pid: int = Query(..., description="The PID to lookup")):
+async def execute_sql(
+    pid: int = Query(..., description="The PID to lookup"),
+    instance: Optional[str] = Query(None, description="Instance name (PID is only unique per instance)"),
+    start: Optional[datetime] = Query(None, description="Query start time, with instance selects exactly one record")
+):
     collection = await get_collection()
-    plan_collection = await get_plan_collection()
 
     if not pid:
         raise HTTPException(status_code=422, detail="PID is required")
-    document = await collection.find_one({"pid": pid})
+    query: Dict[str, Any] = {"pid": pid}
+    if instance:
+        query["instance"] = instance
+    if start:
+        query["start"] = to_utc(start)
+    # PID는 인스턴스 재시작 후 재사용되므로 조건이 모자라면 가장 최근 기록을 사용
+    document = await collection.find_one(query, sort=[("start", -1)])
     if document is None:
         raise HTTPException(status_code=404, detail="해당 PID의 문서를 찾을 수 없습니다.")
 
@@ -106,34 +136,131 @@ async def execute_sql(pid: int = Query(..., description="The PID to lookup")):
     if not rds_info:
         raise HTTPException(status_code=400, detail="instance_name에 해당하는 RDS 인스턴스 정보를 찾을 수 없습니다.")
 
-    execution_plan_raw = await SQLQueryExecutor.execute(rds_info, document["sql_text"], document["db"])
-    if isinstance(execution_plan_raw[0]['EXPLAIN'], dict):
-        execution_plan = execution_plan_raw[0]['EXPLAIN']
-    else:
-        execution_plan = json.loads(execution_plan_raw[0]['EXPLAIN'])
+    _, cache_hit = await run_explain(rds_info, document)
+    await bump_data_version(MONGODB_PLAN_COLLECTION_NAME)
+    if cache_hit:
+        return {"message": "같은 형태의 쿼리에 대해 저장된 실행 계획이 있어 EXPLAIN 없이 저장 되었습니다."}
+
+    return {"message": "SQL 쿼리에 대한 EXPLAIN이 실행 되었으며, 실행 계획이 저장 되었습니다."}
+
+
+async def find_batch_documents(collection, request: BatchExplainRequest) -> Tuple[List[dict], List[SlowQueryKey]]:
+    """EXPLAIN할 슬로우 쿼리 문서와 찾지 못한 키를 반환한다."""
+    if request.keys:
+        keys = list({(key.instance, key.pid, to_utc(key.start)): key for key in request.keys}.items())
+        # (instance, pid, start) 고유 인덱스로 조회
+        documents = await collection.find({"$or": [
+            {"instance": instance, "pid": pid, "start": start} for (instance, pid, start), _ in keys
+        ]}).to_list(length=None)
+        found = {(document["instance"], document["pid"], document["start"]) for document in documents}
+        return documents, [key for identity, key in keys if identity not in found]
+
+    start_time, end_time = parse_grafana_time(request.start), parse_grafana_time(request.end)
+    match: Dict[str, Any] = {"start": {"$gte": start_time}}
+    if end_time:
+        match["start"]["$lt"] = end_time
+    for field in ("instance", "db", "user", "digest"):
+        if getattr(request, field):
+            match[field] = getattr(request, field)
+    if request.min_time is not None:
+        match["time"] = {"$gte": request.min_time}
+
+    if not request.distinct_digest:
+        cursor = collection.find(match).sort([("time", -1)]).limit(request.limit)
+        return await cursor.to_list(length=None), []
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"time": -1}},
+        {"$group": {"_id": {"instance": "$instance", "digest": "$digest"}, "document": {"$first": "$$ROOT"}}},
+        {"$replaceRoot": {"newRoot": "$document"}},
+        {"$sort": {"time": -1}},
+        {"$limit": request.limit},
+    ]
+    return await collection.aggregate(pipeline).to_list(length=None), []
+
 
-    query_plan_document = {
-        "pid": pid,
+def batch_item(document: dict) -> Dict[str, Any]:
+    return {
         "instance": document["instance"],
-        "db": document["db"],
-        "user": document["user"],
-        "time": document["time"],
-        "sql_text": SQLQueryExecutor.remove_sql_comments(document["sql_text"]),
-        "explain_result": execution_plan,
-        "created_at": datetime.now(timezone.utc)
+        "pid": document["pid"],
+        "start": (document["start"] + kst_delta).isoformat(),
+        "db": document.get("db"),
+        "digest": document.get("digest"),
+        "time": document.get("time"),
     }
-    await plan_collection.update_one({"pid": pid}, {"$set": query_plan_document}, upsert=True)
 
-    return {"message": "SQL 쿼리에 대한 EXPLAIN이 실행 되었으며, 실행 계획이 저장 되었습니다."}
+
+async def explain_batch_item(rds_info: Optional[dict], document: dict) -> Dict[str, Any]:
+    item = batch_item(document)
+    if rds_info is None:
+        return {**item, "status": "error", "code": 400,
+                "error": "instance_name에 해당하는 RDS 인스턴스 정보를 찾을 수 없습니다."}
+    async with batch_semaphore:
+        try:
+            plan_hash, cache_hit = await explain_slow_query(rds_info, document, SOURCE_MANUAL)
+        except Exception as e:
+            status_code, detail = explain_error(e)
+            return {**item, "status": "error", "code": status_code, "error": detail}
+    return {**item, "status": "cached" if cache_hit else "explained", "plan_hash": plan_hash}
+
+
+async def stream_batch(documents: List[dict], missing: List[SlowQueryKey], rds_infos: Dict[str, dict]):
+    """시작 줄, 완료 순서대로 결과 한 줄씩, 마지막에 요약 한 줄을 NDJSON으로 내보낸다."""
+    total = len(documents) + len(missing)
+    counts = {"explained": 0, "cached": 0, "error": 0, "not_found": len(missing)}
+    yield json.dumps({"type": "start", "total": total}, ensure_ascii=False) + "\n"
+
+    done = 0
+    for key in missing:
+        done += 1
+        yield json.dumps({"type": "result", "done": done, "total": total, "instance": key.instance, "pid": key.pid,
+                          "start": key.start.isoformat(), "status": "not_found"}, ensure_ascii=False) + "\n"
+
+    tasks = [
+        asyncio.create_task(explain_batch_item(rds_infos.get(document["instance"]), document))
+        for document in documents
+    ]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            done += 1
+            counts[result["status"]] += 1
+            yield json.dumps({"type": "result", "done": done, "total": total, **result}, ensure_ascii=False) + "\n"
+    finally:
+        # 클라이언트가 연결을 끊으면 남은 EXPLAIN을 취소
+        for task in tasks:
+            task.cancel()
+        if counts["explained"] or counts["cached"]:
+            await bump_data_version(MONGODB_PLAN_COLLECTION_NAME)
+    yield json.dumps({"type": "summary", "total": total, **counts}, ensure_ascii=False) + "\n"
+
+
+@app.post("/explain/batch")
+async def execute_batch(request: BatchExplainRequest):
+    """
+    여러 슬로우 쿼리의 실행 계획을 한 번에 저장한다.
+    전체 동시 실행 수는 EXPLAIN_BATCH_MAX_CONCURRENCY, 인스턴스별 동시 실행 수는
+    EXPLAIN_MAX_CONCURRENCY_PER_INSTANCE로 제한하며, 끝나는 순서대로 결과를 NDJSON으로 스트리밍한다.
+    """
+    if bool(request.keys) == bool(request.start):
+        raise HTTPException(status_code=422, detail="keys 또는 from 중 하나만 지정해야 합니다.")
+    try:
+        collection = await get_collection()
+        documents, missing = await find_batch_documents(collection, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rds_infos = {item["instance_name"]: item for item in await load_instances_from_mongodb()}
+    return StreamingResponse(stream_batch(documents, missing, rds_infos), media_type="application/x-ndjson")
 
 
 @app.get("/download", response_class=Response)
 async def download_markdown(pid: int = Query(...)):
     plan_collection = await get_plan_collection()
 
-    cursor = plan_collection.find({"pid": pid})
+    documents = await attach_plan_bodies(await plan_collection.find({"pid": pid}).to_list(length=None))
     markdown_content = ""
-    async for document in cursor:
+    for document in documents:
         markdown_content += MarkdownGenerator.generate(document)
 
     if not markdown_content:
@@ -145,19 +272,128 @@ async def download_markdown(pid: int = Query(...)):
 
 
 @app.get("/plans/")
+@cached(MONGODB_PLAN_COLLECTION_NAME, ttl=300)
 async def get_items():
     db = await MongoDBConnector.get_database()
     collection = db[MONGODB_PLAN_COLLECTION_NAME]
     items = []
     sort = [("_id", -1)]
 
-    async for item in collection.find({}).sort(sort):
+    async for item in collection.find({}, {'explain_result': 0}).sort(sort):
         if '_id' in item:
             del item['_id']
-        if 'explain_result' in item:
-            del item['explain_result']
         if 'created_at' in item:
             item['created_at'] = item['created_at'] + kst_delta
         items.append(item)
 
     return items
+
+
+PLAN_SORT_FIELDS = {
+    "query_cost": "features.query_cost",
+    "rows_examined": "features.rows_examined",
+    "max_rows_examined_per_scan": "features.max_rows_examined_per_scan",
+    "created_at": "created_at",
+}
+
+
+@app.get("/plans/search")
+@cached(MONGODB_PLAN_COLLECTION_NAME, ttl=300)
+async def search_plans(
+    instance: Optional[str] = Query(None, description="Filter by instance name"),
+    db_name: Optional[str] = Query(None, alias="db", description="Filter by database"),
+    access_type: List[str] = Query(None, description="Plans using any of these access types (e.g. ALL, index)"),
+    table: Optional[str] = Query(None, description="Plans touching this table (alias as shown in EXPLAIN)"),
+    key: Optional[str] = Query(None, description="Plans using this index"),
+    full_scan: Optional[bool] = Query(None, description="Plans with (or without) a full table scan"),
+    filesort: Optional[bool] = Query(None),
+    temporary: Optional[bool] = Query(None),
+    min_rows: Optional[int] = Query(None, ge=0, description="Minimum rows_examined_per_scan of any table"),
+    min_cost: Optional[float] = Query(None, ge=0, description="Minimum query cost"),
+    start: Optional[str] = Query(None, alias="from", description="Epoch ms or ISO 8601"),
+    end: Optional[str] = Query(None, alias="to", description="Epoch ms or ISO 8601"),
+    sort_by: str = Query("query_cost", pattern="^(query_cost|rows_examined|max_rows_examined_per_scan|created_at)$"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    저장 시 추출한 플랜 특징(features)으로 MongoDB 안에서 걸러 정렬한다.
+    같은 인스턴스/쿼리 형태/플랜은 최근 PID 기록 하나로 합치고 PID 수를 함께 반환한다.
+    """
+    match = {"features": {"$exists": True}}
+    if instance:
+        match["instance"] = instance
+    if db_name:
+        match["db"] = db_name
+    if access_type:
+        match["features.access_types"] = {"$in": access_type}
+    if table:
+        match["features.tables"] = table
+    if key:
+        match["features.keys"] = key
+    if full_scan is not None:
+        match["features.has_full_scan"] = full_scan
+    if filesort is not None:
+        match["features.using_filesort"] = filesort
+    if temporary is not None:
+        match["features.using_temporary"] = temporary
+    if min_rows is not None:
+        match["features.max_rows_examined_per_scan"] = {"$gte": min_rows}
+    if min_cost is not None:
+        match["features.query_cost"] = {"$gte": min_cost}
+    try:
+        start_time, end_time = parse_grafana_time(start), parse_grafana_time(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if start_time or end_time:
+        match["created_at"] = {}
+        if start_time:
+            match["created_at"]["$gte"] = start_time
+        if end_time:
+            match["created_at"]["$lt"] = end_time
+
+    # 그룹 결과도 features/created_at 경로를 그대로 유지하므로 같은 필드로 정렬
+    sort_field = PLAN_SORT_FIELDS[sort_by]
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"created_at": -1}},
+        {
+            "$group": {
+                "_id": {"instance": "$instance", "db": "$db", "digest": "$digest", "plan_hash": "$plan_hash"},
+                "pid": {"$first": "$pid"},
+                "user": {"$first": "$user"},
+                "time": {"$max": "$time"},
+                "sql_text": {"$first": "$sql_text"},
+                "features": {"$first": "$features"},
+                "created_at": {"$first": "$created_at"},
+                "pid_count": {"$sum": 1}
+            }
+        },
+        {"$sort": {sort_field: -1}},
+        {"$limit": limit},
+        {
+            "$project": {
+                "_id": 0,
+                "instance": "$_id.instance",
+                "db": "$_id.db",
+                "digest": "$_id.digest",
+                "plan_hash": "$_id.plan_hash",
+                "pid": 1,
+                "user": 1,
+                "time": 1,
+                "sql_text": 1,
+                "features": 1,
+                "pid_count": 1,
+                "created_at": 1
+            }
+        }
+    ]
+    db = await MongoDBConnector.get_database()
+    items = await db[MONGODB_PLAN_COLLECTION_NAME].aggregate(pipeline).to_list(length=None)
+    for item in items:
+        item["created_at"] = item["created_at"] + kst_delta
+    return items
+
+
+@app.get("/stats")
+async def get_explain_stats():
+    return {"executor": explain_executor.get_stats(), "plan_cache": get_plan_cache_stats()}
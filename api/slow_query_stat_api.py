@@ -1,14 +1,41 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query
+from typing import Any, Dict, List, Optional
 from modules.mongodb_connector import MongoDBConnector
-from config import MONGODB_SLOWLOG_COLLECTION_NAME
+from modules.downsampling import (
+    parse_grafana_time, grafana_window, bucket_expression, downsample_series,
+    DEFAULT_MAX_DATA_POINTS, MAX_DATA_POINTS_LIMIT
+)
+from modules.slow_query_summary import kst_day
+from modules.latency_sketch import LatencySketch
+from modules.response_cache import cached
+from config import MONGODB_SLOWLOG_COLLECTION_NAME, MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME
 
 app = FastAPI()
 
 
+def day_range_match(start: Optional[str], end: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Grafana $__from/$__to가 주어지면 일별 요약의 일자(day) 구간으로 거르는 $match 단계를 만든다.
+    요약은 KST 일 단위이므로 구간에 걸친 날은 하루 전체가 포함된다.
+    """
+    try:
+        start_time, end_time = parse_grafana_time(start), parse_grafana_time(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    day_range = {}
+    if start_time:
+        day_range['$gte'] = kst_day(start_time)[1]
+    if end_time:
+        day_range['$lt'] = end_time
+    return [{"$match": {"day": day_range}}] if day_range else []
+
+
 @app.get("/")
-async def get_statistics():
+@cached(MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME, ttl=120)
+async def get_statistics(start: Optional[str] = Query(None, alias="from", description="Grafana $__from (epoch ms) or ISO 8601"),
+                         end: Optional[str] = Query(None, alias="to", description="Grafana $__to (epoch ms) or ISO 8601")):
     db = await MongoDBConnector.get_database()
-    aggregation_pipeline = [
+    aggregation_pipeline = day_range_match(start, end) + [
         {
             "$group": {
                 "_id": {
@@ -16,41 +43,24 @@ async def get_statistics():
                     "db": "$db",
                     "user": "$user"
                 },
-                "total_count": {"$sum": 1},
-                "max_time": {"$max": "$time"},
-                "total_time": {"$sum": "$time"}
-            }
-        },
-        {
-            "$group": {
-                "_id": "$_id.instance",
-                "dbs": {
-                    "$push": {
-                        "db": "$_id.db",
-                        "user": "$_id.user",
-                        "count": "$total_count",
-                        "max_time": "$max_time",
-                        "total_time": "$total_time"
-                    }
-                }
+                "count": {"$sum": "$count"},
+                "max_time": {"$max": "$max_time"},
+                "total_time": {"$sum": "$total_time"}
             }
         },
-        {
-            "$unwind": "$dbs"
-        },
         {
             "$project": {
                 "_id": 0,
-                "instance": "$_id",
-                "db": "$dbs.db",
-                "user": "$dbs.user",
-                "count": "$dbs.count",
-                "max_time": "$dbs.max_time",
-                "total_time": "$dbs.total_time",
+                "instance": "$_id.instance",
+                "db": "$_id.db",
+                "user": "$_id.user",
+                "count": 1,
+                "max_time": 1,
+                "total_time": 1,
                 "avg_time": {
                     "$round": [
                         {
-                            "$cond": { "if": { "$ne": ["$dbs.count", 0] }, "then": { "$divide": ["$dbs.total_time", "$dbs.count"] }, "else": 0 }
+                            "$cond": { "if": { "$ne": ["$count", 0] }, "then": { "$divide": ["$total_time", "$count"] }, "else": 0 }
                         },
                         3
                     ]
@@ -58,6 +68,189 @@ async def get_statistics():
             }
         }
     ]
+    cursor = db[MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME].aggregate(aggregation_pipeline)
+    result = await cursor.to_list(length=None)
+    return result
+
+
+@app.get("/fingerprints")
+@cached(MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME, ttl=120)
+async def get_fingerprint_statistics(instance: Optional[str] = Query(None, description="Filter by instance name"),
+                                     limit: int = Query(100, ge=1, le=1000),
+                                     start: Optional[str] = Query(None, alias="from"),
+                                     end: Optional[str] = Query(None, alias="to")):
+    db = await MongoDBConnector.get_database()
+    aggregation_pipeline = day_range_match(start, end)
+    if instance:
+        aggregation_pipeline.append({"$match": {"instance": instance}})
+    aggregation_pipeline += [
+        {"$match": {"digest": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": {
+                    "instance": "$instance",
+                    "digest": "$digest"
+                },
+                "fingerprint": {"$first": "$fingerprint"},
+                "count": {"$sum": "$count"},
+                "max_time": {"$max": "$max_time"},
+                "total_time": {"$sum": "$total_time"}
+            }
+        },
+        {"$sort": {"total_time": -1}},
+        {"$limit": limit},
+        {
+            "$project": {
+                "_id": 0,
+                "instance": "$_id.instance",
+                "digest": "$_id.digest",
+                "fingerprint": 1,
+                "count": 1,
+                "max_time": 1,
+                "total_time": 1,
+                "avg_time": {"$round": [{"$divide": ["$total_time", "$count"]}, 3]}
+            }
+        }
+    ]
+    cursor = db[MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME].aggregate(aggregation_pipeline)
+    result = await cursor.to_list(length=None)
+    return result
+
+
+PERCENTILE_GROUP_FIELDS = ("instance", "db", "user", "digest")
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+@app.get("/percentiles")
+@cached(MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME, ttl=120)
+async def get_percentile_statistics(
+    group_by: List[str] = Query(["instance", "digest"], description="instance, db, user, digest 중 그룹 기준"),
+    instance: Optional[str] = Query(None, description="Filter by instance name"),
+    limit: int = Query(100, ge=1, le=1000),
+    start: Optional[str] = Query(None, alias="from", description="Grafana $__from (epoch ms) or ISO 8601"),
+    end: Optional[str] = Query(None, alias="to", description="Grafana $__to (epoch ms) or ISO 8601")
+):
+    """
+    그룹별 실행 시간 p50/p95/p99. 일별 요약의 스케치 버킷 개수를 합쳐 계산하므로 원본을 읽지 않는다.
+    값은 버킷 대표값이라 상대 오차 2% 이내의 근사치이며, 스케치가 없는 요약 문서(rebuild 전 데이터)는 분위수에서 빠진다.
+    """
+    invalid = [field for field in group_by if field not in PERCENTILE_GROUP_FIELDS]
+    if invalid or not group_by:
+        raise HTTPException(status_code=400, detail=f"Invalid group_by: {invalid}")
+    group_fields = list(dict.fromkeys(group_by))
+    group_id = {field: f"${field}" for field in group_fields}
+
+    db = await MongoDBConnector.get_database()
+    aggregation_pipeline = day_range_match(start, end)
+    if instance:
+        aggregation_pipeline.append({"$match": {"instance": instance}})
+    aggregation_pipeline += [
+        {
+            "$group": {
+                "_id": group_id,
+                "fingerprint": {"$first": "$fingerprint"},
+                "count": {"$sum": "$count"},
+                "max_time": {"$max": "$max_time"},
+                "total_time": {"$sum": "$total_time"},
+                "sketches": {"$push": "$sketch"}
+            }
+        },
+        {"$sort": {"total_time": -1}},
+        {"$limit": limit},
+        # 상위 그룹만 남긴 뒤 일별 스케치를 버킷 단위로 합침
+        {"$unwind": "$sketches"},
+        {"$project": {"fingerprint": 1, "count": 1, "max_time": 1, "total_time": 1,
+                      "buckets": {"$objectToArray": "$sketches"}}},
+        {"$unwind": "$buckets"},
+        {
+            "$group": {
+                "_id": {"group": "$_id", "bucket": "$buckets.k"},
+                "fingerprint": {"$first": "$fingerprint"},
+                "count": {"$first": "$count"},
+                "max_time": {"$first": "$max_time"},
+                "total_time": {"$first": "$total_time"},
+                "bucket_count": {"$sum": "$buckets.v"}
+            }
+        },
+        {
+            "$group": {
+                "_id": "$_id.group",
+                "fingerprint": {"$first": "$fingerprint"},
+                "count": {"$first": "$count"},
+                "max_time": {"$first": "$max_time"},
+                "total_time": {"$first": "$total_time"},
+                "sketch": {"$push": {"k": "$_id.bucket", "v": "$bucket_count"}}
+            }
+        },
+        {"$sort": {"total_time": -1}}
+    ]
+    cursor = db[MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME].aggregate(aggregation_pipeline)
+
+    result = []
+    async for row in cursor:
+        sketch = LatencySketch({bucket["k"]: bucket["v"] for bucket in row["sketch"]})
+        p50, p95, p99 = sketch.quantiles(PERCENTILES)
+        entry = dict(row["_id"])
+        if "digest" in group_fields:
+            entry["fingerprint"] = row.get("fingerprint")
+        entry.update({
+            "count": row["count"],
+            "max_time": row["max_time"],
+            "total_time": row["total_time"],
+            "avg_time": round(row["total_time"] / row["count"], 3) if row["count"] else 0,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+        })
+        result.append(entry)
+    return result
+
+
+@app.get("/timeseries")
+@cached(MONGODB_SLOWLOG_COLLECTION_NAME, ttl=60)
+async def get_slow_query_timeseries(
+    instance: Optional[str] = Query(None, description="Filter by instance name"),
+    start: Optional[str] = Query(None, alias="from", description="Grafana $__from (epoch ms) or ISO 8601"),
+    end: Optional[str] = Query(None, alias="to", description="Grafana $__to (epoch ms) or ISO 8601"),
+    interval_ms: Optional[int] = Query(None, ge=1, description="Grafana $__interval_ms"),
+    max_data_points: int = Query(DEFAULT_MAX_DATA_POINTS, ge=1, le=MAX_DATA_POINTS_LIMIT,
+                                 description="Panel maxDataPoints"),
+    downsample: str = Query("bucket", pattern="^(bucket|lttb)$")
+):
+    """인스턴스별 슬로우 쿼리 발생 건수/실행 시간 시계열. 인스턴스당 max_data_points개 이하의 점을 반환한다."""
+    try:
+        range_start, range_end, size_ms = grafana_window(start, end, max_data_points, interval_ms, downsample)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    match = {"start": {"$gte": range_start, "$lt": range_end}}
+    if instance:
+        match["instance"] = instance
+    db = await MongoDBConnector.get_database()
+    aggregation_pipeline = [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {"instance": "$instance", "time": bucket_expression("start", size_ms)},
+                "count": {"$sum": 1},
+                "max_time": {"$max": "$time"},
+                "total_time": {"$sum": "$time"}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "time": "$_id.time",
+                "instance": "$_id.instance",
+                "count": 1,
+                "max_time": 1,
+                "total_time": 1
+            }
+        },
+        {"$sort": {"instance": 1, "time": 1}}
+    ]
     cursor = db[MONGODB_SLOWLOG_COLLECTION_NAME].aggregate(aggregation_pipeline)
     result = await cursor.to_list(length=None)
+    if downsample == 'lttb':
+        result = downsample_series(result, 'instance', 'time', 'count', max_data_points)
     return result
@@ -8,6 +8,9 @@ from contextlib import asynccontextmanager
 import logging
 
 from modules.mongodb_connector import MongoDBConnector
+from modules.index_manager import ensure_indexes
+from modules.response_cache import response_cache
+from modules.mysql_pool_registry import MySQLPoolRegistry
 from modules.time_utils import get_kst_time
 from config import (
     API_MAPPING, STATIC_FILES_DIR, TEMPLATES_DIR, HOST, PORT,
@@ -22,9 +25,18 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     await MongoDBConnector.initialize()
     logger.info(f"{get_kst_time()} - MongoDB connection initialized.")
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Failed to ensure MongoDB indexes: {e}")
+    response_cache.start()
+    MySQLPoolRegistry.start_health_check()
     yield
+    await response_cache.stop()
+    # EXPLAIN 전용 MySQL 풀 정리
+    await MySQLPoolRegistry.close_all()
     if MongoDBConnector.client:
-        MongoDBConnector.client.close()
+        await MongoDBConnector.close()
         logger.info(f"{get_kst_time()} - MongoDB connection closed.")
 
 app = FastAPI(
@@ -62,6 +74,11 @@ async def health_check():
         return JSONResponse(content={"status": "unhealthy", "database": "disconnected"}, status_code=500)
 
 
+@app.get("/cache/stats", tags=["Health Check"])
+async def cache_stats():
+    return response_cache.get_stats()
+
+
 @app.get("/sql-plan", tags=["UI"])
 async def sql_explain(request: Request):
     return templates.TemplateResponse("sql_explain.html", {"request": request})
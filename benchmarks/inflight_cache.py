@@ -0,0 +1,85 @@
+"""
+실행 중인 슬로우 쿼리 캐시의 틱당 CPU 비용 측정.
+
+    python -m benchmarks.inflight_cache [concurrent_queries] [ticks] [sql_length]
+
+동시에 실행 중인 장시간 쿼리 N건(기본 10,000건)을 매 틱 다시 관측하는 상황을 흉내 내어
+기존 방식(매 틱 dataclass 재생성 + 정규식 두 번)과 InFlightQueryCache의 CPU 시간을 비교한다.
+"""
+import re
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from collector.slow_query_cache import InFlightQueryCache
+
+EXEC_TIME = 2
+
+
+@dataclass
+class LegacyQueryDetails:
+    instance: str
+    db: str
+    pid: int
+    user: str
+    host: str
+    time: int
+    sql_text: str
+    start: datetime
+
+
+def legacy_tick(cache: dict, rows: list, now: datetime) -> None:
+    for instance_name, (pid, db, user, host, elapsed, info) in rows:
+        if elapsed >= EXEC_TIME:
+            cache_data = cache.setdefault((instance_name, pid), {'max_time': 0})
+            cache_data['max_time'] = max(cache_data['max_time'], elapsed)
+            if 'start' not in cache_data:
+                cache_data['start'] = now - timedelta(seconds=EXEC_TIME)
+            info_cleaned = re.sub(' +', ' ', info).encode('utf-8', 'ignore').decode('utf-8')
+            info_cleaned = re.sub(r'[\n\t\r]+', ' ', info_cleaned).strip()
+            cache_data['details'] = LegacyQueryDetails(
+                instance_name, db, pid, user, host, elapsed, info_cleaned, cache_data['start']
+            )
+
+
+def cache_tick(cache: InFlightQueryCache, rows: list, now: datetime) -> None:
+    for instance_name, (pid, db, user, host, elapsed, info) in rows:
+        cache.observe(instance_name, pid, db, user, host, elapsed, info, now, EXEC_TIME)
+
+
+def make_rows(concurrent: int, sql_length: int, tick: int) -> list:
+    rows = []
+    for i in range(concurrent):
+        body = f"SELECT /* batch {i} */ *\n  FROM orders o\n  WHERE o.id IN ({', '.join(str(n) for n in range(i % 50))})"
+        info = (body + "\n\tAND o.note = 'x'  " * (sql_length // 30))[:sql_length]
+        # 드라이버가 매번 새 문자열 객체를 돌려주는 것을 흉내 냄
+        rows.append((f"instance-{i % 100}", (i, 'db', 'app', '10.0.0.1', EXEC_TIME + tick, ''.join(info))))
+    return rows
+
+
+def measure(tick_func, state, concurrent: int, ticks: int, sql_length: int) -> list:
+    samples = []
+    now = datetime.now(timezone.utc)
+    for tick in range(ticks):
+        rows = make_rows(concurrent, sql_length, tick)
+        started = time.process_time()
+        tick_func(state, rows, now + timedelta(seconds=tick))
+        samples.append((time.process_time() - started) * 1000)
+    return samples
+
+
+def main(concurrent: int, ticks: int, sql_length: int) -> None:
+    legacy = measure(legacy_tick, {}, concurrent, ticks, sql_length)
+    cache = InFlightQueryCache(max_entries=concurrent * 2)
+    compact = measure(cache_tick, cache, concurrent, ticks, sql_length)
+
+    print(f"concurrent={concurrent} ticks={ticks} sql_length={sql_length}")
+    print(f"legacy   first tick {legacy[0]:.1f} ms, steady tick avg {sum(legacy[1:]) / max(len(legacy) - 1, 1):.1f} ms")
+    print(f"inflight first tick {compact[0]:.1f} ms, steady tick avg {sum(compact[1:]) / max(len(compact) - 1, 1):.1f} ms")
+    print(f"inflight cache stats: {cache.get_stats()}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [10000, 10, 2000][len(args):]))
@@ -0,0 +1,50 @@
+"""
+MongoDBConnector.get_database() 요청 지연 비교.
+
+    python -m benchmarks.mongodb_get_database [iterations]
+
+기존 방식(매 호출 admin ping 후 DB 핸들 반환)과 heartbeat 기반 캐시 핸들 방식에서
+API 요청 한 건에 해당하는 작업(get_database + find_one 한 번)의 지연 시간을 비교한다.
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from modules.mongodb_connector import MongoDBConnector
+from config import MONGODB_DB_NAME, MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME
+
+
+async def legacy_get_database():
+    await MongoDBConnector.client.admin.command('ping')
+    return MongoDBConnector.client[MONGODB_DB_NAME]
+
+
+async def measure(get_database, iterations: int) -> dict:
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        db = await get_database()
+        await db[MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME].find_one({}, {'_id': 1})
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    return {
+        'avg_ms': round(statistics.mean(latencies), 3),
+        'p50_ms': round(latencies[len(latencies) // 2], 3),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+    }
+
+
+async def main(iterations: int) -> None:
+    await MongoDBConnector.initialize()
+    # 연결 수립 비용이 결과에 섞이지 않도록 먼저 한 번 호출
+    await legacy_get_database()
+
+    print('ping per call :', await measure(legacy_get_database, iterations))
+    print('cached handle :', await measure(MongoDBConnector.get_database, iterations))
+    await MongoDBConnector.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,66 @@
+"""
+슬로우 쿼리 수집 방식별 비용 비교.
+
+    python -m benchmarks.slow_query_capture <instance_name> [iterations]
+
+instance_list 컬렉션에 등록된 인스턴스에 대해 processlist / performance_schema
+두 수집 쿼리를 번갈아 실행하고, 틱당 전송 행 수와 쿼리 지연 시간을 출력한다.
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import asyncmy
+
+from collector.mysql_slow_queries import (
+    CAPTURE_MODE_PROCESSLIST, CAPTURE_MODE_PERFORMANCE_SCHEMA, fetch_running_queries
+)
+from modules.crypto_utils import decrypt_password
+from modules.load_instance import load_instances_from_mongodb
+from modules.mongodb_connector import MongoDBConnector
+
+
+async def measure(conn, capture_mode: str, iterations: int) -> dict:
+    latencies = []
+    rows = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = await fetch_running_queries(conn, capture_mode)
+        latencies.append((time.perf_counter() - started) * 1000)
+        rows.append(len(result))
+        await asyncio.sleep(0.1)
+
+    latencies.sort()
+    return {
+        'mode': capture_mode,
+        'avg_rows': round(statistics.mean(rows), 2),
+        'max_rows': max(rows),
+        'avg_ms': round(statistics.mean(latencies), 3),
+        'p50_ms': round(latencies[len(latencies) // 2], 3),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+    }
+
+
+async def main(instance_name: str, iterations: int) -> None:
+    await MongoDBConnector.initialize()
+    instances = await load_instances_from_mongodb()
+    instance = next((item for item in instances if item["instance_name"] == instance_name), None)
+    if instance is None:
+        raise SystemExit(f"Instance {instance_name} not found in instance list")
+
+    conn = await asyncmy.connect(
+        host=instance["host"], port=instance.get("port", 3306),
+        user=instance["user"], password=decrypt_password(instance["password"]), db=instance.get("db", "")
+    )
+    try:
+        for mode in (CAPTURE_MODE_PROCESSLIST, CAPTURE_MODE_PERFORMANCE_SCHEMA):
+            print(await measure(conn, mode, iterations))
+    finally:
+        await conn.ensure_closed()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        raise SystemExit(__doc__)
+    asyncio.run(main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 100))
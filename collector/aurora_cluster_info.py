@@ -3,6 +3,7 @@ import boto3
 from botocore.exceptions import ClientError
 import logging
 from modules.mongodb_connector import MongoDBConnector
+from modules.response_cache import bump_data_version
 from pymongo import UpdateOne
 from datetime import datetime
 from config import (
@@ -90,6 +91,7 @@ class AuroraInfoCollector:
         if update_operations:
             result = await aurora_info_collection.bulk_write(update_operations)
             logger.info(f"Bulk update completed. Modified {result.modified_count} documents.")
+            await bump_data_version(MONGODB_AURORA_INFO_COLLECTION_NAME)
 
 async def run_aurora_info_collector():
     collector = AuroraInfoCollector()
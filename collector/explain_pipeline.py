@@ -0,0 +1,195 @@
+"""
+슬로우 쿼리 자동 EXPLAIN 파이프라인.
+
+새로 저장된 슬로우 SELECT를 큐에 넣고, 워커가 modules.explain_executor로 EXPLAIN FORMAT=JSON을 실행해
+플랜 컬렉션에 저장한다(source=auto). 플랜 캐시에 같은 쿼리 형태의 플랜이 있으면 EXPLAIN을 다시 실행하지 않는다.
+폴링 루프는 offer()로 큐에 넣기만 하므로 EXPLAIN 때문에 멈추지 않는다.
+  - 큐 크기 제한(EXPLAIN_PIPELINE_QUEUE_SIZE): 가득 차면 새 항목을 버림
+  - (instance, digest) 기준 중복 제거: 큐에 있거나 EXPLAIN_PIPELINE_DEDUP_TTL초 안에 실행한 fingerprint는 건너뜀
+  - 인스턴스별 분당 실행 수(EXPLAIN_PIPELINE_RATE_PER_MINUTE)와 시간당 예산(EXPLAIN_PIPELINE_HOURLY_BUDGET)
+  - 제한 시간 초과/연결 실패가 난 인스턴스는 EXPLAIN_PIPELINE_COOLDOWN초 동안 쉼
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from asyncmy.errors import OperationalError
+
+from modules.explain_executor import explain_executor, validate_sql_query
+from modules.plan_store import explain_slow_query, SOURCE_AUTO
+from modules.response_cache import bump_data_version
+from config import (
+    MONGODB_PLAN_COLLECTION_NAME, DATA_VERSION_BUMP_MIN_INTERVAL,
+    EXPLAIN_PIPELINE_QUEUE_SIZE, EXPLAIN_PIPELINE_WORKERS, EXPLAIN_PIPELINE_RATE_PER_MINUTE,
+    EXPLAIN_PIPELINE_HOURLY_BUDGET, EXPLAIN_PIPELINE_DEDUP_TTL, EXPLAIN_PIPELINE_COOLDOWN
+)
+
+logger = logging.getLogger(__name__)
+
+# 중복 제거용으로 기억하는 최대 fingerprint 수 (초과 시 오래된 것부터 잊음)
+DEDUP_MAX_ENTRIES = 10000
+
+
+class InstanceBudget:
+    """인스턴스별 토큰 버킷(분당 실행 수) + 1시간 단위 예산 + 실패 후 휴지 시간."""
+
+    def __init__(self, rate_per_minute: float, hourly_budget: int):
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = max(rate_per_minute, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.hourly_budget = hourly_budget
+        self.hour_started_at = self.updated_at
+        self.used_this_hour = 0
+        self.cooldown_until = 0.0
+
+    def try_acquire(self) -> Optional[str]:
+        """실행할 수 있으면 None, 아니면 건너뛴 이유를 반환한다."""
+        now = time.monotonic()
+        if now < self.cooldown_until:
+            return 'cooldown'
+        if now - self.hour_started_at >= 3600:
+            self.hour_started_at = now
+            self.used_this_hour = 0
+        if self.hourly_budget > 0 and self.used_this_hour >= self.hourly_budget:
+            return 'budget_exhausted'
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+        if self.tokens < 1:
+            return 'rate_limited'
+        self.tokens -= 1
+        self.used_this_hour += 1
+        return None
+
+    def cool_down(self, seconds: float) -> None:
+        self.cooldown_until = time.monotonic() + seconds
+
+
+class ExplainPipeline:
+    def __init__(self, get_instance: Callable[[str], Optional[Dict[str, Any]]],
+                 queue_size: int = EXPLAIN_PIPELINE_QUEUE_SIZE, workers: int = EXPLAIN_PIPELINE_WORKERS):
+        # 폴링 중인 인스턴스의 접속 정보를 이름으로 찾음
+        self.get_instance = get_instance
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.worker_count = workers
+        self.queued: set = set()
+        self.explained: 'OrderedDict[Tuple[str, str], float]' = OrderedDict()
+        self.budgets: Dict[str, InstanceBudget] = {}
+        self.workers: List[asyncio.Task] = []
+        self.stats = {'offered': 0, 'queued': 0, 'not_select': 0, 'duplicates': 0, 'queue_full': 0,
+                      'explained': 0, 'cache_hits': 0, 'rate_limited': 0, 'budget_exhausted': 0, 'cooldown': 0,
+                      'unknown_instance': 0, 'timeouts': 0, 'errors': 0}
+
+    def _recently_explained(self, key: Tuple[str, str]) -> bool:
+        explained_at = self.explained.get(key)
+        if explained_at is None:
+            return False
+        if time.monotonic() - explained_at > EXPLAIN_PIPELINE_DEDUP_TTL:
+            del self.explained[key]
+            return False
+        return True
+
+    def offer(self, document: Dict[str, Any]) -> bool:
+        """슬로우 쿼리 문서를 EXPLAIN 대기열에 넣는다. 기다리지 않으며 넣었으면 True."""
+        self.stats['offered'] += 1
+        # db가 없는 쿼리는 실행기가 거부하므로(풀 연결의 기본 db 문제) 큐에 넣지 않음
+        if not document.get('digest') or not document.get('sql_text') or not document.get('db'):
+            self.stats['not_select'] += 1
+            return False
+        try:
+            validate_sql_query(document['sql_text'])
+        except ValueError:
+            self.stats['not_select'] += 1
+            return False
+
+        key = (document['instance'], document['digest'])
+        if key in self.queued or self._recently_explained(key):
+            self.stats['duplicates'] += 1
+            return False
+        try:
+            self.queue.put_nowait(document)
+        except asyncio.QueueFull:
+            self.stats['queue_full'] += 1
+            return False
+        self.queued.add(key)
+        self.stats['queued'] += 1
+        return True
+
+    async def on_slow_queries_saved(self, documents: List[Dict[str, Any]]) -> None:
+        for document in documents:
+            self.offer(document)
+
+    async def _worker(self) -> None:
+        while True:
+            document = await self.queue.get()
+            key = (document['instance'], document['digest'])
+            try:
+                await self.process(document, key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Automatic EXPLAIN failed for {document['instance']} PID {document['pid']}: {e}")
+            finally:
+                self.queued.discard(key)
+                self.queue.task_done()
+
+    async def process(self, document: Dict[str, Any], key: Tuple[str, str]) -> None:
+        instance_name = document['instance']
+        instance = self.get_instance(instance_name)
+        if instance is None:
+            self.stats['unknown_instance'] += 1
+            return
+
+        budget = self.budgets.setdefault(
+            instance_name, InstanceBudget(EXPLAIN_PIPELINE_RATE_PER_MINUTE, EXPLAIN_PIPELINE_HOURLY_BUDGET)
+        )
+        # 한도를 넘은 항목은 기다리지 않고 버리며, 같은 fingerprint가 다시 잡히면 그때 실행함
+        reason = budget.try_acquire()
+        if reason is not None:
+            self.stats[reason] += 1
+            return
+
+        try:
+            _, cache_hit = await explain_slow_query(instance, document, SOURCE_AUTO)
+        except (asyncio.TimeoutError, ConnectionError, OperationalError) as e:
+            # 응답이 느리거나 연결할 수 없는 인스턴스에는 한동안 EXPLAIN을 보내지 않음
+            # (풀이 새 연결을 맺다 실패하면 드라이버의 OperationalError(2003, 2013 등)가 올라옴)
+            self.stats['timeouts' if isinstance(e, asyncio.TimeoutError) else 'errors'] += 1
+            budget.cool_down(EXPLAIN_PIPELINE_COOLDOWN)
+            logger.warning(f"Pausing automatic EXPLAIN on {instance_name} for {EXPLAIN_PIPELINE_COOLDOWN}s: "
+                           f"{type(e).__name__} {e}")
+            return
+
+        self.stats['cache_hits' if cache_hit else 'explained'] += 1
+        self.explained[key] = time.monotonic()
+        self.explained.move_to_end(key)
+        while len(self.explained) > DEDUP_MAX_ENTRIES:
+            self.explained.popitem(last=False)
+        # 캐시 적중은 새 플랜이 아니므로 버전을 올리지 않음
+        if not cache_hit:
+            await bump_data_version(MONGODB_PLAN_COLLECTION_NAME, min_interval=DATA_VERSION_BUMP_MIN_INTERVAL)
+
+    def start(self) -> None:
+        if not self.workers:
+            self.workers = [
+                asyncio.create_task(self._worker(), name=f"explain-pipeline-{index}")
+                for index in range(self.worker_count)
+            ]
+
+    async def close(self) -> None:
+        """대기 중인 항목은 버린다(다음에 같은 fingerprint가 잡히면 다시 실행됨)."""
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'queue_size': self.queue.qsize(),
+            'remembered_fingerprints': len(self.explained),
+            'executor': explain_executor.get_stats(),
+        }
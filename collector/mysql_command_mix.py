@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import pytz
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from modules.load_instance import InstanceWatcher
+from modules.mongodb_connector import MongoDBConnector
+from modules.mysql_pool_registry import MySQLPoolRegistry
+from modules.index_manager import ensure_indexes
+from modules.response_cache import bump_data_version
+from collector.mysql_status_snapshot import StatusSnapshotEngine
+from collector.mysql_status_delta import StatusDeltaEngine
+from config import (
+    MONGODB_COMMAND_MIX_COLLECTION_NAME, DESIRED_COMMANDS, COMMAND_MIX_SAMPLE_INTERVAL,
+    COMMAND_MIX_BUFFER_SIZE, LOG_LEVEL, LOG_FORMAT
+)
+
+logging.basicConfig(level=getattr(logging, LOG_LEVEL), format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 롤업 단위와 길이(초). 일 단위 구간은 KST 자정 기준으로 자름
+ROLLUP_RESOLUTIONS = (('1m', 60), ('1h', 3600), ('1d', 86400))
+KST_OFFSET_SECONDS = 9 * 3600
+
+
+def bucket_start(taken_at: datetime, seconds: int) -> datetime:
+    epoch = int(taken_at.timestamp()) + KST_OFFSET_SECONDS
+    return datetime.fromtimestamp(epoch - epoch % seconds - KST_OFFSET_SECONDS, pytz.utc)
+
+
+class RateStats:
+    __slots__ = ('min', 'max', 'total', 'count')
+
+    def __init__(self):
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.total += value
+        self.count += 1
+
+
+class InstanceCommandMix:
+    """
+    인스턴스 하나의 명령별 초당 실행률 샘플을 고정 크기 링 버퍼에 보관한다.
+    분이 바뀌면 지난 1분 구간의 샘플을 명령별 min/max/합계/개수로 줄여 반환한다.
+    """
+
+    def __init__(self, instance_name: str, buffer_size: int):
+        self.instance_name = instance_name
+        self.samples: Deque[Tuple[datetime, Dict[str, float]]] = deque(maxlen=buffer_size)
+        self.current_minute: Optional[datetime] = None
+
+    def add_sample(self, taken_at: datetime, rates: Dict[str, float]) -> Optional[Tuple[datetime, int, Dict[str, RateStats]]]:
+        minute = bucket_start(taken_at, 60)
+        closed = None
+        if self.current_minute is not None and minute != self.current_minute:
+            closed = self.close_minute()
+        self.current_minute = minute
+        self.samples.append((taken_at, rates))
+        return closed
+
+    def close_minute(self) -> Optional[Tuple[datetime, int, Dict[str, RateStats]]]:
+        minute = self.current_minute
+        if minute is None:
+            return None
+        stats: Dict[str, RateStats] = {}
+        sample_count = 0
+        for taken_at, rates in self.samples:
+            if bucket_start(taken_at, 60) != minute:
+                continue
+            sample_count += 1
+            for command, rate in rates.items():
+                stats.setdefault(command, RateStats()).add(rate)
+        self.current_minute = None
+        if not sample_count:
+            return None
+        return minute, sample_count, stats
+
+
+class CommandMixSampler:
+    """
+    Com_ 카운터를 몇 초 간격으로 샘플링해 인스턴스별 링 버퍼에 쌓고,
+    1분이 지날 때마다 1분/1시간/1일 롤업 문서에 $min/$max/$inc로 합쳐 저장한다.
+    샘플마다 문서를 쓰지 않으므로 저장량은 인스턴스당 분당 롤업 3건으로 고정된다.
+    """
+
+    def __init__(self, sample_interval: float = COMMAND_MIX_SAMPLE_INTERVAL,
+                 buffer_size: int = COMMAND_MIX_BUFFER_SIZE):
+        self.sample_interval = sample_interval
+        # 1분 구간 샘플이 모두 남아 있도록 버퍼 크기를 보정
+        self.buffer_size = max(buffer_size, int(60 / sample_interval) + 2)
+        self.snapshot_engine = StatusSnapshotEngine(DESIRED_COMMANDS)
+        # 몇 초 간격 샘플이라 초 단위 Uptime 대신 조회 시각(monotonic) 차이로 실행률을 계산
+        self.delta_engine = StatusDeltaEngine(monotonic_interval=True)
+        self.instances: Dict[str, Dict[str, Any]] = {}
+        self.mixes: Dict[str, InstanceCommandMix] = {}
+        self.pending: List[UpdateOne] = []
+        self.collection = None
+        self.watcher_task: Optional[asyncio.Task] = None
+        self.stats = {'samples': 0, 'errors': 0, 'rollups_written': 0, 'write_errors': 0}
+
+    async def initialize(self):
+        await MongoDBConnector.initialize()
+        mongodb = await MongoDBConnector.get_database()
+        self.collection = mongodb[MONGODB_COMMAND_MIX_COLLECTION_NAME]
+        await ensure_indexes([MONGODB_COMMAND_MIX_COLLECTION_NAME])
+
+    async def update_instances(self, instances: List[Dict[str, Any]]) -> None:
+        desired = {instance['instance_name']: instance for instance in instances}
+        for instance_name in list(self.instances):
+            if instance_name not in desired:
+                self.queue_rollup(instance_name, self.mixes[instance_name].close_minute())
+                self.mixes.pop(instance_name, None)
+                self.delta_engine.forget(instance_name)
+        for instance_name in desired:
+            self.mixes.setdefault(instance_name, InstanceCommandMix(instance_name, self.buffer_size))
+        self.instances = desired
+
+    async def sample_instance(self, instance: Dict[str, Any]) -> None:
+        instance_name = instance['instance_name']
+        try:
+            # 시간 초과 시 조회 중이던 연결은 MySQLPoolRegistry.acquire가 닫음
+            async with MySQLPoolRegistry.acquire(instance) as conn:
+                snapshot = await asyncio.wait_for(
+                    self.snapshot_engine.fetch(instance_name, conn), timeout=self.sample_interval
+                )
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.debug(f"Command mix sample failed for {instance_name}: {e}")
+            return
+        if snapshot is None:
+            self.stats['errors'] += 1
+            return
+
+        delta = self.delta_engine.compute(snapshot, self.delta_engine.previous.get(instance_name))
+        # 카운터가 초기화된 구간은 부팅 이후 평균이라 샘플로 쓰지 않음
+        if delta is None or delta.counter_reset:
+            return
+        rates = {command[4:]: rate for command, rate in delta.rates.items() if rate is not None}
+        mix = self.mixes.get(instance_name)
+        if mix is None:
+            return
+        self.stats['samples'] += 1
+        self.queue_rollup(instance_name, mix.add_sample(snapshot.taken_at, rates))
+
+    def queue_rollup(self, instance_name: str,
+                     closed: Optional[Tuple[datetime, int, Dict[str, RateStats]]]) -> None:
+        if closed is None:
+            return
+        minute, sample_count, stats = closed
+        for resolution, seconds in ROLLUP_RESOLUTIONS:
+            start = bucket_start(minute, seconds)
+            update = {
+                '$setOnInsert': {'instance_name': instance_name, 'resolution': resolution, 'bucket_start': start},
+                '$inc': {'samples': sample_count},
+                '$min': {},
+                '$max': {},
+            }
+            for command, command_stats in stats.items():
+                update['$inc'][f'commands.{command}.sum'] = command_stats.total
+                update['$inc'][f'commands.{command}.count'] = command_stats.count
+                update['$min'][f'commands.{command}.min'] = command_stats.min
+                update['$max'][f'commands.{command}.max'] = command_stats.max
+            # 비어 있는 갱신 연산자는 MongoDB가 거부하므로 제거
+            update = {operator: fields for operator, fields in update.items() if fields}
+            document_id = f"{instance_name}:{resolution}:{start.strftime('%Y%m%d%H%M')}"
+            self.pending.append(UpdateOne({'_id': document_id}, update, upsert=True))
+
+    async def flush(self) -> None:
+        if not self.pending or self.collection is None:
+            return
+        operations, self.pending = self.pending, []
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            self.stats['rollups_written'] += result.upserted_count + result.modified_count
+            await bump_data_version(MONGODB_COMMAND_MIX_COLLECTION_NAME)
+        except BulkWriteError as e:
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+            self.stats['write_errors'] += len(failed)
+            logger.error(f"Failed to write {len(failed)} command mix rollups: {e.details.get('writeErrors', [])[:1]}")
+        except Exception as e:
+            # $inc 갱신이라 전체 실패한 경우에만 다음 주기에 다시 시도함
+            self.stats['write_errors'] += len(operations)
+            self.pending = operations + self.pending
+            logger.error(f"Failed to write command mix rollups: {e}")
+
+    async def run(self):
+        await self.initialize()
+        watcher = InstanceWatcher(self.update_instances)
+        self.watcher_task = asyncio.create_task(watcher.watch())
+        next_tick = time.monotonic()
+        try:
+            while True:
+                await asyncio.gather(*(self.sample_instance(instance) for instance in list(self.instances.values())))
+                await self.flush()
+                next_tick += self.sample_interval
+                delay = next_tick - time.monotonic()
+                if delay < 0:
+                    next_tick = time.monotonic()
+                    delay = 0
+                await asyncio.sleep(delay)
+        finally:
+            await self.cleanup()
+
+    async def cleanup(self):
+        if self.watcher_task is not None:
+            self.watcher_task.cancel()
+            await asyncio.gather(self.watcher_task, return_exceptions=True)
+            self.watcher_task = None
+        # 진행 중인 1분 구간도 버리지 않고 저장함
+        for instance_name, mix in self.mixes.items():
+            self.queue_rollup(instance_name, mix.close_minute())
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'instances': len(self.instances), 'pending': len(self.pending)}
+
+
+async def run_command_mix_sampler():
+    sampler = CommandMixSampler()
+    try:
+        await sampler.run()
+    finally:
+        await MySQLPoolRegistry.close_all()
+
+
+if __name__ == '__main__':
+    asyncio.run(run_command_mix_sampler())
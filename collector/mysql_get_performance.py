@@ -1,9 +1,8 @@
 import asyncio
-import asyncmy
 from pymongo import UpdateOne
 
 from modules.mongodb_connector import MongoDBConnector
-from modules.crypto_utils import decrypt_password
+from modules.mysql_pool_registry import MySQLPoolRegistry
 from modules.load_instance import load_instances_from_mongodb
 from config import MONGODB_HISTORY_COLLECTION_NAME, MONGODB_DIGEST_COLLECTION_NAME
 
@@ -102,12 +101,16 @@ async def collect_and_store_data(instance_data, pool, db):
     digest_collection = db[MONGODB_DIGEST_COLLECTION_NAME]
     history_collection = db[MONGODB_HISTORY_COLLECTION_NAME]
 
-    async with pool.acquire() as conn:
-        # Run digest and history data collection in parallel
-        await asyncio.gather(
-            collect_and_store_digest_data(instance_name, conn, digest_collection),
-            collect_and_store_history_data(instance_name, conn, history_collection)
-        )
+    async def collect_digest():
+        async with pool.acquire() as conn:
+            await collect_and_store_digest_data(instance_name, conn, digest_collection)
+
+    async def collect_history():
+        async with pool.acquire() as conn:
+            await collect_and_store_history_data(instance_name, conn, history_collection)
+
+    # Run digest and history data collection in parallel, each on its own pooled connection
+    await asyncio.gather(collect_digest(), collect_history())
 
 
 async def run():
@@ -116,13 +119,11 @@ async def run():
         db = await MongoDBConnector.get_database()
         instances = await load_instances_from_mongodb()
 
+        pools = await MySQLPoolRegistry.ensure_pools(instances)
         tasks = []
-        for instance_data in instances:
-            pool = await asyncmy.create_pool(
-                host=instance_data["host"], port=instance_data["port"],
-                user=instance_data["user"], password=decrypt_password(instance_data["password"]),
-                db=instance_data.get("db", "")
-            )
+        for instance_data, pool in zip(instances, pools):
+            if pool is None:
+                continue
             task = collect_and_store_data(instance_data, pool, db)
             tasks.append(task)
 
@@ -131,5 +132,12 @@ async def run():
     except Exception as e:
         print(f"An error occurred: {e}")
 
+
+async def run_and_close():
+    try:
+        await run()
+    finally:
+        await MySQLPoolRegistry.close_all()
+
 if __name__ == '__main__':
-    asyncio.run(run())
+    asyncio.run(run_and_close())
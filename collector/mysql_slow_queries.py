@@ -1,20 +1,32 @@
 import asyncio
 import asyncmy
 import pytz
-import re
-from datetime import datetime, timedelta
+import time as time_module
+from datetime import datetime
 from typing import Dict, List, Any, Optional
 import logging
 from dataclasses import dataclass
 
 from dotenv import load_dotenv
 from modules.mongodb_connector import MongoDBConnector
-from modules.crypto_utils import decrypt_password
-from modules.load_instance import load_instances_from_mongodb
+from modules.mysql_pool_registry import MySQLPoolRegistry
+from modules.index_manager import ensure_indexes
+from modules.load_instance import load_instances_from_mongodb, InstanceWatcher
+from modules.write_buffer import WriteBehindBuffer
+from modules.slow_query_summary import SlowQuerySummary
+from modules.explain_executor import EXPLAIN_POOL_SUFFIX
+from collector.explain_pipeline import ExplainPipeline
+from collector.slow_query_cache import InFlightQueryCache, InFlightQuery
+from collector.slow_query_checkpoint import SlowQueryCheckpoint
 from config import (
-    MONGODB_SLOWLOG_COLLECTION_NAME, EXEC_TIME, POOL_SIZE,
-    MAX_RETRIES, RETRY_DELAY, LOG_LEVEL, LOG_FORMAT,
-    IGNORE_LOGGERS, IGNORE_MESSAGES
+    MONGODB_SLOWLOG_COLLECTION_NAME, MONGODB_SLOWLOG_CHECKPOINT_COLLECTION_NAME,
+    MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME, EXEC_TIME,
+    RETRY_DELAY, LOG_LEVEL, LOG_FORMAT,
+    IGNORE_LOGGERS, IGNORE_MESSAGES,
+    SLOW_QUERY_FLUSH_BATCH_SIZE, SLOW_QUERY_FLUSH_INTERVAL, SLOW_QUERY_BUFFER_MAX_SIZE,
+    SLOW_QUERY_POLL_INTERVAL, SLOW_QUERY_POLL_TIMEOUT, SLOW_QUERY_STATS_LOG_INTERVAL,
+    SLOW_QUERY_CAPTURE_MODE, SLOW_QUERY_INFLIGHT_MAX_ENTRIES, SLOW_QUERY_CHECKPOINT_INTERVAL,
+    EXPLAIN_PIPELINE_ENABLED
 )
 
 load_dotenv()
@@ -40,143 +52,188 @@ for logger_name in IGNORE_LOGGERS:
 for handler in logging.root.handlers:
     handler.addFilter(IgnoreFilter(IGNORE_MESSAGES))
 
+CAPTURE_MODE_PROCESSLIST = 'processlist'
+CAPTURE_MODE_PERFORMANCE_SCHEMA = 'performance_schema'
+
+# 실행 중인 모든 세션을 가져와 클라이언트에서 실행 시간을 거름 (MySQL 8 / Aurora 3에서 deprecated, 글로벌 뮤텍스 사용)
+PROCESSLIST_QUERY = """SELECT `ID`, `DB`, `USER`, `HOST`, `TIME`, `INFO`
+                        FROM `information_schema`.`PROCESSLIST`
+                        WHERE info IS NOT NULL
+                        AND DB not in ('information_schema', 'mysql', 'performance_schema')
+                        AND USER not in ('monitor', 'rdsadmin', 'system user')
+                        ORDER BY `TIME` DESC"""
+
+# 뮤텍스 없이 performance_schema에서 읽고, 실행 시간 조건을 서버에서 걸러 슬로우 쿼리만 전송받음
+# SQL_TEXT는 performance_schema_max_sql_text_length(기본 1024)까지만 저장됨
+PERFORMANCE_SCHEMA_QUERY = """SELECT t.`PROCESSLIST_ID`, t.`PROCESSLIST_DB`, t.`PROCESSLIST_USER`,
+                                t.`PROCESSLIST_HOST`, t.`PROCESSLIST_TIME`, s.`SQL_TEXT`
+                        FROM `performance_schema`.`threads` t
+                        INNER JOIN `performance_schema`.`events_statements_current` s
+                            ON s.`THREAD_ID` = t.`THREAD_ID`
+                        WHERE t.`TYPE` = 'FOREGROUND'
+                        AND t.`PROCESSLIST_COMMAND` = 'Query'
+                        AND t.`PROCESSLIST_TIME` >= %s
+                        AND s.`END_EVENT_ID` IS NULL
+                        AND s.`SQL_TEXT` IS NOT NULL
+                        AND t.`PROCESSLIST_DB` not in ('information_schema', 'mysql', 'performance_schema')
+                        AND t.`PROCESSLIST_USER` not in ('monitor', 'rdsadmin', 'system user')
+                        ORDER BY t.`PROCESSLIST_TIME` DESC"""
+
+
+def get_capture_mode(instance_data: Dict[str, Any]) -> str:
+    mode = instance_data.get("slow_query_capture_mode") or SLOW_QUERY_CAPTURE_MODE
+    if mode not in (CAPTURE_MODE_PROCESSLIST, CAPTURE_MODE_PERFORMANCE_SCHEMA):
+        logger.warning(f"Unknown capture mode '{mode}' for {instance_data.get('instance_name')}, "
+                       f"falling back to {CAPTURE_MODE_PROCESSLIST}")
+        return CAPTURE_MODE_PROCESSLIST
+    return mode
+
+
+async def fetch_running_queries(conn: Any, capture_mode: str) -> tuple:
+    async with conn.cursor() as cur:
+        if capture_mode == CAPTURE_MODE_PERFORMANCE_SCHEMA:
+            await cur.execute(PERFORMANCE_SCHEMA_QUERY, (EXEC_TIME,))
+        else:
+            await cur.execute(PROCESSLIST_QUERY)
+        return await cur.fetchall()
 
 
 @dataclass
-class QueryDetails:
-    instance: str
-    db: str
-    pid: int
-    user: str
-    host: str
-    time: int
-    sql_text: str
-    start: datetime
-    end: Optional[datetime] = None
+class InstancePollStats:
+    started_at: float
+    capture_mode: str = CAPTURE_MODE_PROCESSLIST
+    samples: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    skipped_ticks: int = 0
+    last_latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+    rows_fetched: int = 0
+    total_query_ms: float = 0.0
+
+    def achieved_rate(self, now: float) -> float:
+        elapsed = now - self.started_at
+        return round(self.samples / elapsed, 3) if elapsed > 0 else 0.0
 
 
 class SlowQueryMonitor:
     def __init__(self):
-        self.pid_time_cache: Dict[tuple, Dict[str, Any]] = {}
+        self.inflight = InFlightQueryCache(SLOW_QUERY_INFLIGHT_MAX_ENTRIES)
         self.ignore_instance_names: List[str] = []
-        self.pools: Dict[str, asyncmy.Pool] = {}
-
-    async def query_mysql_instance(self, instance_name: str, pool: asyncmy.Pool, collection: Any) -> None:
-        try:
-            if instance_name in self.ignore_instance_names:
-                logger.info(f"Skipping instance {instance_name} due to ignore list")
-                return
-
-            current_pids = set()
-            sql_query = """SELECT `ID`, `DB`, `USER`, `HOST`, `TIME`, `INFO`
-                            FROM `information_schema`.`PROCESSLIST`
-                            WHERE info IS NOT NULL
-                            AND DB not in ('information_schema', 'mysql', 'performance_schema')
-                            AND USER not in ('monitor', 'rdsadmin', 'system user')
-                            ORDER BY `TIME` DESC"""
+        self.write_buffer: Optional[WriteBehindBuffer] = None
+        self.summary: Optional[SlowQuerySummary] = None
+        self.explain_pipeline: Optional[ExplainPipeline] = None
+        self.checkpoint: Optional[SlowQueryCheckpoint] = None
+        self.instance_tasks: Dict[str, asyncio.Task] = {}
+        self.instance_configs: Dict[str, Dict[str, Any]] = {}
+        self.reconcile_lock = asyncio.Lock()
+        self.watcher_task: Optional[asyncio.Task] = None
+        self.poll_stats: Dict[str, InstancePollStats] = {}
+
+    async def query_mysql_instance(self, instance_name: str, pool: asyncmy.Pool,
+                                   capture_mode: str = CAPTURE_MODE_PROCESSLIST) -> None:
+        if instance_name in self.ignore_instance_names:
+            logger.info(f"Skipping instance {instance_name} due to ignore list")
+            return
+
+        current_pids = set()
+        async with pool.acquire() as conn:
+            started = time_module.perf_counter()
+            try:
+                result = await fetch_running_queries(conn, capture_mode)
+            except asyncio.CancelledError:
+                # 폴링 제한 시간(wait_for)으로 취소된 연결은 이전 결과가 남아 있을 수 있으므로 닫아서 버림
+                conn.close()
+                raise
+            query_ms = (time_module.perf_counter() - started) * 1000
 
-            async with pool.acquire() as conn:
-                async with conn.cursor() as cur:
-                    await cur.execute(sql_query)
-                    result = await cur.fetchall()
+        stats = self.poll_stats.get(instance_name)
+        if stats is not None:
+            stats.rows_fetched += len(result)
+            stats.total_query_ms += query_ms
 
-                    for row in result:
-                        await self.process_query_result(instance_name, row, current_pids)
+        now = datetime.now(pytz.utc)
+        for row in result:
+            self.process_query_result(instance_name, row, current_pids, now)
 
-                    await self.handle_finished_queries(instance_name, current_pids, collection)
+        await self.handle_finished_queries(instance_name, current_pids)
 
-            await asyncio.sleep(1)
-        except Exception as e:
-            logger.error(f"Error querying instance {instance_name}: {e}")
-
-    async def process_query_result(self, instance_name: str, row: tuple, current_pids: set) -> None:
+    def process_query_result(self, instance_name: str, row: tuple, current_pids: set, now: datetime) -> None:
         pid, db, user, host, time, info = row
         current_pids.add(pid)
 
-        if time >= EXEC_TIME:
-            cache_data = self.pid_time_cache.setdefault((instance_name, pid), {'max_time': 0})
-            cache_data['max_time'] = max(cache_data['max_time'], time)
-
-            if 'start' not in cache_data:
-                utc_now = datetime.now(pytz.utc)
-                utc_start_timestamp = int((utc_now - timedelta(seconds=EXEC_TIME)).timestamp())
-                utc_start_datetime = datetime.fromtimestamp(utc_start_timestamp, pytz.utc)
-                cache_data['start'] = utc_start_datetime
-
-            info_cleaned = re.sub(' +', ' ', info).encode('utf-8', 'ignore').decode('utf-8')
-            info_cleaned = re.sub(r'[\n\t\r]+', ' ', info_cleaned).strip()
-
-            cache_data['details'] = QueryDetails(
-                instance=instance_name,
-                db=db,
-                pid=pid,
-                user=user,
-                host=host,
-                time=time,
-                sql_text=info_cleaned,
-                start=cache_data['start']
-            )
-
-    async def handle_finished_queries(self, instance_name: str, current_pids: set, collection: Any) -> None:
-        for (instance, pid), cache_data in list(self.pid_time_cache.items()):
-            if pid not in current_pids and instance == instance_name:
-                data_to_insert = vars(cache_data['details'])
-                data_to_insert['time'] = cache_data['max_time']
-                data_to_insert['end'] = datetime.now(pytz.utc)
+        # 같은 PID에서 이전 슬로우 쿼리가 끝나고 다른 쿼리가 실행 중이면 이전 쿼리를 종료 처리
+        finished = self.inflight.observe(instance_name, pid, db, user, host, time, info, now, EXEC_TIME)
+        if finished is not None:
+            self.queue_finished_query(finished, now)
 
-                if not await collection.find_one({'_id': data_to_insert.get('_id')}):
-                    await collection.insert_one(data_to_insert)
-                    logger.info(f"Inserted slow query data for instance {instance_name}, PID {pid}")
+    async def handle_finished_queries(self, instance_name: str, current_pids: set) -> None:
+        now = datetime.now(pytz.utc)
+        for record in self.inflight.pop_finished(instance_name, current_pids):
+            self.queue_finished_query(record, now)
 
-                del self.pid_time_cache[(instance, pid)]
+        # 캐시 한도를 넘어 밀려난 항목은 마지막 관측 시각을 종료 시각으로 저장
+        for record in self.inflight.drain_evicted():
+            logger.warning(f"In-flight cache full, evicting PID {record.pid} on {record.instance}")
+            self.queue_finished_query(record, record.last_seen)
 
-    async def create_pool(self, instance_data: Dict[str, Any]) -> Optional[asyncmy.Pool]:
-        instance_name = instance_data["instance_name"]
-        for attempt in range(MAX_RETRIES):
-            try:
-                pool = await asyncmy.create_pool(
-                    host=instance_data["host"],
-                    port=instance_data["port"],
-                    user=instance_data["user"],
-                    password=decrypt_password(instance_data["password"]),
-                    db=instance_data.get("db", ""),
-                    maxsize=POOL_SIZE
-                )
-                logger.info(f"Connection pool created successfully for {instance_name}")
-                return pool
-            except Exception as e:
-                logger.error(f"Attempt {attempt + 1} failed for {instance_name}: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    await asyncio.sleep(RETRY_DELAY)
-                else:
-                    logger.error(f"Maximum retry attempts reached for {instance_name}. Skipping this instance.")
-                    return None
+    def queue_finished_query(self, record: InFlightQuery, end: datetime) -> None:
+        # (instance, pid, start) 유니크 인덱스로 중복 저장을 막으므로 조회 없이 버퍼에 적재
+        self.write_buffer.add(record.to_document(end))
+        logger.info(f"Queued slow query data for instance {record.instance}, PID {record.pid}")
 
     async def run_mysql_slow_queries(self) -> None:
         try:
             await MongoDBConnector.initialize()
             db = await MongoDBConnector.get_database()
             collection = db[MONGODB_SLOWLOG_COLLECTION_NAME]
+            # (instance, pid, start) 유니크 인덱스가 있어야 중복 저장이 막히므로 수집 전에 보장
+            await ensure_indexes([MONGODB_SLOWLOG_COLLECTION_NAME, MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME])
+
+            # 새로 저장된 쿼리만 일별 요약에 반영 (중복 키로 거절된 문서는 제외됨)
+            self.summary = SlowQuerySummary(db[MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME])
+            if EXPLAIN_PIPELINE_ENABLED:
+                self.explain_pipeline = ExplainPipeline(self.instance_configs.get)
+                self.explain_pipeline.start()
+            self.write_buffer = WriteBehindBuffer(
+                collection,
+                batch_size=SLOW_QUERY_FLUSH_BATCH_SIZE,
+                flush_interval=SLOW_QUERY_FLUSH_INTERVAL,
+                max_buffer_size=SLOW_QUERY_BUFFER_MAX_SIZE,
+                on_flushed=self.on_slow_queries_saved
+            )
+            self.write_buffer.start()
 
-            instances = await load_instances_from_mongodb()
+            # 재시작 전 실행 중이던 쿼리와 실제 시작 시각을 첫 폴링 전에 복원
+            self.checkpoint = SlowQueryCheckpoint(
+                db[MONGODB_SLOWLOG_CHECKPOINT_COLLECTION_NAME], self.inflight, SLOW_QUERY_CHECKPOINT_INTERVAL
+            )
+            await self.checkpoint.restore()
 
-            while True:
-                tasks = []
-                for instance_data in instances:
-                    instance_name = instance_data["instance_name"]
-                    if instance_name in self.ignore_instance_names:
-                        continue
+            instances = await load_instances_from_mongodb()
 
-                    if instance_name not in self.pools:
-                        self.pools[instance_name] = await self.create_pool(instance_data)
+            # 더 이상 모니터링하지 않는 인스턴스의 복원 항목은 마지막 관측 시각 기준으로 종료 처리
+            active_instance_names = {instance_data["instance_name"] for instance_data in instances}
+            for instance_name in set(self.inflight.by_instance) - active_instance_names:
+                for record in self.inflight.remove_instance(instance_name):
+                    self.queue_finished_query(record, record.last_seen)
+            self.checkpoint.start()
 
-                    if self.pools.get(instance_name):
-                        tasks.append(self.query_mysql_instance(instance_name, self.pools[instance_name], collection))
+            await self.reconcile_instances(instances)
 
-                if tasks:
-                    await asyncio.gather(*tasks)
+            # 인스턴스 목록 변경을 계속 감시해 재시작 없이 폴링 태스크를 추가/제거
+            watcher = InstanceWatcher(self.reconcile_instances)
+            self.watcher_task = asyncio.create_task(watcher.watch(), name="slow-query-instance-watcher")
 
-                await asyncio.sleep(1)
+            while True:
+                await asyncio.sleep(SLOW_QUERY_STATS_LOG_INTERVAL)
+                logger.info(f"Slow query poll stats: {self.get_poll_stats()}")
+                logger.info(f"Slow query write buffer stats: {self.write_buffer.get_stats()}")
+                logger.info(f"Slow query in-flight cache stats: {self.inflight.get_stats()}")
+                logger.info(f"Slow query checkpoint stats: {self.checkpoint.get_stats()}")
+                logger.info(f"Slow query summary stats: {self.summary.get_stats()}")
+                if self.explain_pipeline is not None:
+                    logger.info(f"Automatic EXPLAIN stats: {self.explain_pipeline.get_stats()}")
 
         except asyncio.CancelledError:
             logger.info("Async task was cancelled. Cleaning up...")
@@ -188,20 +245,160 @@ class SlowQueryMonitor:
         finally:
             await self.cleanup()
 
+    async def on_slow_queries_saved(self, documents: List[Dict[str, Any]]) -> None:
+        """새로 저장된 슬로우 쿼리를 일별 요약에 반영하고, 자동 EXPLAIN이 켜져 있으면 대기열에 넣는다."""
+        await self.summary.apply(documents)
+        if self.explain_pipeline is not None:
+            await self.explain_pipeline.on_slow_queries_saved(documents)
+
+    async def reconcile_instances(self, instances: List[Dict[str, Any]]) -> None:
+        """
+        현재 폴링 중인 인스턴스를 목록과 비교해 바뀐 인스턴스만 시작/중지/재시작한다.
+        인스턴스마다 독립된 폴링 태스크를 띄워 느린 인스턴스가 다른 인스턴스의 수집 주기에 영향을 주지 않도록 함
+        """
+        async with self.reconcile_lock:
+            desired = {
+                instance_data["instance_name"]: instance_data
+                for instance_data in instances
+                if instance_data["instance_name"] not in self.ignore_instance_names
+            }
+
+            for instance_name in list(self.instance_tasks):
+                if instance_name not in desired:
+                    logger.info(f"Instance {instance_name} was removed, stopping its slow query polling")
+                    await self.stop_instance_task(instance_name)
+                    await MySQLPoolRegistry.remove_instance(instance_name)
+                    await MySQLPoolRegistry.remove_instance(instance_name + EXPLAIN_POOL_SUFFIX)
+                    for record in self.inflight.remove_instance(instance_name):
+                        self.queue_finished_query(record, record.last_seen)
+
+            for instance_name, instance_data in desired.items():
+                task = self.instance_tasks.get(instance_name)
+                if task is not None and not task.done() and self.instance_configs.get(instance_name) == instance_data:
+                    continue
+                if task is not None and not task.done():
+                    logger.info(f"Instance {instance_name} settings changed, restarting its slow query polling")
+                    await self.stop_instance_task(instance_name)
+                self.start_instance_task(instance_data)
+
+    def start_instance_task(self, instance_data: Dict[str, Any]) -> None:
+        instance_name = instance_data["instance_name"]
+        task = self.instance_tasks.get(instance_name)
+        if task is None or task.done():
+            self.instance_configs[instance_name] = instance_data
+            self.instance_tasks[instance_name] = asyncio.create_task(
+                self.poll_instance_loop(instance_data), name=f"slow-query-{instance_name}"
+            )
+
+    async def stop_instance_task(self, instance_name: str) -> None:
+        task = self.instance_tasks.pop(instance_name, None)
+        self.instance_configs.pop(instance_name, None)
+        self.poll_stats.pop(instance_name, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def poll_instance_loop(self, instance_data: Dict[str, Any]) -> None:
+        instance_name = instance_data["instance_name"]
+        loop = asyncio.get_running_loop()
+        capture_mode = get_capture_mode(instance_data)
+        stats = self.poll_stats[instance_name] = InstancePollStats(started_at=loop.time(), capture_mode=capture_mode)
+        next_tick = loop.time()
+
+        while True:
+            pool = await MySQLPoolRegistry.get_pool(instance_data)
+            if pool is None:
+                await asyncio.sleep(RETRY_DELAY)
+                next_tick = loop.time()
+                continue
+
+            started = time_module.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    self.query_mysql_instance(instance_name, pool, capture_mode), timeout=SLOW_QUERY_POLL_TIMEOUT
+                )
+                stats.samples += 1
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                logger.warning(f"Polling instance {instance_name} timed out after {SLOW_QUERY_POLL_TIMEOUT}s")
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"Error querying instance {instance_name}: {e}")
+            latency_ms = (time_module.perf_counter() - started) * 1000
+            stats.last_latency_ms = round(latency_ms, 3)
+            stats.max_latency_ms = max(stats.max_latency_ms, stats.last_latency_ms)
+
+            # 드리프트 보정: 다음 틱은 이전 예정 시각 기준으로 계산하고, 밀린 틱은 건너뜀
+            next_tick += SLOW_QUERY_POLL_INTERVAL
+            delay = next_tick - loop.time()
+            if delay < 0:
+                missed = int(-delay // SLOW_QUERY_POLL_INTERVAL) + 1
+                stats.skipped_ticks += missed
+                next_tick += missed * SLOW_QUERY_POLL_INTERVAL
+                delay = next_tick - loop.time()
+            await asyncio.sleep(delay)
+
+    def get_poll_stats(self) -> Dict[str, Dict[str, Any]]:
+        now = asyncio.get_running_loop().time()
+        return {
+            instance_name: {
+                'capture_mode': stats.capture_mode,
+                'achieved_rate': stats.achieved_rate(now),
+                'target_rate': round(1 / SLOW_QUERY_POLL_INTERVAL, 3),
+                'samples': stats.samples,
+                'timeouts': stats.timeouts,
+                'errors': stats.errors,
+                'skipped_ticks': stats.skipped_ticks,
+                'last_latency_ms': stats.last_latency_ms,
+                'max_latency_ms': stats.max_latency_ms,
+                'avg_rows_per_poll': round(stats.rows_fetched / stats.samples, 2) if stats.samples else 0.0,
+                'avg_query_ms': round(stats.total_query_ms / stats.samples, 3) if stats.samples else 0.0,
+            }
+            for instance_name, stats in self.poll_stats.items()
+        }
+
     async def cleanup(self) -> None:
-        for pool_name, pool in self.pools.items():
-            if pool is not None:
-                try:
-                    pool.close()
-                    await pool.wait_closed()
-                    logger.info(f"Closed connection pool for {pool_name}")
-                except Exception as e:
-                    logger.error(f"An error occurred while closing the pool {pool_name}: {e}")
+        if self.watcher_task is not None:
+            self.watcher_task.cancel()
+            await asyncio.gather(self.watcher_task, return_exceptions=True)
+            self.watcher_task = None
+
+        for task in self.instance_tasks.values():
+            task.cancel()
+        if self.instance_tasks:
+            await asyncio.gather(*self.instance_tasks.values(), return_exceptions=True)
+        self.instance_tasks.clear()
+        self.instance_configs.clear()
+
+        if self.checkpoint is not None:
+            try:
+                await self.checkpoint.close()
+                logger.info(f"Saved in-flight slow query checkpoint: {self.checkpoint.get_stats()}")
+            except Exception as e:
+                logger.error(f"An error occurred while saving the in-flight checkpoint: {e}")
+            self.checkpoint = None
+
+        if self.explain_pipeline is not None:
+            await self.explain_pipeline.close()
+            logger.info(f"Automatic EXPLAIN stopped: {self.explain_pipeline.get_stats()}")
+            self.explain_pipeline = None
+
+        if self.write_buffer is not None:
+            await self.write_buffer.close()
+            logger.info(f"Slow query write buffer flushed: {self.write_buffer.get_stats()}")
+            self.write_buffer = None
 
         await asyncio.sleep(0.1)
         logger.info("Resources have been released and program has been terminated safely.")
 
 
-if __name__ == '__main__':
+async def run_slow_query_monitor():
     monitor = SlowQueryMonitor()
-    asyncio.run(monitor.run_mysql_slow_queries())
+    try:
+        await monitor.run_mysql_slow_queries()
+    finally:
+        await MySQLPoolRegistry.close_all()
+
+
+if __name__ == '__main__':
+    asyncio.run(run_slow_query_monitor())
@@ -0,0 +1,100 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from collector.mysql_status_snapshot import StatusSnapshot
+
+logger = logging.getLogger(__name__)
+
+# 재시작 후 직전 스냅샷을 복원할 수 있도록 수집 문서에 원본 카운터를 함께 저장하는 필드
+SNAPSHOT_FIELD = 'status_snapshot'
+
+
+@dataclass
+class StatusDelta:
+    interval_seconds: float
+    deltas: Dict[str, Optional[int]] = field(default_factory=dict)
+    rates: Dict[str, Optional[float]] = field(default_factory=dict)
+    counter_reset: bool = False
+
+
+class StatusDeltaEngine:
+    """
+    인스턴스별 직전 스냅샷과 비교하여 수집 구간의 증가량과 초당 증가율을 계산한다.
+    직전 스냅샷은 메모리에 두고, 프로세스 재시작 후에는 마지막으로 저장된 문서에서 복원한다.
+    구간 길이는 서버 Uptime 차이를 사용하므로 수집 지연과 무관하다.
+    Uptime은 초 단위 정수라 몇 초 간격 샘플에서는 오차가 크므로(5초 샘플이면 ±20%),
+    monotonic_interval=True이면 두 스냅샷의 조회 시각(monotonic) 차이를 구간 길이로 사용한다.
+    """
+
+    def __init__(self, monotonic_interval: bool = False):
+        self.previous: Dict[str, StatusSnapshot] = {}
+        self.monotonic_interval = monotonic_interval
+
+    @staticmethod
+    def to_document(snapshot: StatusSnapshot) -> Dict[str, Any]:
+        return {'uptime': snapshot.uptime, 'values': snapshot.values}
+
+    async def load_previous(self, instance_name: str, store) -> Optional[StatusSnapshot]:
+        if instance_name in self.previous:
+            return self.previous[instance_name]
+        try:
+            document = await store.find_latest(instance_name, projection={'timestamp': 1, SNAPSHOT_FIELD: 1})
+        except Exception as e:
+            logger.warning(f"Failed to load previous status snapshot for {instance_name}: {e}")
+            return None
+        # 원본 카운터를 저장하기 전의 문서라면 복원할 수 없음
+        if not document or SNAPSHOT_FIELD not in document:
+            return None
+        stored = document[SNAPSHOT_FIELD]
+        snapshot = StatusSnapshot(
+            instance_name=instance_name,
+            uptime=stored.get('uptime', 0),
+            values=stored.get('values', {}),
+            taken_at=document.get('timestamp')
+        )
+        self.previous[instance_name] = snapshot
+        return snapshot
+
+    def compute(self, snapshot: StatusSnapshot, previous: Optional[StatusSnapshot]) -> Optional[StatusDelta]:
+        """직전 스냅샷이 없거나 구간 길이가 0이면 None을 반환한다."""
+        self.previous[snapshot.instance_name] = snapshot
+        if previous is None:
+            return None
+
+        # 페일오버나 재부팅으로 Uptime이 줄었다면 모든 카운터가 0부터 다시 시작한 것으로 보고
+        # 부팅 이후 누적값 전체를 이번 구간의 증가량으로 사용함
+        if snapshot.uptime < previous.uptime:
+            logger.info(f"Status counters reset on {snapshot.instance_name} "
+                        f"(uptime {previous.uptime} -> {snapshot.uptime})")
+            return self._build(snapshot.uptime, snapshot.values, {}, counter_reset=True)
+
+        interval = snapshot.uptime - previous.uptime
+        if self.monotonic_interval and snapshot.monotonic_at is not None and previous.monotonic_at is not None:
+            interval = snapshot.monotonic_at - previous.monotonic_at
+        if interval <= 0:
+            return None
+        return self._build(interval, snapshot.values, previous.values, counter_reset=False)
+
+    @staticmethod
+    def _build(interval: float, current: Dict[str, int], previous: Dict[str, int],
+               counter_reset: bool) -> StatusDelta:
+        result = StatusDelta(interval_seconds=interval, counter_reset=counter_reset)
+        for name, value in current.items():
+            if not counter_reset and name not in previous:
+                # 직전 스냅샷에 없던 카운터(새로 수집 대상에 추가됨 등)는 누적값 전체가 증가량으로 잡히지 않도록 비워 둠
+                result.deltas[name] = None
+                result.rates[name] = None
+                continue
+            delta = value - previous.get(name, 0)
+            if delta < 0:
+                # FLUSH STATUS 등으로 일부 카운터만 초기화된 경우 구간 증가량을 알 수 없음
+                result.deltas[name] = None
+                result.rates[name] = None
+                continue
+            result.deltas[name] = delta
+            result.rates[name] = round(delta / max(interval, 1), 2)
+        return result
+
+    def forget(self, instance_name: str) -> None:
+        self.previous.pop(instance_name, None)
@@ -0,0 +1,91 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+PERFORMANCE_SCHEMA_STATUS_QUERY = """SELECT VARIABLE_NAME, VARIABLE_VALUE
+                                     FROM performance_schema.global_status
+                                     WHERE VARIABLE_NAME IN ({placeholders})"""
+
+# performance_schema가 꺼져 있거나 권한이 없는 인스턴스용. 역시 한 번의 왕복으로 조회함
+SHOW_STATUS_QUERY = "SHOW GLOBAL STATUS WHERE Variable_name IN ({placeholders})"
+# 이 오류일 때만 SHOW GLOBAL STATUS로 바꿈 (ER_TABLEACCESS_DENIED_ERROR, ER_NO_SUCH_TABLE)
+FALLBACK_ERROR_CODES = (1142, 1146)
+
+
+@dataclass
+class StatusSnapshot:
+    instance_name: str
+    uptime: int
+    values: Dict[str, int]
+    taken_at: datetime = field(default_factory=lambda: datetime.now(pytz.utc))
+    # 조회 직후의 time.monotonic() 값. 저장된 문서에서 복원한 스냅샷에는 없음
+    monotonic_at: Optional[float] = None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class StatusSnapshotEngine:
+    """
+    요청한 GLOBAL STATUS 변수와 Uptime을 IN 목록으로 한 번에 조회한다.
+    설정한 변수 개수와 관계없이 인스턴스당 왕복은 항상 한 번이다.
+    """
+
+    def __init__(self, variable_names: Iterable[str]):
+        self.variable_names = [name for name in dict.fromkeys(variable_names) if name != 'Uptime']
+        self.query_names = self.variable_names + ['Uptime']
+        # 서버가 돌려주는 변수명 대소문자가 버전마다 달라 설정한 이름으로 되돌리기 위한 매핑
+        self.canonical_names = {name.upper(): name for name in self.query_names}
+        placeholders = ', '.join(['%s'] * len(self.query_names))
+        self.performance_schema_query = PERFORMANCE_SCHEMA_STATUS_QUERY.format(placeholders=placeholders)
+        self.show_status_query = SHOW_STATUS_QUERY.format(placeholders=placeholders)
+        self.fallback_instances = set()
+
+    async def fetch(self, instance_name: str, conn: Any) -> Optional[StatusSnapshot]:
+        rows = None
+        if instance_name not in self.fallback_instances:
+            try:
+                rows = await self._execute(conn, self.performance_schema_query)
+            except Exception as e:
+                # 시간 초과, 연결 끊김 같은 일시적인 오류는 이번 수집만 실패로 처리하고 다음에 다시 시도
+                if not e.args or e.args[0] not in FALLBACK_ERROR_CODES:
+                    logger.error(f"Failed to fetch global status for {instance_name}: {e}")
+                    return None
+                logger.warning(f"performance_schema.global_status unavailable on {instance_name}, "
+                               f"falling back to SHOW GLOBAL STATUS: {e}")
+                self.fallback_instances.add(instance_name)
+        if rows is None:
+            try:
+                rows = await self._execute(conn, self.show_status_query)
+            except Exception as e:
+                logger.error(f"Failed to fetch global status for {instance_name}: {e}")
+                return None
+
+        values = {}
+        for name, value in rows:
+            canonical_name = self.canonical_names.get(name.upper())
+            int_value = _to_int(value)
+            if canonical_name is not None and int_value is not None:
+                values[canonical_name] = int_value
+
+        uptime = values.pop('Uptime', None)
+        if uptime is None:
+            logger.warning(f"Could not retrieve uptime for {instance_name}")
+            return None
+        return StatusSnapshot(instance_name=instance_name, uptime=uptime, values=values,
+                              monotonic_at=time.monotonic())
+
+    async def _execute(self, conn: Any, query: str) -> tuple:
+        async with conn.cursor() as cur:
+            await cur.execute(query, self.query_names)
+            return await cur.fetchall()
@@ -0,0 +1,186 @@
+import re
+import sys
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.sql_fingerprint import fingerprint_sql
+
+_MULTI_SPACE = re.compile(' +')
+_CONTROL_WHITESPACE = re.compile(r'[\n\t\r]+')
+
+
+def clean_sql_text(info: str) -> str:
+    info_cleaned = _MULTI_SPACE.sub(' ', info).encode('utf-8', 'ignore').decode('utf-8')
+    return _CONTROL_WHITESPACE.sub(' ', info_cleaned).strip()
+
+
+class InFlightQuery:
+    """실행 중인 슬로우 쿼리 한 건. SQL 정리와 fingerprint 계산은 최초 발견 시 한 번만 수행한다."""
+    __slots__ = ('instance', 'pid', 'db', 'user', 'host', 'sql_text', 'fingerprint', 'digest',
+                 'raw_len', 'start', 'max_time', 'last_seen', 'size', 'persisted')
+
+    def __init__(self, instance: str, pid: int, db: str, user: str, host: str, info: str,
+                 time: int, now: datetime):
+        self.instance = instance
+        self.pid = pid
+        self.db = db
+        self.user = user
+        self.host = host
+        self.sql_text = clean_sql_text(info)
+        self.fingerprint, self.digest = fingerprint_sql(info)
+        self.raw_len = len(info)
+        # 초 단위로 잘라 동일 쿼리의 start 값이 항상 같도록 함 ((instance, pid, start) 유니크 키)
+        self.start = (now - timedelta(seconds=time)).replace(microsecond=0)
+        self.max_time = time
+        self.last_seen = now
+        self.size = _RECORD_OVERHEAD + sys.getsizeof(self.sql_text) + sys.getsizeof(self.fingerprint)
+        self.persisted = False
+
+    @classmethod
+    def from_checkpoint(cls, document: Dict[str, Any]) -> 'InFlightQuery':
+        record = cls.__new__(cls)
+        for field in ('instance', 'pid', 'db', 'user', 'host', 'sql_text', 'fingerprint', 'digest',
+                      'raw_len', 'start', 'last_seen'):
+            setattr(record, field, document.get(field))
+        record.max_time = document.get('time', 0)
+        record.size = _RECORD_OVERHEAD + sys.getsizeof(record.sql_text) + sys.getsizeof(record.fingerprint)
+        record.persisted = True
+        return record
+
+    def to_checkpoint_update(self) -> Dict[str, Any]:
+        # 이미 저장된 항목은 실행 중에 바뀌는 값만 갱신함
+        return {'time': self.max_time, 'last_seen': self.last_seen}
+
+    def to_checkpoint(self) -> Dict[str, Any]:
+        document = self.to_document(end=None)
+        del document['end']
+        document['raw_len'] = self.raw_len
+        document['last_seen'] = self.last_seen
+        return document
+
+    def is_same_statement(self, time: int, info: str) -> bool:
+        # 같은 PID에서 새 문장이 시작되면 TIME이 0부터 다시 올라가므로 길이와 함께 비교하면 충분함
+        return time >= self.max_time and len(info) == self.raw_len
+
+    def to_document(self, end: datetime) -> Dict[str, Any]:
+        return {
+            'instance': self.instance,
+            'db': self.db,
+            'pid': self.pid,
+            'user': self.user,
+            'host': self.host,
+            'time': self.max_time,
+            'sql_text': self.sql_text,
+            'start': self.start,
+            'fingerprint': self.fingerprint,
+            'digest': self.digest,
+            'end': end,
+        }
+
+
+_RECORD_OVERHEAD = sys.getsizeof(object()) + 8 * len(InFlightQuery.__slots__) + sys.getsizeof((0, 0)) + 64
+
+
+class InFlightQueryCache:
+    """
+    (instance, pid) 기준 실행 중인 슬로우 쿼리 캐시.
+    최대 건수를 넘으면 가장 오래 관측되지 않은 항목부터 내보내며(LRU), 내보낸 항목은 종료된 쿼리처럼 저장된다.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Tuple[str, int], InFlightQuery]' = OrderedDict()
+        self.by_instance: Dict[str, Dict[int, InFlightQuery]] = {}
+        self.memory_bytes = 0
+        self.evictions = 0
+        self.evicted: List[InFlightQuery] = []
+        # 체크포인트 대상: 마지막 저장 이후 새로 추가된 키(전체 기록), 실행 시간만 늘어난 키, 제거된 키
+        self.dirty: set = set()
+        self.updated: set = set()
+        self.removed: set = set()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, instance: str, pid: int) -> Optional[InFlightQuery]:
+        return self.entries.get((instance, pid))
+
+    def observe(self, instance: str, pid: int, db: str, user: str, host: str, time: int, info: str,
+                now: datetime, exec_time: int) -> Optional[InFlightQuery]:
+        """관측한 행을 반영하고, 같은 PID에서 이전 쿼리가 끝난 것으로 판단되면 그 항목을 반환한다."""
+        key = (instance, pid)
+        record = self.entries.get(key)
+        finished = None
+        if record is not None:
+            if record.is_same_statement(time, info):
+                if time != record.max_time:
+                    record.max_time = time
+                    self.updated.add(key)
+                record.last_seen = now
+                self.entries.move_to_end(key)
+                return None
+            finished = self._remove(key)
+
+        if time >= exec_time:
+            self._add(key, InFlightQuery(instance, pid, db, user, host, info, time, now))
+        return finished
+
+    def pop_finished(self, instance: str, current_pids: set) -> List[InFlightQuery]:
+        instance_entries = self.by_instance.get(instance)
+        if not instance_entries:
+            return []
+        finished_pids = [pid for pid in instance_entries if pid not in current_pids]
+        return [self._remove((instance, pid)) for pid in finished_pids]
+
+    def drain_evicted(self) -> List[InFlightQuery]:
+        evicted, self.evicted = self.evicted, []
+        return evicted
+
+    def remove_instance(self, instance: str) -> List[InFlightQuery]:
+        return [self._remove((instance, pid)) for pid in list(self.by_instance.get(instance, {}))]
+
+    def restore(self, record: InFlightQuery) -> None:
+        key = (record.instance, record.pid)
+        if key not in self.entries:
+            self._add(key, record)
+            self.dirty.discard(key)
+            self.updated.discard(key)
+
+    def _add(self, key: Tuple[str, int], record: InFlightQuery) -> None:
+        self.entries[key] = record
+        self.by_instance.setdefault(key[0], {})[key[1]] = record
+        self.memory_bytes += record.size
+        self.dirty.add(key)
+        if key in self.removed:
+            # 같은 키의 체크포인트 문서가 남아 있으므로 삭제 대신 새 항목으로 덮어씀
+            self.removed.discard(key)
+            record.persisted = True
+        while len(self.entries) > self.max_entries:
+            oldest_key = next(iter(self.entries))
+            self.evicted.append(self._remove(oldest_key))
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[str, int]) -> InFlightQuery:
+        record = self.entries.pop(key)
+        instance_entries = self.by_instance[key[0]]
+        del instance_entries[key[1]]
+        if not instance_entries:
+            del self.by_instance[key[0]]
+        self.memory_bytes -= record.size
+        self.dirty.discard(key)
+        self.updated.discard(key)
+        if record.persisted:
+            self.removed.add(key)
+        return record
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'instances': len(self.by_instance),
+            'memory_bytes': self.memory_bytes,
+            'evictions': self.evictions,
+            'dirty': len(self.dirty),
+            'updated': len(self.updated),
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict
+
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+from collector.slow_query_cache import InFlightQuery, InFlightQueryCache
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_id(instance: str, pid: int) -> str:
+    return f"{instance}:{pid}"
+
+
+class SlowQueryCheckpoint:
+    """
+    실행 중인 슬로우 쿼리 캐시를 MongoDB 컬렉션에 주기적으로 저장하고, 수집기 시작 시 복원한다.
+    매 틱에는 캐시가 변경된 키만 기록하고, 저장은 주기마다 변경분만 bulk_write 한 번으로 처리한다.
+    새 항목만 SQL 본문을 포함한 전체 문서를 쓰고, 이미 저장된 항목은 time/last_seen만 $set으로 갱신한다.
+    """
+
+    def __init__(self, collection: Any, cache: InFlightQueryCache, interval: float = 10.0):
+        self.collection = collection
+        self.cache = cache
+        self.interval = interval
+        self.stats: Dict[str, Any] = {
+            'checkpoints': 0,
+            'upserts': 0,
+            'updates': 0,
+            'deletes': 0,
+            'errors': 0,
+            'last_latency_ms': 0.0,
+        }
+        self._task = None
+
+    async def restore(self) -> int:
+        restored = 0
+        async for document in self.collection.find({}):
+            try:
+                self.cache.restore(InFlightQuery.from_checkpoint(document))
+                restored += 1
+            except Exception as e:
+                logger.error(f"Skipping invalid checkpoint entry {document.get('_id')}: {e}")
+        logger.info(f"Restored {restored} in-flight slow queries from checkpoint")
+        return restored
+
+    async def save(self) -> None:
+        dirty, self.cache.dirty = self.cache.dirty, set()
+        updated, self.cache.updated = self.cache.updated - dirty, set()
+        removed, self.cache.removed = self.cache.removed, set()
+        if not dirty and not updated and not removed:
+            return
+
+        operations = []
+        saved_records = []
+        for key in removed:
+            operations.append(DeleteOne({'_id': checkpoint_id(*key)}))
+        for key in dirty:
+            record = self.cache.entries.get(key)
+            if record is None:
+                continue
+            operations.append(ReplaceOne({'_id': checkpoint_id(*key)}, record.to_checkpoint(), upsert=True))
+            # 저장 중(await)에 쿼리가 끝나도 삭제 대상에 들어가도록 미리 표시함
+            record.persisted = True
+            saved_records.append(record)
+        updates = 0
+        for key in updated:
+            record = self.cache.entries.get(key)
+            if record is None:
+                continue
+            operations.append(UpdateOne({'_id': checkpoint_id(*key)}, {'$set': record.to_checkpoint_update()}))
+            updates += 1
+
+        started = time.perf_counter()
+        try:
+            if operations:
+                await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Failed to write slow query checkpoint, will retry: {e}")
+            self.cache.dirty |= {key for key in dirty if key in self.cache.entries}
+            self.cache.updated |= {key for key in updated if key in self.cache.entries}
+            for key in removed:
+                if key in self.cache.entries:
+                    # 그 사이 같은 키로 새 쿼리가 등록됐다면 기존 문서는 다음 저장 때 덮어씀
+                    self.cache.entries[key].persisted = True
+                else:
+                    self.cache.removed.add(key)
+            return
+
+        self.stats['checkpoints'] += 1
+        self.stats['upserts'] += len(saved_records)
+        self.stats['updates'] += updates
+        self.stats['deletes'] += len(removed)
+        self.stats['last_latency_ms'] = round((time.perf_counter() - started) * 1000, 3)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._checkpoint_loop())
+
+    async def _checkpoint_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
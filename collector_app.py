@@ -6,8 +6,12 @@ from collector.mysql_slow_queries import SlowQueryMonitor
 from collector.mysql_command_status import MySQLCommandStatusMonitor
 from collector.aurora_cluster_info import AuroraInfoCollector
 from collector.mysql_disk_status import MySQLDiskStatusMonitor
+from collector.mysql_command_mix import CommandMixSampler
 from modules.time_utils import get_kst_time
-from config import LOG_LEVEL, LOG_FORMAT
+from modules.mysql_pool_registry import MySQLPoolRegistry
+from modules.mongodb_connector import MongoDBConnector
+from modules.index_manager import ensure_indexes
+from config import LOG_LEVEL, LOG_FORMAT, COMMAND_MIX_SAMPLING_ENABLED
 
 logging.basicConfig(level=getattr(logging, LOG_LEVEL), format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
@@ -52,14 +56,18 @@ async def run_with_restart(task_func):
             await asyncio.sleep(5)  # 5초 후 재시작
 
 
+# 구간 증가량 계산을 위해 직전 스냅샷을 메모리에 유지해야 하므로 모니터 객체를 실행마다 새로 만들지 않음
+command_status_monitor = MySQLCommandStatusMonitor()
+disk_status_monitor = MySQLDiskStatusMonitor()
+
+
 async def run_slow_queries():
     monitor = SlowQueryMonitor()
     await monitor.run_mysql_slow_queries()
 
 
 async def run_command_status():
-    monitor = MySQLCommandStatusMonitor()
-    await monitor.run()
+    await command_status_monitor.run()
 
 
 async def run_aurora_info():
@@ -68,11 +76,29 @@ async def run_aurora_info():
 
 
 async def run_disk_status():
-    monitor = MySQLDiskStatusMonitor()
-    await monitor.run()
+    await disk_status_monitor.run()
+
+
+async def run_command_mix():
+    sampler = CommandMixSampler()
+    await sampler.run()
+
+
+async def log_pool_stats():
+    logger.info(f"MySQL pool registry stats: {MySQLPoolRegistry.get_stats()}")
 
 
 async def main():
+    # 모든 컬렉션의 인덱스와 보관 기간(TTL)을 수집 시작 전에 한 번 적용
+    try:
+        await MongoDBConnector.initialize()
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Failed to ensure MongoDB indexes: {e}")
+
+    # 모든 수집기가 공유하는 MySQL 연결 풀의 상태 점검
+    MySQLPoolRegistry.start_health_check()
+
     # SlowQueryMonitor는 예외 발생 시 재시작
     slow_queries_task = asyncio.create_task(run_with_restart(run_slow_queries))
 
@@ -85,14 +111,20 @@ async def main():
     # MySQLDiskStatusMonitor 10분 주기로 수집
     disk_usage_task = asyncio.create_task(run_periodically(run_disk_status, 600))
 
+    # 연결 풀 재사용/생성 카운터 10분 주기로 기록
+    pool_stats_task = asyncio.create_task(run_periodically(log_pool_stats, 600))
+
+    tasks = [slow_queries_task, command_status_task, aurora_info_task, disk_usage_task, pool_stats_task]
+
+    # Com_ 카운터 고빈도 샘플링은 설정한 경우에만 실행하며, 예외 발생 시 재시작
+    if COMMAND_MIX_SAMPLING_ENABLED:
+        tasks.append(asyncio.create_task(run_with_restart(run_command_mix)))
+
     # 예외가 발생해도 다른 태스크에 영향을 주지 않도록 함
-    await asyncio.gather(
-        slow_queries_task,
-        command_status_task,
-        aurora_info_task,
-        disk_usage_task,
-        return_exceptions=True
-    )
+    try:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await MySQLPoolRegistry.close_all()
 
 if __name__ == '__main__':
     try:
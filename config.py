@@ -14,11 +14,91 @@ MONGODB_HISTORY_COLLECTION_NAME = os.getenv("MONGODB_HISTORY_COLLECTION_NAME")
 MONGODB_AURORA_INFO_COLLECTION_NAME = os.getenv("MONGODB_AURORA_INFO_COLLECTION_NAME")
 MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME = os.getenv("MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME")
 MONGODB_DISK_USAGE_COLLECTION_NAME = os.getenv("MONGODB_DISK_USAGE_COLLECTION_NAME")
+MONGODB_SLOWLOG_CHECKPOINT_COLLECTION_NAME = os.getenv("MONGODB_SLOWLOG_CHECKPOINT_COLLECTION_NAME",
+                                                       "mysql_slowquery_inflight")
 RDS_SPECS_COLLECTION_NAME = os.getenv("RDS_SPECS_COLLECTION_NAME")
+MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME = os.getenv("MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME",
+                                                    "mysql_slowquery_daily")
+MONGODB_COMMAND_MIX_COLLECTION_NAME = os.getenv("MONGODB_COMMAND_MIX_COLLECTION_NAME", "mysql_command_mix")
+MONGODB_PLAN_BODY_COLLECTION_NAME = os.getenv("MONGODB_PLAN_BODY_COLLECTION_NAME", "mysql_slowquery_plan_body")
+MONGODB_PLAN_CACHE_COLLECTION_NAME = os.getenv("MONGODB_PLAN_CACHE_COLLECTION_NAME", "mysql_slowquery_plan_cache")
+MONGODB_DATA_VERSION_COLLECTION_NAME = os.getenv("MONGODB_DATA_VERSION_COLLECTION_NAME", "data_versions")
+
+# 디스크 사용량/명령 상태 지표 저장 방식: document(기존 방식), timeseries(time-series 컬렉션), bucket(1시간 버킷)
+# timeseries를 지원하지 않는 MongoDB에서는 bucket으로 대체됨
+METRIC_STORAGE_BACKEND = os.getenv("METRIC_STORAGE_BACKEND", "document")
+
+# 컬렉션별 데이터 보관 기간 (단위: 일, 0이면 TTL 인덱스를 만들지 않음)
+SLOW_QUERY_RETENTION_DAYS = int(os.getenv("SLOW_QUERY_RETENTION_DAYS", "0"))
+SLOW_QUERY_SUMMARY_RETENTION_DAYS = int(os.getenv("SLOW_QUERY_SUMMARY_RETENTION_DAYS", "0"))
+DISK_USAGE_RETENTION_DAYS = int(os.getenv("DISK_USAGE_RETENTION_DAYS", "0"))
+COMMAND_STATUS_RETENTION_DAYS = int(os.getenv("COMMAND_STATUS_RETENTION_DAYS", "0"))
+COMMAND_MIX_RETENTION_DAYS = int(os.getenv("COMMAND_MIX_RETENTION_DAYS", "0"))
+
+# MongoDB 연결 상태 확인 주기(초)와 오류로 기록하기 시작하는 연속 실패 횟수
+MONGODB_HEARTBEAT_INTERVAL = float(os.getenv("MONGODB_HEARTBEAT_INTERVAL", "10"))
+MONGODB_HEARTBEAT_FAILURE_THRESHOLD = int(os.getenv("MONGODB_HEARTBEAT_FAILURE_THRESHOLD", "3"))
 
 # MySQL에서 고려하는 슬로우 쿼리의 최소 실행 시간 (단위: 초)
 EXEC_TIME = int(os.getenv("SLOW_QUERY_EXEC_TIME", "2"))
 
+# 종료된 슬로우 쿼리 일괄 저장 설정 (건수 또는 주기(초) 중 먼저 도달하는 조건으로 저장)
+SLOW_QUERY_FLUSH_BATCH_SIZE = int(os.getenv("SLOW_QUERY_FLUSH_BATCH_SIZE", "100"))
+SLOW_QUERY_FLUSH_INTERVAL = float(os.getenv("SLOW_QUERY_FLUSH_INTERVAL", "5"))
+SLOW_QUERY_BUFFER_MAX_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_MAX_SIZE", "10000"))
+
+# 인스턴스별 슬로우 쿼리 폴링 설정 (단위: 초)
+SLOW_QUERY_POLL_INTERVAL = float(os.getenv("SLOW_QUERY_POLL_INTERVAL", "1"))
+SLOW_QUERY_POLL_TIMEOUT = float(os.getenv("SLOW_QUERY_POLL_TIMEOUT", "5"))
+SLOW_QUERY_STATS_LOG_INTERVAL = int(os.getenv("SLOW_QUERY_STATS_LOG_INTERVAL", "300"))
+
+# 실행 중인 슬로우 쿼리 캐시 최대 건수 (초과 시 가장 오래 관측되지 않은 항목부터 저장 후 제거)
+SLOW_QUERY_INFLIGHT_MAX_ENTRIES = int(os.getenv("SLOW_QUERY_INFLIGHT_MAX_ENTRIES", "50000"))
+
+# 실행 중인 슬로우 쿼리 체크포인트 저장 주기 (단위: 초)
+SLOW_QUERY_CHECKPOINT_INTERVAL = float(os.getenv("SLOW_QUERY_CHECKPOINT_INTERVAL", "10"))
+
+# change stream을 쓸 수 없을 때 인스턴스 목록 변경 확인 주기 (단위: 초)
+INSTANCE_RECONCILE_POLL_INTERVAL = float(os.getenv("INSTANCE_RECONCILE_POLL_INTERVAL", "30"))
+
+# 슬로우 쿼리 수집 방식 기본값: processlist(information_schema.PROCESSLIST) 또는 performance_schema
+# 인스턴스 문서의 slow_query_capture_mode 값이 있으면 인스턴스별로 우선 적용
+SLOW_QUERY_CAPTURE_MODE = os.getenv("SLOW_QUERY_CAPTURE_MODE", "processlist")
+
+# SQL fingerprint 정규화 결과 캐시 크기 (원문 SQL 기준 LRU)
+SQL_FINGERPRINT_CACHE_SIZE = int(os.getenv("SQL_FINGERPRINT_CACHE_SIZE", "4096"))
+
+# 읽기 API 응답 캐시 (TTL 기본값(초), 최대 항목 수, 수집기가 올린 데이터 버전 확인 주기(초))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_DEFAULT_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+DATA_VERSION_POLL_INTERVAL = float(os.getenv("DATA_VERSION_POLL_INTERVAL", "5"))
+# 수집기가 몇 초마다 쓰는 소스(슬로우 쿼리/요약, 자동 EXPLAIN 플랜)의 데이터 버전을 올리는 최소 간격(초)
+DATA_VERSION_BUMP_MIN_INTERVAL = float(os.getenv("DATA_VERSION_BUMP_MIN_INTERVAL", "60"))
+
+# EXPLAIN 실행 설정 (인스턴스별 동시 실행 수, 대기를 포함한 제한 시간(초), 메타데이터 잠금 대기 제한(초))
+EXPLAIN_MAX_CONCURRENCY_PER_INSTANCE = int(os.getenv("EXPLAIN_MAX_CONCURRENCY_PER_INSTANCE", "2"))
+EXPLAIN_TIMEOUT = float(os.getenv("EXPLAIN_TIMEOUT", "10"))
+EXPLAIN_LOCK_WAIT_TIMEOUT = int(os.getenv("EXPLAIN_LOCK_WAIT_TIMEOUT", "5"))
+
+# 일괄 EXPLAIN API: 전체 인스턴스 합산 동시 실행 수, 요청 한 번에 처리하는 최대 슬로우 쿼리 수
+EXPLAIN_BATCH_MAX_CONCURRENCY = int(os.getenv("EXPLAIN_BATCH_MAX_CONCURRENCY", "8"))
+EXPLAIN_BATCH_MAX_ITEMS = int(os.getenv("EXPLAIN_BATCH_MAX_ITEMS", "200"))
+
+# 플랜 캐시: (instance, db, digest)별 플랜 보관 시간(초), db 스키마 서명 재확인 주기(초)
+PLAN_CACHE_TTL = int(os.getenv("PLAN_CACHE_TTL", "86400"))
+PLAN_SCHEMA_SIGNATURE_TTL = float(os.getenv("PLAN_SCHEMA_SIGNATURE_TTL", "60"))
+
+# 슬로우 SELECT 자동 EXPLAIN (수집기): 큐 크기, 워커 수, 인스턴스별 분당 실행 수/시간당 예산(0이면 무제한),
+# 같은 fingerprint를 다시 실행하지 않는 기간(초), 제한 시간 초과/연결 실패 후 쉬는 시간(초)
+EXPLAIN_PIPELINE_ENABLED = os.getenv("EXPLAIN_PIPELINE_ENABLED", "false").lower() == "true"
+EXPLAIN_PIPELINE_QUEUE_SIZE = int(os.getenv("EXPLAIN_PIPELINE_QUEUE_SIZE", "1000"))
+EXPLAIN_PIPELINE_WORKERS = int(os.getenv("EXPLAIN_PIPELINE_WORKERS", "2"))
+EXPLAIN_PIPELINE_RATE_PER_MINUTE = float(os.getenv("EXPLAIN_PIPELINE_RATE_PER_MINUTE", "6"))
+EXPLAIN_PIPELINE_HOURLY_BUDGET = int(os.getenv("EXPLAIN_PIPELINE_HOURLY_BUDGET", "60"))
+EXPLAIN_PIPELINE_DEDUP_TTL = float(os.getenv("EXPLAIN_PIPELINE_DEDUP_TTL", "3600"))
+EXPLAIN_PIPELINE_COOLDOWN = float(os.getenv("EXPLAIN_PIPELINE_COOLDOWN", "300"))
+
 # API 관련 설정
 API_MAPPING = {
     "/api/v1/instance_setup": "api.instance_setup_api",
@@ -52,8 +132,17 @@ DESIRED_COMMANDS = [
     'Com_commit', 'Com_begin', 'Com_rollback'
 ]
 
+# Com_ 카운터 고빈도 샘플링 설정: 샘플은 인스턴스별 링 버퍼에만 두고 1분/1시간/1일 롤업만 저장
+COMMAND_MIX_SAMPLING_ENABLED = os.getenv("COMMAND_MIX_SAMPLING_ENABLED", "false").lower() == "true"
+COMMAND_MIX_SAMPLE_INTERVAL = float(os.getenv("COMMAND_MIX_SAMPLE_INTERVAL", "5"))
+COMMAND_MIX_BUFFER_SIZE = int(os.getenv("COMMAND_MIX_BUFFER_SIZE", "720"))
+
 # 연결 풀 설정
 POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))
+MYSQL_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv("MYSQL_POOL_HEALTH_CHECK_INTERVAL", "60"))
+MYSQL_CONNECT_TIMEOUT = int(os.getenv("MYSQL_CONNECT_TIMEOUT", "5"))
+# 동시에 생성할 수 있는 연결 풀 개수
+MYSQL_POOL_CREATE_CONCURRENCY = int(os.getenv("MYSQL_POOL_CREATE_CONCURRENCY", "10"))
 
 # 앱 설정
 STATIC_FILES_DIR = "static"
@@ -62,9 +151,11 @@ HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8000))
 
 # 재시도 설정
-MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
 RETRY_DELAY = int(os.getenv("RETRY_DELAY", "5"))
 
+# 인스턴스별 서킷 브레이커 설정: 연결 실패 시 RETRY_DELAY부터 2배씩 늘려 최대 값까지 재시도를 미룸 (단위: 초)
+CIRCUIT_BREAKER_MAX_DELAY = int(os.getenv("CIRCUIT_BREAKER_MAX_DELAY", "300"))
+
 # 로깅 설정
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -0,0 +1,118 @@
+"""
+Grafana 패널용 시계열 다운샘플링.
+
+Grafana JSON API 데이터소스가 넘겨주는 $__from/$__to(epoch ms), $__interval_ms, maxDataPoints를 받아
+패널 너비(maxDataPoints)에 맞춰 응답 크기를 제한한다.
+  - 시간 버킷: MongoDB 집계에서 버킷 시각을 계산해 그룹핑 (기본)
+  - LTTB: 선 그래프의 모양을 유지하도록 Largest-Triangle-Three-Buckets로 점을 고름
+"""
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_MAX_DATA_POINTS = 1000
+MAX_DATA_POINTS_LIMIT = 10000
+DEFAULT_RANGE = timedelta(hours=6)
+# LTTB는 버킷 평균으로 먼저 줄인 점에서 고르므로 목표 점 개수의 배수만큼 미리 남겨둠
+LTTB_PREAGGREGATION_FACTOR = 4
+
+
+def parse_grafana_time(value: Optional[str]) -> Optional[datetime]:
+    """epoch ms 정수($__from/$__to) 또는 ISO 8601 문자열을 UTC datetime으로 변환한다."""
+    if value is None or value == '':
+        return None
+    if value.lstrip('-').isdigit():
+        return datetime.fromtimestamp(int(value) / 1000, timezone.utc)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def resolve_range(start: Optional[str], end: Optional[str]) -> Tuple[datetime, datetime]:
+    end_time = parse_grafana_time(end) or datetime.now(timezone.utc)
+    start_time = parse_grafana_time(start) or end_time - DEFAULT_RANGE
+    if start_time >= end_time:
+        raise ValueError("from must be earlier than to")
+    return start_time, end_time
+
+
+def bucket_size_ms(start: datetime, end: datetime, max_data_points: int, interval_ms: Optional[int] = None) -> int:
+    """구간을 max_data_points개 이하로 나누는 버킷 크기. Grafana가 준 interval보다 작아지지 않는다."""
+    span_ms = (end - start).total_seconds() * 1000
+    size = math.ceil(span_ms / max(max_data_points, 1))
+    return max(size, interval_ms or 0, 1000)
+
+
+def bucket_expression(field: str, size_ms: int) -> Dict[str, Any]:
+    """날짜 필드를 버킷 시작 시각(epoch ms)으로 내리는 집계 식. $dateTrunc가 없는 MongoDB에서도 동작한다."""
+    epoch_ms = {'$toLong': f'${field}'}
+    return {'$subtract': [epoch_ms, {'$mod': [epoch_ms, size_ms]}]}
+
+
+def grafana_window(start: Optional[str], end: Optional[str], max_data_points: int, interval_ms: Optional[int],
+                   method: str) -> Tuple[datetime, datetime, int]:
+    """
+    (구간 시작, 구간 끝, 버킷 크기(ms))를 반환한다.
+    LTTB는 버킷 평균으로 목표보다 조금 많이 남긴 뒤 점을 고르므로 버킷을 더 잘게 나눈다.
+    """
+    start_time, end_time = resolve_range(start, end)
+    points = max_data_points * LTTB_PREAGGREGATION_FACTOR if method == 'lttb' else max_data_points
+    return start_time, end_time, bucket_size_ms(start_time, end_time, points, interval_ms)
+
+
+def lttb_indices(points: Sequence[Tuple[float, float]], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets. x 기준 정렬된 점에서 남길 threshold개 점의 인덱스를 반환한다.
+    첫 점과 마지막 점은 항상 포함된다.
+    """
+    length = len(points)
+    if threshold >= length or threshold < 3:
+        return list(range(length))
+
+    selected = [0]
+    every = (length - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 다음 버킷의 평균점
+        avg_start = int(math.floor((i + 1) * every)) + 1
+        avg_end = min(int(math.floor((i + 2) * every)) + 1, length)
+        avg_range = points[avg_start:avg_end]
+        avg_x = sum(point[0] for point in avg_range) / len(avg_range)
+        avg_y = sum(point[1] for point in avg_range) / len(avg_range)
+
+        # 현재 버킷에서 이전 선택점, 다음 버킷 평균점과 만드는 삼각형이 가장 큰 점을 선택
+        range_start = int(math.floor(i * every)) + 1
+        range_end = int(math.floor((i + 1) * every)) + 1
+        point_a_x, point_a_y = points[a]
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((point_a_x - avg_x) * (points[j][1] - point_a_y)
+                       - (point_a_x - points[j][0]) * (avg_y - point_a_y))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        selected.append(next_a)
+        a = next_a
+
+    selected.append(length - 1)
+    return selected
+
+
+def lttb(points: Sequence[Tuple[float, float]], threshold: int) -> List[Tuple[float, float]]:
+    return [points[index] for index in lttb_indices(points, threshold)]
+
+
+def downsample_series(rows: List[Dict[str, Any]], series_key: str, time_key: str, value_key: str,
+                      threshold: int) -> List[Dict[str, Any]]:
+    """series_key별로 나눈 행에 LTTB를 적용한다. 값이 없는 행은 건너뛴다."""
+    series: Dict[Any, List[Dict[str, Any]]] = {}
+    for row in rows:
+        if row.get(value_key) is not None:
+            series.setdefault(row[series_key], []).append(row)
+
+    result = []
+    for series_rows in series.values():
+        series_rows.sort(key=lambda row: row[time_key])
+        points = [(float(row[time_key]), float(row[value_key])) for row in series_rows]
+        result.extend(series_rows[index] for index in lttb_indices(points, threshold))
+    return result
@@ -0,0 +1,136 @@
+"""
+비동기 EXPLAIN 실행기.
+
+MySQLPoolRegistry의 asyncmy 풀로 EXPLAIN FORMAT=JSON을 실행한다.
+  - 수집기 풀과 섞이지 않도록 인스턴스마다 `<instance>:explain` 이름의 작은 전용 풀을 사용
+  - 인스턴스별 동시 실행 수 제한(EXPLAIN_MAX_CONCURRENCY_PER_INSTANCE)
+  - 대기/실행 전체 제한 시간(EXPLAIN_TIMEOUT)과 메타데이터 잠금 대기 제한(EXPLAIN_LOCK_WAIT_TIMEOUT)
+
+오류는 호출한 쪽에서 응답 코드로 바꿀 수 있도록 종류별로 올린다.
+  - ValueError: 실행할 수 없는 SQL
+  - ConnectionError: 풀을 만들 수 없음(연결 실패, 차단기 OPEN)
+  - asyncio.TimeoutError: 제한 시간 초과
+"""
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from asyncmy.cursors import DictCursor
+
+from modules.mysql_pool_registry import MySQLPoolRegistry
+from config import EXPLAIN_MAX_CONCURRENCY_PER_INSTANCE, EXPLAIN_TIMEOUT, EXPLAIN_LOCK_WAIT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_POOL_SUFFIX = ':explain'
+_BLOCK_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+
+def remove_sql_comments(sql_text: str) -> str:
+    return _BLOCK_COMMENT.sub('', sql_text)
+
+
+def validate_sql_query(sql_text: str) -> str:
+    """주석을 제거한 SELECT 문만 허용하고 실행할 SQL을 반환한다."""
+    query_without_comments = remove_sql_comments(sql_text).strip().rstrip(';').strip()
+    if not query_without_comments.lower().startswith("select"):
+        raise ValueError("SELECT 쿼리만 가능합니다.")
+    if "into" in query_without_comments.lower().split("from")[0]:
+        raise ValueError("SELECT ... INTO ... FROM 형태의 프로시저 쿼리는 실행할 수 없습니다.")
+    return query_without_comments
+
+
+def quote_identifier(name: str) -> str:
+    return '`' + name.replace('`', '``') + '`'
+
+
+class ExplainExecutor:
+    def __init__(self, max_concurrency: int = EXPLAIN_MAX_CONCURRENCY_PER_INSTANCE, timeout: float = EXPLAIN_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {'executed': 0, 'rejected': 0, 'timeouts': 0, 'unavailable': 0, 'errors': 0,
+                      'metadata_queries': 0, 'max_latency_ms': 0.0, 'total_latency_ms': 0.0}
+
+    def _pool_instance(self, instance: Dict[str, Any]) -> Dict[str, Any]:
+        # 동시 실행 수만큼만 연결을 두는 EXPLAIN 전용 풀
+        return {**instance, 'instance_name': instance['instance_name'] + EXPLAIN_POOL_SUFFIX,
+                'pool_size': self.max_concurrency}
+
+    async def explain(self, instance: Dict[str, Any], sql_text: str, db_name: Optional[str]) -> Dict[str, Any]:
+        """
+        EXPLAIN FORMAT=JSON 결과(JSON 객체)를 반환한다.
+        풀 연결은 이전에 USE한 db를 유지하고 MySQL에는 기본 db를 해제하는 방법이 없으므로 db_name이 꼭 있어야 한다.
+        """
+        try:
+            if not db_name:
+                raise ValueError("데이터베이스가 지정되지 않은 쿼리는 EXPLAIN할 수 없습니다.")
+            validated_sql = validate_sql_query(sql_text)
+        except ValueError:
+            self.stats['rejected'] += 1
+            raise
+
+        started = asyncio.get_running_loop().time()
+        try:
+            plan = await asyncio.wait_for(self._explain(instance, validated_sql, db_name), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            logger.warning(f"EXPLAIN timed out after {self.timeout}s on {instance['instance_name']}")
+            raise
+        except ConnectionError:
+            self.stats['unavailable'] += 1
+            raise
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+
+        latency_ms = (asyncio.get_running_loop().time() - started) * 1000
+        self.stats['executed'] += 1
+        self.stats['total_latency_ms'] += latency_ms
+        self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], latency_ms)
+        return plan
+
+    async def _explain(self, instance: Dict[str, Any], sql: str, db_name: str) -> Dict[str, Any]:
+        # 빌릴 때마다 USE로 db를 다시 지정해 이전 사용자가 고른 db에서 실행되지 않게 함
+        statements = [
+            (f"SET SESSION lock_wait_timeout = {int(EXPLAIN_LOCK_WAIT_TIMEOUT)}", None),
+            (f"USE {quote_identifier(db_name)}", None),
+            (f"EXPLAIN FORMAT=JSON {sql}", None),
+        ]
+        rows = await self._run(instance, statements)
+        explain = rows[0]['EXPLAIN']
+        return explain if isinstance(explain, dict) else json.loads(explain)
+
+    async def fetch(self, instance: Dict[str, Any], sql: str,
+                    args: Optional[Sequence[Any]] = None) -> List[Dict[str, Any]]:
+        """EXPLAIN 전용 풀/동시 실행 제한/제한 시간 안에서 메타데이터 조회(information_schema 등)를 실행한다."""
+        self.stats['metadata_queries'] += 1
+        return await asyncio.wait_for(self._run(instance, [(sql, args)]), timeout=self.timeout)
+
+    async def _run(self, instance: Dict[str, Any],
+                   statements: List[Tuple[str, Optional[Sequence[Any]]]]) -> List[Dict[str, Any]]:
+        """문장을 차례로 실행하고 마지막 문장의 결과를 반환한다."""
+        semaphore = self.semaphores.setdefault(instance['instance_name'], asyncio.Semaphore(self.max_concurrency))
+        async with semaphore:
+            # 제한 시간 초과로 취소되면 MySQLPoolRegistry.acquire가 연결을 닫음
+            async with MySQLPoolRegistry.acquire(self._pool_instance(instance)) as conn:
+                async with conn.cursor(DictCursor) as cursor:
+                    for sql, args in statements:
+                        await cursor.execute(sql, args)
+                    return await cursor.fetchall()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'avg_latency_ms': round(self.stats['total_latency_ms'] / self.stats['executed'], 2)
+            if self.stats['executed'] else 0,
+            'running': {
+                instance_name: self.max_concurrency - semaphore._value
+                for instance_name, semaphore in self.semaphores.items()
+            },
+        }
+
+
+explain_executor = ExplainExecutor()
@@ -0,0 +1,222 @@
+"""
+컬렉션별 인덱스/보관 기간(TTL) 선언과 적용.
+
+INDEX_SPECS에 선언한 인덱스를 시작 시 멱등하게 만들고, 이미 있는 인덱스가 선언과 다르면 보고한다.
+TTL 값만 다른 경우에는 collMod로 보관 기간을 맞추며, 그 외 차이(유니크 여부 등)는 자동으로 고치지 않는다.
+
+    python -m modules.index_manager check   # 누락/차이만 확인
+    python -m modules.index_manager apply   # 누락된 인덱스 생성
+"""
+import asyncio
+import logging
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import OperationFailure
+
+from modules.mongodb_connector import MongoDBConnector
+from modules.metric_store import get_metric_store, BACKEND_TIMESERIES, BACKEND_BUCKET
+from config import (
+    MONGODB_SLOWLOG_COLLECTION_NAME, MONGODB_PLAN_COLLECTION_NAME, MONGODB_DIGEST_COLLECTION_NAME,
+    MONGODB_HISTORY_COLLECTION_NAME, MONGODB_AURORA_INFO_COLLECTION_NAME, MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME,
+    MONGODB_DISK_USAGE_COLLECTION_NAME, MONGODB_STATUS_COLLECTION_NAME, MONGODB_COMMAND_MIX_COLLECTION_NAME,
+    MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME, MONGODB_PLAN_CACHE_COLLECTION_NAME, SLOW_QUERY_RETENTION_DAYS, SLOW_QUERY_SUMMARY_RETENTION_DAYS, DISK_USAGE_RETENTION_DAYS, COMMAND_STATUS_RETENTION_DAYS, COMMAND_MIX_RETENTION_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    keys: Tuple[Tuple[str, int], ...]
+    name: str
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None
+
+
+@dataclass
+class CollectionSpec:
+    name: Optional[str]
+    indexes: List[IndexSpec] = field(default_factory=list)
+    # 지표 저장소를 거치는 컬렉션은 저장 방식에 따라 실제 컬렉션 이름과 시간 필드가 달라짐
+    metric_store: bool = False
+    retention_days: int = 0
+
+
+def _ttl(days: int) -> Optional[int]:
+    return days * DAY_SECONDS if days > 0 else None
+
+
+INDEX_SPECS: List[CollectionSpec] = [
+    CollectionSpec(MONGODB_SLOWLOG_COLLECTION_NAME, [
+        # 종료된 슬로우 쿼리 중복 저장 방지
+        IndexSpec((('instance', 1), ('pid', 1), ('start', 1)), 'instance_pid_start_unique', unique=True),
+        IndexSpec((('fingerprint', 1),), 'fingerprint'),
+        IndexSpec((('instance', 1), ('digest', 1)), 'instance_digest'),
+        # 조회 API의 start 구간 조건/정렬과 보관 기간을 함께 처리
+        IndexSpec((('start', -1),), 'start', expire_after_seconds=_ttl(SLOW_QUERY_RETENTION_DAYS)),
+        IndexSpec((('pid', 1),), 'pid'),
+    ]),
+    CollectionSpec(MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME, [
+        # 통계 API는 일자 구간으로 읽고 인스턴스/digest 단위로 다시 합침
+        IndexSpec((('day', 1),), 'day', expire_after_seconds=_ttl(SLOW_QUERY_SUMMARY_RETENTION_DAYS)),
+        IndexSpec((('instance', 1), ('day', 1)), 'instance_day'),
+    ]),
+    CollectionSpec(MONGODB_PLAN_COLLECTION_NAME, [
+        IndexSpec((('pid', 1),), 'pid'),
+        # 플랜은 (instance, pid) 단위로 덮어씀
+        IndexSpec((('instance', 1), ('pid', 1)), 'instance_pid'),
+        # 플랜 검색 API의 특징 조건/정렬
+        IndexSpec((('features.access_types', 1), ('created_at', -1)), 'features_access_types_created_at'),
+        IndexSpec((('features.tables', 1), ('created_at', -1)), 'features_tables_created_at'),
+        IndexSpec((('features.query_cost', -1),), 'features_query_cost'),
+        IndexSpec((('features.max_rows_examined_per_scan', -1),), 'features_max_rows_examined_per_scan'),
+    ]),
+    CollectionSpec(MONGODB_PLAN_CACHE_COLLECTION_NAME, [
+        # 만료된 캐시 항목 정리 (조회 시에도 expires_at을 확인함)
+        IndexSpec((('expires_at', 1),), 'expires_at', expire_after_seconds=0),
+    ]),
+    CollectionSpec(MONGODB_DIGEST_COLLECTION_NAME, [
+        IndexSpec((('instance', 1), ('digest', 1)), 'instance_digest_unique', unique=True),
+    ]),
+    CollectionSpec(MONGODB_HISTORY_COLLECTION_NAME, [
+        IndexSpec((('instance', 1), ('thread_id', 1), ('event_id', 1)), 'instance_thread_event_unique', unique=True),
+    ]),
+    CollectionSpec(MONGODB_AURORA_INFO_COLLECTION_NAME, [
+        IndexSpec((('DBClusterIdentifier', 1), ('DBInstanceIdentifier', 1)), 'cluster_instance_unique', unique=True),
+    ]),
+    CollectionSpec(MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME, [
+        IndexSpec((('instance_name', 1),), 'instance_name_unique', unique=True),
+    ]),
+    CollectionSpec(MONGODB_COMMAND_MIX_COLLECTION_NAME, [
+        IndexSpec((('instance_name', 1), ('resolution', 1), ('bucket_start', -1)), 'instance_resolution_bucket'),
+        IndexSpec((('bucket_start', 1),), 'bucket_start', expire_after_seconds=_ttl(COMMAND_MIX_RETENTION_DAYS)),
+    ]),
+    CollectionSpec(MONGODB_DISK_USAGE_COLLECTION_NAME, metric_store=True, retention_days=DISK_USAGE_RETENTION_DAYS),
+    CollectionSpec(MONGODB_STATUS_COLLECTION_NAME, metric_store=True, retention_days=COMMAND_STATUS_RETENTION_DAYS),
+]
+
+
+async def _resolve(spec: CollectionSpec) -> Tuple[str, List[IndexSpec], Optional[int]]:
+    """
+    (실제 컬렉션 이름, 인덱스 목록, time-series 컬렉션 보관 기간)을 반환한다.
+    time-series 컬렉션은 TTL 인덱스 대신 컬렉션 옵션(expireAfterSeconds)으로 보관 기간을 지정한다.
+    """
+    if not spec.metric_store:
+        return spec.name, spec.indexes, None
+    store = await get_metric_store(spec.name)
+    ttl = _ttl(spec.retention_days)
+    if store.backend == BACKEND_BUCKET:
+        return store.collection_name, [
+            IndexSpec((('instance_name', 1), ('bucket_start', -1)), 'instance_bucket'),
+            IndexSpec((('bucket_start', 1),), 'bucket_start', expire_after_seconds=ttl),
+        ], None
+    if store.backend == BACKEND_TIMESERIES:
+        return store.collection_name, [
+            IndexSpec((('instance_name', 1), ('timestamp', -1)), 'instance_timestamp'),
+        ], ttl
+    return store.collection_name, [
+        IndexSpec((('instance_name', 1), ('timestamp', -1)), 'instance_timestamp'),
+        IndexSpec((('timestamp', 1),), 'timestamp', expire_after_seconds=ttl),
+    ], None
+
+
+def _compare(index: IndexSpec, existing: Dict[str, Dict[str, Any]]) -> Tuple[str, Optional[str], Dict[str, Any]]:
+    """(상태, 기존 인덱스 이름, 차이) 반환. 이름이 달라도 키 구성이 같으면 같은 인덱스로 본다."""
+    for name, info in existing.items():
+        keys = tuple((key, direction if isinstance(direction, str) else int(direction)) for key, direction in info['key'])
+        if keys != index.keys:
+            continue
+        differences = {}
+        if bool(info.get('unique', False)) != index.unique:
+            differences['unique'] = {'expected': index.unique, 'actual': bool(info.get('unique', False))}
+        if info.get('expireAfterSeconds') != index.expire_after_seconds:
+            differences['expireAfterSeconds'] = {
+                'expected': index.expire_after_seconds, 'actual': info.get('expireAfterSeconds')
+            }
+        return ('different' if differences else 'ok'), name, differences
+    return 'missing', None, {}
+
+
+async def _apply_index(collection, index: IndexSpec, status: str, differences: Dict[str, Any]) -> str:
+    if status == 'missing':
+        options = {'name': index.name, 'unique': index.unique}
+        if index.expire_after_seconds is not None:
+            options['expireAfterSeconds'] = index.expire_after_seconds
+        await collection.create_index(list(index.keys), **options)
+        return 'created'
+    # TTL 값만 다르면 인덱스를 다시 만들지 않고 보관 기간만 변경
+    if status == 'different' and set(differences) == {'expireAfterSeconds'} and index.expire_after_seconds is not None:
+        await collection.database.command({
+            'collMod': collection.name,
+            'index': {'keyPattern': dict(index.keys), 'expireAfterSeconds': index.expire_after_seconds},
+        })
+        return 'ttl_updated'
+    return status
+
+
+async def ensure_indexes(collection_names: Optional[Iterable[str]] = None, apply: bool = True) -> List[Dict[str, Any]]:
+    """
+    선언한 인덱스를 확인하고(apply=True이면 생성) 인덱스별 결과를 반환한다.
+    collection_names를 주면 해당 컬렉션(기본 이름 기준)만 처리한다.
+    """
+    db = await MongoDBConnector.get_database()
+    selected = set(collection_names) if collection_names is not None else None
+    report = []
+    for spec in INDEX_SPECS:
+        if not spec.name or (selected is not None and spec.name not in selected):
+            continue
+        try:
+            name, indexes, timeseries_ttl = await _resolve(spec)
+            collection = db[name]
+            existing = await collection.index_information() if name in await db.list_collection_names(
+                filter={'name': name}) else {}
+
+            for index in indexes:
+                status, existing_name, differences = _compare(index, existing)
+                result = status
+                if apply and status != 'ok':
+                    try:
+                        result = await _apply_index(collection, index, status, differences)
+                    except OperationFailure as e:
+                        result = 'failed'
+                        differences = {**differences, 'error': str(e)}
+                report.append({
+                    'collection': name, 'index': index.name, 'existing_index': existing_name,
+                    'status': status, 'result': result, 'differences': differences,
+                })
+
+            if apply and timeseries_ttl is not None:
+                await db.command({'collMod': name, 'expireAfterSeconds': timeseries_ttl})
+        except Exception as e:
+            report.append({'collection': spec.name, 'index': None, 'status': 'error', 'result': 'failed',
+                           'differences': {'error': str(e)}})
+
+    for entry in report:
+        if entry['result'] in ('different', 'failed') or (entry['status'] == 'missing' and not apply):
+            logger.warning(f"Index {entry['collection']}.{entry['index']} is {entry['status']}: {entry['differences']}")
+        elif entry['result'] in ('created', 'ttl_updated'):
+            logger.info(f"Index {entry['collection']}.{entry['index']} {entry['result']}")
+    return report
+
+
+async def main(command: str) -> None:
+    await MongoDBConnector.initialize()
+    try:
+        report = await ensure_indexes(apply=command == 'apply')
+        for entry in report:
+            print(f"{entry['collection']:<40} {str(entry['index']):<32} {entry['status']:<10} {entry['result']}"
+                  f"{'  ' + str(entry['differences']) if entry['differences'] else ''}")
+    finally:
+        await MongoDBConnector.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] in ('check', 'apply'):
+        asyncio.run(main(sys.argv[1]))
+    else:
+        print("usage: python -m modules.index_manager check|apply")
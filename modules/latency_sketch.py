@@ -0,0 +1,80 @@
+"""
+병합 가능한 실행 시간 분포 스케치.
+
+값을 로그 스케일 버킷(상대 오차 RELATIVE_ACCURACY)에 세어 두는 DDSketch 방식의 히스토그램이다.
+버킷별 개수만 더하면 병합되므로 요약 문서에 `sketch.<버킷>` 필드로 두고 $inc로 갱신할 수 있으며,
+임의의 기간/그룹의 분위수(p50/p95/p99)를 원본을 다시 읽지 않고 계산할 수 있다.
+버킷 경계가 RELATIVE_ACCURACY로 정해지므로 저장된 스케치와 호환되도록 값을 바꾸지 않는다.
+"""
+import math
+from typing import Dict, Iterable, List, Mapping, Optional
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+# 0 이하 값(실행 시간 0초 등)은 별도 버킷에 모음
+ZERO_KEY = 'z'
+
+
+def bucket_key(value: float) -> str:
+    if value <= 0:
+        return ZERO_KEY
+    return str(math.ceil(math.log(value) / LOG_GAMMA))
+
+
+def bucket_value(key: str) -> float:
+    """버킷을 대표하는 값. 버킷 안의 어떤 값과도 상대 오차 RELATIVE_ACCURACY 이내이다."""
+    if key == ZERO_KEY:
+        return 0.0
+    return 2 * GAMMA ** int(key) / (GAMMA + 1)
+
+
+def bucket_key_expression(field: str) -> dict:
+    """bucket_key와 같은 버킷 번호를 문자열로 계산하는 MongoDB 집계 식."""
+    return {
+        '$cond': [
+            {'$gt': [f'${field}', 0]},
+            {'$toString': {'$toLong': {'$ceil': {'$divide': [{'$ln': f'${field}'}, LOG_GAMMA]}}}},
+            ZERO_KEY,
+        ]
+    }
+
+
+class LatencySketch:
+    def __init__(self, counts: Optional[Mapping[str, int]] = None):
+        self.counts: Dict[str, int] = {}
+        if counts:
+            self.merge(counts)
+
+    def add(self, value: float, count: int = 1) -> None:
+        key = bucket_key(value)
+        self.counts[key] = self.counts.get(key, 0) + count
+
+    def merge(self, counts: Mapping[str, int]) -> None:
+        for key, count in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + int(count)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def quantiles(self, quantiles: Iterable[float]) -> List[Optional[float]]:
+        total = self.total
+        if not total:
+            return [None for _ in quantiles]
+        ordered = sorted(self.counts.items(), key=lambda item: -math.inf if item[0] == ZERO_KEY else int(item[0]))
+        results = []
+        for quantile in quantiles:
+            rank = quantile * (total - 1)
+            seen = 0
+            value = bucket_value(ordered[-1][0])
+            for key, count in ordered:
+                seen += count
+                if seen > rank:
+                    value = bucket_value(key)
+                    break
+            results.append(round(value, 3))
+        return results
+
+    def quantile(self, quantile: float) -> Optional[float]:
+        return self.quantiles([quantile])[0]
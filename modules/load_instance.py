@@ -1,7 +1,18 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
 import asyncmy
+from pymongo.errors import OperationFailure, PyMongoError
+
 from modules.crypto_utils import decrypt_password
 from modules.mongodb_connector import MongoDBConnector
-from config import MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME
+from config import MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME, INSTANCE_RECONCILE_POLL_INTERVAL, RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+# 단일 서버(레플리카 셋이 아닌 환경)에서 change stream을 열 때 나는 오류
+CHANGE_STREAM_UNSUPPORTED_ERROR = 40573
 
 
 async def load_instances_from_mongodb():
@@ -22,3 +33,78 @@ async def handle_instance(instance, collection, query_instance_and_save_to_db):
         await connection.ensure_closed()
     except Exception as e:
         print(f"Failed to handle instance: {e}")
+
+
+class InstanceWatcher:
+    """
+    인스턴스 목록 컬렉션의 변경을 감지해 on_change(전체 인스턴스 목록)를 호출한다.
+    change stream을 우선 사용하고, 지원하지 않는 환경(단일 서버 등)에서는
+    (_id, updated_at)만 조회하는 가벼운 폴링으로 변경 여부를 확인한다.
+    """
+
+    def __init__(self, on_change: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+                 poll_interval: float = INSTANCE_RECONCILE_POLL_INTERVAL):
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.mode: Optional[str] = None
+
+    async def _reload(self) -> None:
+        instances = await load_instances_from_mongodb()
+        await self.on_change(instances)
+
+    async def watch(self) -> None:
+        while True:
+            try:
+                await self._watch_change_stream()
+            except OperationFailure as e:
+                # 인증 실패, 재개 지점 유실 등 다른 서버 오류는 폴링으로 바꾸지 않고 스트림을 다시 엶
+                if not self._change_stream_unsupported(e):
+                    logger.warning(f"Instance change stream failed: {e}, reopening in {RETRY_DELAY}s")
+                    await asyncio.sleep(RETRY_DELAY)
+                    continue
+                logger.info(f"Change streams are not available ({e}), polling instance list instead")
+                await self._poll()
+            except PyMongoError as e:
+                logger.warning(f"Instance change stream interrupted: {e}, reopening in {RETRY_DELAY}s")
+                await asyncio.sleep(RETRY_DELAY)
+            except Exception as e:
+                logger.error(f"An error occurred while reconciling instances: {e}")
+                await asyncio.sleep(RETRY_DELAY)
+
+    @staticmethod
+    def _change_stream_unsupported(error: OperationFailure) -> bool:
+        return error.code == CHANGE_STREAM_UNSUPPORTED_ERROR or \
+            'only supported on replica sets' in str(error)
+
+    async def _watch_change_stream(self) -> None:
+        mongodb = await MongoDBConnector.get_database()
+        collection = mongodb[MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME]
+        async with collection.watch() as stream:
+            self.mode = 'change_stream'
+            # 스트림을 연 뒤 한 번 다시 읽어 그 사이의 변경을 놓치지 않도록 함
+            await self._reload()
+            async for change in stream:
+                logger.info(f"Instance list changed ({change.get('operationType')}), reconciling")
+                await self._reload()
+
+    @staticmethod
+    async def _version() -> set:
+        mongodb = await MongoDBConnector.get_database()
+        collection = mongodb[MONGODB_RDS_INSTANCE_LIST_COLLATION_NAME]
+        documents = await collection.find({}, {'_id': 1, 'updated_at': 1}).to_list(length=None)
+        return {(str(document['_id']), document.get('updated_at')) for document in documents}
+
+    async def _poll(self) -> None:
+        self.mode = 'poll'
+        version = None
+        while True:
+            try:
+                current_version = await self._version()
+                if current_version != version:
+                    if version is not None:
+                        logger.info("Instance list changed, reconciling")
+                    await self._reload()
+                    version = current_version
+            except Exception as e:
+                logger.warning(f"Failed to poll instance list: {e}")
+            await asyncio.sleep(self.poll_interval)
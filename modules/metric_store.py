@@ -0,0 +1,264 @@
+"""
+수집 지표 저장소.
+
+METRIC_STORAGE_BACKEND 설정에 따라 같은 인터페이스로 아래 세 가지 저장 방식을 지원한다.
+  - document   : 수집 1회당 문서 1건 (기존 방식, 기존 컬렉션 그대로 사용)
+  - timeseries : MongoDB time-series 컬렉션 (<컬렉션>_ts, metaField=instance_name)
+  - bucket     : 인스턴스별 1시간 단위 버킷 문서 (<컬렉션>_hourly), time-series를 쓸 수 없을 때 사용
+
+기존 데이터 이전:
+    python -m modules.metric_store migrate
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+from modules.mongodb_connector import MongoDBConnector
+from config import (
+    METRIC_STORAGE_BACKEND, MONGODB_DISK_USAGE_COLLECTION_NAME, MONGODB_STATUS_COLLECTION_NAME
+)
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DOCUMENT = 'document'
+BACKEND_TIMESERIES = 'timeseries'
+BACKEND_BUCKET = 'bucket'
+
+COLLECTION_SUFFIXES = {BACKEND_DOCUMENT: '', BACKEND_TIMESERIES: '_ts', BACKEND_BUCKET: '_hourly'}
+
+
+def hour_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+class MetricStore:
+    """인스턴스별 지표 문서를 저장/조회한다. 조회 결과는 저장 방식과 관계없이 수집 문서 형태로 돌려준다."""
+
+    def __init__(self, base_name: str, backend: str = METRIC_STORAGE_BACKEND):
+        if backend not in COLLECTION_SUFFIXES:
+            raise ValueError(f"Unknown metric storage backend: {backend}")
+        self.base_name = base_name
+        self.backend = backend
+        self.collection = None
+
+    @property
+    def collection_name(self) -> str:
+        return self.base_name + COLLECTION_SUFFIXES[self.backend]
+
+    async def initialize(self) -> None:
+        db = await MongoDBConnector.get_database()
+        if self.backend == BACKEND_TIMESERIES:
+            try:
+                await self._ensure_timeseries_collection(db)
+            except OperationFailure as e:
+                logger.warning(f"Time-series collections are not available ({e}), "
+                               f"falling back to hourly buckets for {self.base_name}")
+                self.backend = BACKEND_BUCKET
+
+        # 인덱스와 보관 기간은 modules.index_manager에서 저장 방식에 맞춰 생성함
+        self.collection = db[self.collection_name]
+
+    async def _ensure_timeseries_collection(self, db) -> None:
+        name = self.base_name + COLLECTION_SUFFIXES[BACKEND_TIMESERIES]
+        if await db.list_collection_names(filter={'name': name}):
+            return
+        await db.create_collection(
+            name,
+            timeseries={'timeField': 'timestamp', 'metaField': 'instance_name', 'granularity': 'minutes'}
+        )
+        logger.info(f"Created time-series collection {name}")
+
+    def _bucket_update(self, document: Dict[str, Any]) -> UpdateOne:
+        instance_name = document['instance_name']
+        bucket_start = hour_start(document['timestamp'])
+        sample = {key: value for key, value in document.items() if key != 'instance_name'}
+        return UpdateOne(
+            {'_id': f"{instance_name}:{bucket_start.strftime('%Y%m%d%H')}"},
+            {
+                '$setOnInsert': {'instance_name': instance_name, 'bucket_start': bucket_start},
+                '$push': {'samples': sample},
+                '$inc': {'count': 1},
+            },
+            upsert=True
+        )
+
+    async def write(self, document: Dict[str, Any]) -> None:
+        """document에는 instance_name과 timestamp가 있어야 한다."""
+        if self.backend == BACKEND_BUCKET:
+            await self.collection.bulk_write([self._bucket_update(document)])
+        else:
+            await self.collection.insert_one(document)
+
+    async def write_many(self, documents: List[Dict[str, Any]]) -> None:
+        if not documents:
+            return
+        if self.backend == BACKEND_BUCKET:
+            await self.collection.bulk_write([self._bucket_update(document) for document in documents], ordered=False)
+        else:
+            await self.collection.insert_many(documents, ordered=False)
+
+    def pipeline(self, instance_name: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 filters: Optional[Dict[str, Any]] = None, limit: int = 0) -> List[Dict[str, Any]]:
+        """
+        [start, end) 구간의 수집 문서를 최신 순으로 돌려주는 집계 단계 목록.
+        저장 방식과 관계없이 결과는 수집 문서 형태(instance_name, timestamp, ...)이며, 뒤에 단계를 이어 붙일 수 있다.
+        """
+        time_range = {}
+        if start is not None:
+            time_range['$gte'] = start
+        if end is not None:
+            time_range['$lt'] = end
+
+        if self.backend != BACKEND_BUCKET:
+            match = {'instance_name': instance_name, **(filters or {})}
+            if time_range:
+                match['timestamp'] = time_range
+            stages = [{'$match': match}, {'$sort': {'timestamp': -1}}]
+            if limit:
+                stages.append({'$limit': limit})
+            return stages
+
+        # 버킷 단위로 먼저 좁힌 뒤 샘플을 펼쳐 정확한 시간 조건을 적용함
+        bucket_match = {'instance_name': instance_name}
+        if time_range:
+            bucket_match['bucket_start'] = {
+                **({'$gte': hour_start(start)} if start is not None else {}),
+                **({'$lt': end} if end is not None else {}),
+            }
+        sample_match = {f'samples.{key}': value for key, value in (filters or {}).items()}
+        if time_range:
+            sample_match['samples.timestamp'] = time_range
+
+        stages = [
+            {'$match': bucket_match},
+            {'$sort': {'bucket_start': -1}},
+        ]
+        if limit and not sample_match:
+            # 버킷마다 샘플이 1건 이상이므로 최신 버킷 limit개 안에 결과가 모두 있음
+            stages.append({'$limit': limit})
+        stages.append({'$unwind': '$samples'})
+        if sample_match:
+            stages.append({'$match': sample_match})
+        stages.append({'$sort': {'samples.timestamp': -1}})
+        if limit:
+            stages.append({'$limit': limit})
+        stages.append({'$replaceRoot': {'newRoot': {'$mergeObjects': [{'instance_name': '$instance_name'}, '$samples']}}})
+        return stages
+
+    def aggregate(self, stages: List[Dict[str, Any]]):
+        return self.collection.aggregate(stages)
+
+    async def find(self, instance_name: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   limit: int = 0, filters: Optional[Dict[str, Any]] = None,
+                   projection: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """최신 순으로 [start, end) 구간의 수집 문서를 조회한다."""
+        stages = self.pipeline(instance_name, start, end, filters, limit)
+        stages.append({'$project': {'_id': 0, **(projection or {})}})
+        return await self.aggregate(stages).to_list(length=None)
+
+    async def nth_timestamp(self, instance_name: str, start: Optional[datetime], end: Optional[datetime],
+                            n: int) -> Optional[datetime]:
+        """구간 안에서 최신 순으로 n번째(0부터) 문서의 timestamp. 페이지 경계를 정할 때 사용한다."""
+        if self.backend != BACKEND_BUCKET:
+            query = {'instance_name': instance_name}
+            time_range = {**({'$gte': start} if start else {}), **({'$lt': end} if end else {})}
+            if time_range:
+                query['timestamp'] = time_range
+            # (instance_name, timestamp) 인덱스만 읽고 문서는 가져오지 않음
+            documents = await self.collection.find(query, {'_id': 0, 'timestamp': 1}) \
+                .sort('timestamp', -1).skip(n).limit(1).to_list(length=1)
+        else:
+            stages = self.pipeline(instance_name, start, end)
+            stages += [{'$skip': n}, {'$limit': 1}, {'$project': {'_id': 0, 'timestamp': 1}}]
+            documents = await self.aggregate(stages).to_list(length=1)
+        return documents[0]['timestamp'] if documents else None
+
+    async def find_latest(self, instance_name: str, filters: Optional[Dict[str, Any]] = None,
+                          projection: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        documents = await self.find(instance_name, limit=1, filters=filters, projection=projection)
+        return documents[0] if documents else None
+
+    async def migrate_from_documents(self, batch_size: int = 1000) -> int:
+        """
+        기존 문서형 컬렉션의 데이터를 현재 저장 방식으로 옮긴다.
+        인스턴스별로 최신 문서부터 옮기고, 이미 옮겨진 가장 오래된 시각보다 이전 데이터만 대상으로 하므로
+        중간에 끊겨도 다시 실행하면 이어서 진행한다.
+        """
+        if self.backend == BACKEND_DOCUMENT:
+            return 0
+        db = await MongoDBConnector.get_database()
+        source = db[self.base_name]
+        migrated = 0
+        for instance_name in await source.distinct('instance_name'):
+            oldest = await self._oldest_timestamp(instance_name)
+            query = {'instance_name': instance_name}
+            if oldest is not None:
+                query['timestamp'] = {'$lt': oldest}
+            batch = []
+            async for document in source.find(query, {'_id': 0}).sort('timestamp', -1):
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    await self.write_many(batch)
+                    migrated += len(batch)
+                    batch = []
+            if batch:
+                await self.write_many(batch)
+                migrated += len(batch)
+            logger.info(f"Migrated {self.base_name} documents for {instance_name}")
+        return migrated
+
+    async def _oldest_timestamp(self, instance_name: str) -> Optional[datetime]:
+        if self.backend == BACKEND_BUCKET:
+            pipeline = [
+                {'$match': {'instance_name': instance_name}},
+                {'$sort': {'bucket_start': 1}},
+                {'$limit': 1},
+                {'$project': {'oldest': {'$min': '$samples.timestamp'}}},
+            ]
+            documents = await self.collection.aggregate(pipeline).to_list(length=1)
+            return documents[0]['oldest'] if documents else None
+        document = await self.collection.find_one({'instance_name': instance_name}, {'timestamp': 1},
+                                                  sort=[('timestamp', 1)])
+        return document['timestamp'] if document else None
+
+
+_stores: Dict[str, MetricStore] = {}
+_store_lock: Optional[asyncio.Lock] = None
+
+
+async def get_metric_store(base_name: str) -> MetricStore:
+    """컬렉션별 저장소를 한 번만 초기화해 재사용한다."""
+    global _store_lock
+    if _store_lock is None:
+        _store_lock = asyncio.Lock()
+    async with _store_lock:
+        store = _stores.get(base_name)
+        if store is None:
+            store = MetricStore(base_name)
+            await store.initialize()
+            _stores[base_name] = store
+        return store
+
+
+async def migrate() -> None:
+    await MongoDBConnector.initialize()
+    try:
+        for base_name in (MONGODB_DISK_USAGE_COLLECTION_NAME, MONGODB_STATUS_COLLECTION_NAME):
+            store = await get_metric_store(base_name)
+            migrated = await store.migrate_from_documents()
+            print(f"{base_name} -> {store.collection_name}: {migrated} documents migrated")
+    finally:
+        await MongoDBConnector.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == 'migrate':
+        asyncio.run(migrate())
+    else:
+        print("usage: python -m modules.metric_store migrate")
@@ -1,58 +1,90 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
-from config import MONGODB_URI, MONGODB_DB_NAME
+from config import (
+    MONGODB_URI, MONGODB_DB_NAME, MONGODB_HEARTBEAT_INTERVAL, MONGODB_HEARTBEAT_FAILURE_THRESHOLD
+)
 import logging
 
 class MongoDBConnector:
+    """
+    MongoDB 연결 관리.
+    get_database()는 I/O 없이 캐시된 DB 핸들을 돌려주고, 연결 상태는 백그라운드 heartbeat가 확인한다.
+    클라이언트는 교체하지 않는다. Motor가 끊긴 연결을 스스로 다시 맺으므로, 수집기들이 오래 들고 있는
+    컬렉션 핸들(WriteBehindBuffer, MetricStore 등)이 재연결 후에도 그대로 동작한다.
+    """
     client = None
     db = None
+    healthy = False
+    consecutive_failures = 0
+    _heartbeat_task = None
+
+    @classmethod
+    def _create_client(cls):
+        return AsyncIOMotorClient(
+            MONGODB_URI,
+            tls=True,
+            tlsAllowInvalidCertificates=True,
+            tlsAllowInvalidHostnames=True,
+            directConnection=False,
+            serverSelectionTimeoutMS=5000
+        )
 
     @classmethod
     async def initialize(cls):
         if cls.client is None:
             try:
-                cls.client = AsyncIOMotorClient(
-                    MONGODB_URI,
-                    tls=True,
-                    tlsAllowInvalidCertificates=True,
-                    tlsAllowInvalidHostnames=True,
-                    directConnection=False
-                )
+                cls.client = cls._create_client()
                 cls.db = cls.client[MONGODB_DB_NAME]
                 logging.info("MongoDB에 성공적으로 연결되었습니다.")
             except Exception as e:
                 logging.error(f"MongoDB 연결에 실패했습니다: {e}")
                 cls.client = None
+                cls.db = None
+                return
+        cls._start_heartbeat()
 
     @classmethod
     async def get_database(cls):
-        if cls.client is None:
-            await cls._try_connect()
-        try:
-            await cls.client.admin.command('ping')
-        except Exception as e:
-            logging.warning(f"MongoDB 연결 실패: {e}, 연결을 재시도합니다.")
-            await cls._try_connect()
-        cls.db = cls.client[MONGODB_DB_NAME]
+        if cls.db is None:
+            await cls.initialize()
         return cls.db
 
     @classmethod
-    async def _try_connect(cls):
-        try:
-            cls.client = AsyncIOMotorClient(
-                MONGODB_URI,
-                tls=True,
-                tlsAllowInvalidCertificates=True,
-                tlsAllowInvalidHostnames=True,
-                directConnection=False,
-                serverSelectionTimeoutMS=5000
-            )
-        except Exception as e:
-            cls.client = None
-            logging.error(f"MongoDB 재연결 시도 실패: {e}")
+    def _start_heartbeat(cls):
+        if cls._heartbeat_task is None or cls._heartbeat_task.done():
+            cls._heartbeat_task = asyncio.create_task(cls._heartbeat_loop())
+
+    @classmethod
+    async def _heartbeat_loop(cls):
+        while True:
+            try:
+                await cls.client.admin.command('ping')
+                if not cls.healthy:
+                    logging.info("MongoDB heartbeat 정상")
+                cls.healthy = True
+                cls.consecutive_failures = 0
+            except Exception as e:
+                cls.healthy = False
+                cls.consecutive_failures += 1
+                # 재연결은 Motor에 맡기고, 장애가 이어지는 경우에만 오류로 남김
+                log = logging.error if cls.consecutive_failures >= MONGODB_HEARTBEAT_FAILURE_THRESHOLD \
+                    else logging.warning
+                log(f"MongoDB heartbeat 실패 ({cls.consecutive_failures}회): {e}")
+            await asyncio.sleep(MONGODB_HEARTBEAT_INTERVAL)
 
     @classmethod
-    async def reconnect(cls):
+    async def close(cls):
+        if cls._heartbeat_task is not None:
+            cls._heartbeat_task.cancel()
+            try:
+                await cls._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            cls._heartbeat_task = None
+        if cls.client is not None:
+            cls.client.close()
         cls.client = None
-        await cls.initialize()
+        cls.db = None
+        cls.healthy = False
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
\ No newline at end of file
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import asyncmy
+from asyncmy.pool import Pool
+
+from modules.crypto_utils import decrypt_password
+from config import (
+    POOL_SIZE, RETRY_DELAY, MYSQL_POOL_HEALTH_CHECK_INTERVAL, MYSQL_CONNECT_TIMEOUT,
+    MYSQL_POOL_CREATE_CONCURRENCY, CIRCUIT_BREAKER_MAX_DELAY
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    인스턴스별 연결 실패 차단기.
+    실패하면 OPEN 상태로 지수 백오프 시간 동안 연결을 시도하지 않고,
+    대기 시간이 지나면 HALF_OPEN 상태에서 한 번만 시험 연결을 허용한다.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, base_delay: float = RETRY_DELAY, max_delay: float = CIRCUIT_BREAKER_MAX_DELAY):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() >= self.opened_until:
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.last_error = None
+
+    def record_failure(self, error: str) -> None:
+        self.failures += 1
+        self.last_error = error
+        delay = min(self.base_delay * (2 ** (self.failures - 1)), self.max_delay)
+        self.opened_until = time.monotonic() + delay
+        self.state = self.OPEN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in': round(max(self.opened_until - time.monotonic(), 0), 1) if self.state == self.OPEN else 0,
+            'last_error': self.last_error,
+        }
+
+
+class MySQLPoolRegistry:
+    """
+    프로세스 전역 MySQL 연결 풀 레지스트리.
+    인스턴스 이름 기준으로 풀을 처음 요청될 때 만들고, 수집기가 끝나도 닫지 않고 재사용한다.
+    접속 정보나 풀 크기가 바뀌면 풀을 새로 만들고, 주기적으로 ping 하여 끊어진 풀을 정리한다.
+    """
+    pools: Dict[str, Pool] = {}
+    signatures: Dict[str, Tuple] = {}
+    size_overrides: Dict[str, int] = {}
+    locks: Dict[str, asyncio.Lock] = {}
+    breakers: Dict[str, CircuitBreaker] = {}
+    stats: Dict[str, int] = {
+        'pools_created': 0,
+        'pools_closed': 0,
+        'pool_reuses': 0,
+        'acquires': 0,
+        'discarded': 0,
+        'create_failures': 0,
+        'breaker_skips': 0,
+        'health_checks': 0,
+        'health_failures': 0,
+    }
+    _health_task: Optional[asyncio.Task] = None
+    _create_semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def _pool_size(cls, instance: Dict[str, Any]) -> int:
+        return cls.size_overrides.get(instance['instance_name']) or instance.get('pool_size') or POOL_SIZE
+
+    @classmethod
+    def _signature(cls, instance: Dict[str, Any]) -> Tuple:
+        return (
+            instance['host'], instance.get('port', 3306), instance['user'], instance['password'],
+            instance.get('db', ''), cls._pool_size(instance)
+        )
+
+    @classmethod
+    async def get_pool(cls, instance: Dict[str, Any]) -> Optional[Pool]:
+        instance_name = instance['instance_name']
+        signature = cls._signature(instance)
+        pool = cls.pools.get(instance_name)
+        if pool is not None and cls.signatures.get(instance_name) == signature:
+            cls.stats['pool_reuses'] += 1
+            return pool
+
+        lock = cls.locks.setdefault(instance_name, asyncio.Lock())
+        async with lock:
+            pool = cls.pools.get(instance_name)
+            if pool is not None and cls.signatures.get(instance_name) == signature:
+                cls.stats['pool_reuses'] += 1
+                return pool
+            if pool is not None:
+                logger.info(f"Connection settings changed for {instance_name}, recreating pool")
+                await cls.close_pool(instance_name)
+
+            # 차단 중인 인스턴스는 연결을 시도하지 않고 바로 건너뜀
+            breaker = cls.breakers.setdefault(instance_name, CircuitBreaker())
+            if not breaker.allow():
+                cls.stats['breaker_skips'] += 1
+                return None
+
+            pool = await cls._create_pool(instance, breaker)
+            if pool is not None:
+                cls.pools[instance_name] = pool
+                cls.signatures[instance_name] = signature
+            return pool
+
+    @classmethod
+    async def ensure_pools(cls, instances: List[Dict[str, Any]]) -> List[Optional[Pool]]:
+        return await asyncio.gather(*(cls.get_pool(instance) for instance in instances))
+
+    @classmethod
+    async def _create_pool(cls, instance: Dict[str, Any], breaker: CircuitBreaker) -> Optional[Pool]:
+        instance_name = instance['instance_name']
+        if cls._create_semaphore is None:
+            cls._create_semaphore = asyncio.Semaphore(MYSQL_POOL_CREATE_CONCURRENCY)
+
+        succeeded = False
+        error = 'cancelled'
+        try:
+            async with cls._create_semaphore:
+                pool = await asyncmy.create_pool(
+                    host=instance['host'],
+                    port=instance.get('port', 3306),
+                    user=instance['user'],
+                    password=decrypt_password(instance['password']),
+                    db=instance.get('db', ''),
+                    maxsize=cls._pool_size(instance),
+                    connect_timeout=MYSQL_CONNECT_TIMEOUT
+                )
+            succeeded = True
+            cls.stats['pools_created'] += 1
+            logger.info(f"Connection pool created successfully for {instance_name}")
+            return pool
+        except Exception as e:
+            error = str(e)
+            cls.stats['create_failures'] += 1
+            return None
+        finally:
+            if succeeded:
+                breaker.record_success()
+            else:
+                breaker.record_failure(error)
+                logger.error(f"Failed to create pool for {instance_name} (failures: {breaker.failures}), "
+                             f"next attempt in {breaker.to_dict()['retry_in']}s: {error}")
+
+    @classmethod
+    @asynccontextmanager
+    async def acquire(cls, instance: Dict[str, Any]) -> AsyncIterator[Any]:
+        pool = await cls.get_pool(instance)
+        if pool is None:
+            raise ConnectionError(f"No connection pool available for {instance['instance_name']}")
+        async with pool.acquire() as conn:
+            cls.stats['acquires'] += 1
+            try:
+                yield conn
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                # 바깥 wait_for에 취소되었거나 안쪽 wait_for가 시간 초과된 연결은 응답을 다 읽지 않아
+                # 프로토콜 상태를 알 수 없으므로 닫아서 풀로 돌아가도 다시 쓰이지 않게 함
+                conn.close()
+                cls.stats['discarded'] += 1
+                raise
+
+    @classmethod
+    def resize(cls, instance_name: str, maxsize: int) -> None:
+        # asyncmy 풀은 크기 변경을 지원하지 않으므로 다음 get_pool 호출 시 새 크기로 다시 만든다.
+        cls.size_overrides[instance_name] = maxsize
+
+    @classmethod
+    async def close_pool(cls, instance_name: str) -> None:
+        pool = cls.pools.pop(instance_name, None)
+        cls.signatures.pop(instance_name, None)
+        if pool is None:
+            return
+        try:
+            pool.close()
+            await pool.wait_closed()
+            cls.stats['pools_closed'] += 1
+            logger.info(f"Closed connection pool for {instance_name}")
+        except Exception as e:
+            logger.error(f"An error occurred while closing the pool {instance_name}: {e}")
+
+    @classmethod
+    async def remove_instance(cls, instance_name: str) -> None:
+        """모니터링 대상에서 빠진 인스턴스의 풀과 차단기 상태를 모두 정리한다."""
+        await cls.close_pool(instance_name)
+        cls.breakers.pop(instance_name, None)
+        cls.size_overrides.pop(instance_name, None)
+        cls.locks.pop(instance_name, None)
+
+    @classmethod
+    async def close_all(cls) -> None:
+        await cls.stop_health_check()
+        for instance_name in list(cls.pools):
+            await cls.close_pool(instance_name)
+
+    @classmethod
+    async def health_check(cls) -> None:
+        await asyncio.gather(*(
+            cls._check_pool(instance_name, pool) for instance_name, pool in list(cls.pools.items())
+        ))
+
+    @classmethod
+    async def _check_pool(cls, instance_name: str, pool: Pool) -> None:
+        # 모든 연결이 사용 중인 풀은 살아 있는 것으로 보고 건너뜀
+        if pool.freesize == 0 and pool.size >= pool.maxsize:
+            return
+        cls.stats['health_checks'] += 1
+        try:
+            await asyncio.wait_for(cls._ping(pool), timeout=RETRY_DELAY)
+        except Exception as e:
+            cls.stats['health_failures'] += 1
+            logger.warning(f"Health check failed for {instance_name}, dropping pool: {e}")
+            cls.breakers.setdefault(instance_name, CircuitBreaker()).record_failure(str(e) or type(e).__name__)
+            if cls.pools.get(instance_name) is pool:
+                await cls.close_pool(instance_name)
+
+    @staticmethod
+    async def _ping(pool: Pool) -> None:
+        async with pool.acquire() as conn:
+            await conn.ping(reconnect=True)
+
+    @classmethod
+    async def _health_check_loop(cls) -> None:
+        while True:
+            await asyncio.sleep(MYSQL_POOL_HEALTH_CHECK_INTERVAL)
+            try:
+                await cls.health_check()
+            except Exception as e:
+                logger.error(f"An error occurred during pool health check: {e}")
+
+    @classmethod
+    def start_health_check(cls) -> None:
+        if cls._health_task is None or cls._health_task.done():
+            cls._health_task = asyncio.create_task(cls._health_check_loop())
+
+    @classmethod
+    async def stop_health_check(cls) -> None:
+        if cls._health_task is not None:
+            cls._health_task.cancel()
+            try:
+                await cls._health_task
+            except asyncio.CancelledError:
+                pass
+            cls._health_task = None
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        return {
+            **cls.stats,
+            'pools': {
+                instance_name: {'size': pool.size, 'freesize': pool.freesize, 'maxsize': pool.maxsize}
+                for instance_name, pool in cls.pools.items()
+            },
+            'breakers': {instance_name: breaker.to_dict() for instance_name, breaker in cls.breakers.items()},
+        }
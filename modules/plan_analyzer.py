@@ -0,0 +1,68 @@
+"""
+EXPLAIN FORMAT=JSON 특징 추출.
+
+플랜을 저장할 때 한 번만 순회해 색인할 수 있는 평평한 필드(features)를 만든다.
+플랜 검색 API는 이 필드로 MongoDB 안에서 걸러내고 정렬하므로 explain_result 본문을 읽지 않는다.
+추출 규칙을 바꾸면 FEATURE_VERSION을 올리고 `python -m modules.plan_store analyze`로 다시 계산한다.
+"""
+from typing import Any, Dict, List, Optional
+
+FEATURE_VERSION = 1
+FULL_SCAN_ACCESS_TYPE = 'ALL'
+
+
+def _to_number(value: Any) -> Optional[float]:
+    # MySQL 버전에 따라 비용/행 수가 문자열("12.50")로 나옴
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _walk(node: Any, tables: List[Dict[str, Any]], flags: Dict[str, bool]) -> None:
+    if isinstance(node, list):
+        for item in node:
+            _walk(item, tables, flags)
+        return
+    if not isinstance(node, dict):
+        return
+    if 'table_name' in node and 'access_type' in node:
+        tables.append(node)
+    if node.get('using_filesort') is True:
+        flags['using_filesort'] = True
+    if node.get('using_temporary_table') is True:
+        flags['using_temporary'] = True
+    for value in node.values():
+        if isinstance(value, (dict, list)):
+            _walk(value, tables, flags)
+
+
+def analyze_plan(explain_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    테이블(별칭), 접근 방식, 사용 인덱스, 예상 검사 행 수, 쿼리 비용, filesort/임시 테이블 사용 여부를 반환한다.
+    테이블 이름은 EXPLAIN에 나오는 그대로(별칭)이다.
+    """
+    tables: List[Dict[str, Any]] = []
+    flags = {'using_filesort': False, 'using_temporary': False}
+    _walk(explain_result or {}, tables, flags)
+
+    query_block = (explain_result or {}).get('query_block') or {}
+    query_cost = _to_number((query_block.get('cost_info') or {}).get('query_cost'))
+    rows_per_scan = [_to_number(table.get('rows_examined_per_scan')) or 0 for table in tables]
+
+    return {
+        'version': FEATURE_VERSION,
+        'tables': sorted({table['table_name'] for table in tables}),
+        'table_count': len(tables),
+        'access_types': sorted({table['access_type'] for table in tables}),
+        'keys': sorted({table['key'] for table in tables if table.get('key')}),
+        'full_scan_tables': sorted({
+            table['table_name'] for table in tables if table['access_type'] == FULL_SCAN_ACCESS_TYPE
+        }),
+        'has_full_scan': any(table['access_type'] == FULL_SCAN_ACCESS_TYPE for table in tables),
+        'rows_examined': int(sum(rows_per_scan)),
+        'max_rows_examined_per_scan': int(max(rows_per_scan, default=0)),
+        'query_cost': query_cost,
+        'using_filesort': flags['using_filesort'],
+        'using_temporary': flags['using_temporary'],
+    }
@@ -0,0 +1,296 @@
+"""
+슬로우 쿼리 실행 계획 저장소와 플랜 캐시.
+
+  - 플랜 본문: EXPLAIN JSON을 정규화한 SHA-1 해시를 _id로 본문 컬렉션에 한 번만 저장
+  - PID 기록: 기존 플랜 컬렉션에는 (instance, pid) 단위로 쿼리 정보와 plan_hash만 저장
+  - 플랜 캐시: (instance, db, digest) 단위로 마지막 plan_hash와 스키마 서명을 PLAN_CACHE_TTL초 동안 보관
+
+같은 쿼리 형태의 EXPLAIN 요청은 스키마 서명이 같으면 캐시된 플랜으로 처리하고 EXPLAIN을 다시 실행하지 않는다.
+스키마 서명은 해당 db의 테이블 수/최근 CREATE_TIME(DDL)/최근 통계 갱신 시각(mysql.innodb_table_stats)으로 만들며,
+db 안의 어떤 테이블이 바뀌어도 그 db의 캐시가 무효화된다. 다른 db의 테이블을 참조하는 쿼리는 감지하지 못하고 TTL로 만료된다.
+
+화면에서 실행한 EXPLAIN은 source=manual, 수집기가 자동으로 실행한 EXPLAIN은 source=auto로 기록한다.
+본문과 PID 기록에는 검색용 플랜 특징(features, modules.plan_analyzer)을 함께 저장한다.
+
+    python -m modules.plan_store migrate   # 본문을 직접 담고 있는 기존 플랜 문서를 해시 참조로 변환
+    python -m modules.plan_store analyze   # features가 없거나 FEATURE_VERSION이 다른 PID 기록의 특징 재계산
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from modules.mongodb_connector import MongoDBConnector
+from modules.explain_executor import explain_executor, remove_sql_comments
+from modules.response_cache import bump_data_version
+from modules.sql_fingerprint import fingerprint_sql
+from modules.plan_analyzer import analyze_plan, FEATURE_VERSION
+from config import (
+    MONGODB_PLAN_COLLECTION_NAME, MONGODB_PLAN_BODY_COLLECTION_NAME, MONGODB_PLAN_CACHE_COLLECTION_NAME,
+    PLAN_CACHE_TTL, PLAN_SCHEMA_SIGNATURE_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+SOURCE_MANUAL = 'manual'
+SOURCE_AUTO = 'auto'
+MIGRATE_BATCH_SIZE = 500
+
+SCHEMA_SIGNATURE_QUERY = """SELECT COUNT(*) AS table_count, MAX(CREATE_TIME) AS last_created,
+                                   (SELECT MAX(last_update) FROM mysql.innodb_table_stats
+                                    WHERE database_name = %s) AS last_analyzed
+                            FROM information_schema.TABLES
+                            WHERE TABLE_SCHEMA = %s"""
+# mysql.innodb_table_stats 조회 권한이 없으면(ER_TABLEACCESS_DENIED_ERROR) DDL 변경만 감지
+TABLE_ACCESS_DENIED_ERROR = 1142
+# 권한이 추가되었을 수 있으므로 DDL 전용 서명으로 바꾼 인스턴스도 이 시간(초)이 지나면 전체 서명을 다시 시도
+SCHEMA_SIGNATURE_FALLBACK_RETRY = 3600
+SCHEMA_SIGNATURE_FALLBACK_QUERY = """SELECT COUNT(*) AS table_count, MAX(CREATE_TIME) AS last_created
+                                     FROM information_schema.TABLES
+                                     WHERE TABLE_SCHEMA = %s"""
+
+stats = {'hits': 0, 'misses': 0, 'expired': 0, 'schema_changes': 0, 'signature_errors': 0}
+# (instance, db) -> (확인 시각, 서명). 같은 db의 요청이 몰릴 때 서명 조회를 반복하지 않음
+_signatures: Dict[Tuple[str, str], Tuple[float, str]] = {}
+# instance -> DDL 전용 서명으로 바꾼 시각(monotonic)
+_fallback_instances: Dict[str, float] = {}
+
+
+def plan_hash(explain_result: Dict[str, Any]) -> str:
+    canonical = json.dumps(explain_result, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def cache_key(instance_name: str, db_name: Optional[str], digest: str) -> str:
+    return f"{instance_name}|{db_name or ''}|{digest}"
+
+
+async def schema_signature(instance: Dict[str, Any], db_name: Optional[str]) -> Optional[str]:
+    """db의 스키마/통계 서명. 조회에 실패하면 None을 반환하며 이때는 캐시를 쓰지 않는다."""
+    if not db_name:
+        return None
+    instance_name = instance['instance_name']
+    key = (instance_name, db_name)
+    checked = _signatures.get(key)
+    if checked is not None and time.monotonic() - checked[0] < PLAN_SCHEMA_SIGNATURE_TTL:
+        return checked[1]
+
+    fallback_at = _fallback_instances.get(instance_name)
+    if fallback_at is not None and time.monotonic() - fallback_at >= SCHEMA_SIGNATURE_FALLBACK_RETRY:
+        del _fallback_instances[instance_name]
+        fallback_at = None
+
+    try:
+        if fallback_at is not None:
+            rows = await explain_executor.fetch(instance, SCHEMA_SIGNATURE_FALLBACK_QUERY, (db_name,))
+        else:
+            try:
+                rows = await explain_executor.fetch(instance, SCHEMA_SIGNATURE_QUERY, (db_name, db_name))
+            except Exception as e:
+                # 연결 끊김 등 일시적인 오류는 아래에서 이번 조회만 실패로 처리하고, 권한 오류만 DDL 전용으로 바꿈
+                if not e.args or e.args[0] != TABLE_ACCESS_DENIED_ERROR:
+                    raise
+                logger.info(f"Falling back to DDL-only plan cache signature on {instance_name}: {e}")
+                _fallback_instances[instance_name] = time.monotonic()
+                rows = await explain_executor.fetch(instance, SCHEMA_SIGNATURE_FALLBACK_QUERY, (db_name,))
+    except Exception as e:
+        stats['signature_errors'] += 1
+        logger.warning(f"Failed to read schema signature for {instance_name}.{db_name}: {e}")
+        return None
+
+    row = rows[0] if rows else {}
+    signature = f"{row.get('table_count')}|{row.get('last_created')}|{row.get('last_analyzed')}"
+    _signatures[key] = (time.monotonic(), signature)
+    return signature
+
+
+def build_plan_document(slow_query: Dict[str, Any], digest: str, hash_value: str, features: Dict[str, Any],
+                        source: str, cache_hit: bool) -> Dict[str, Any]:
+    """PID 기록. 플랜 본문 대신 plan_hash만 담는다."""
+    return {
+        "pid": slow_query["pid"],
+        "instance": slow_query["instance"],
+        "db": slow_query["db"],
+        "user": slow_query["user"],
+        "time": slow_query["time"],
+        "sql_text": remove_sql_comments(slow_query["sql_text"]),
+        "fingerprint": slow_query.get("fingerprint"),
+        "digest": digest,
+        "plan_hash": hash_value,
+        "features": features,
+        "plan_cached": cache_hit,
+        "source": source,
+        "created_at": datetime.now(timezone.utc)
+    }
+
+
+async def explain_slow_query(instance: Dict[str, Any], slow_query: Dict[str, Any],
+                             source: str) -> Tuple[str, bool]:
+    """
+    슬로우 쿼리 문서의 실행 계획을 캐시 또는 EXPLAIN으로 얻어 PID 기록을 저장하고 (plan_hash, 캐시 적중 여부)를 반환한다.
+    EXPLAIN 실행기 오류(ValueError, ConnectionError, asyncio.TimeoutError)는 그대로 올린다.
+    플랜 컬렉션의 데이터 버전은 호출한 쪽이 올린다(일괄 실행은 끝난 뒤 한 번).
+    """
+    db = await MongoDBConnector.get_database()
+    digest = slow_query.get("digest") or fingerprint_sql(slow_query["sql_text"])[1]
+    key = cache_key(slow_query["instance"], slow_query.get("db"), digest)
+    now = datetime.now(timezone.utc)
+
+    signature = await schema_signature(instance, slow_query.get("db"))
+    cached = await db[MONGODB_PLAN_CACHE_COLLECTION_NAME].find_one({"_id": key})
+    if cached is not None and signature is not None:
+        expires_at = cached["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= now:
+            stats['expired'] += 1
+        elif cached.get("schema_signature") != signature:
+            stats['schema_changes'] += 1
+        else:
+            stats['hits'] += 1
+            features = cached.get("features")
+            if not features or features.get("version") != FEATURE_VERSION:
+                bodies = await load_plan_bodies([cached["plan_hash"]])
+                features = analyze_plan(bodies.get(cached["plan_hash"]))
+            await save_plan(build_plan_document(slow_query, digest, cached["plan_hash"], features, source, True))
+            return cached["plan_hash"], True
+    stats['misses'] += 1
+
+    explain_result = await explain_executor.explain(instance, slow_query["sql_text"], slow_query.get("db"))
+    hash_value = plan_hash(explain_result)
+    features = analyze_plan(explain_result)
+    await db[MONGODB_PLAN_BODY_COLLECTION_NAME].update_one(
+        {"_id": hash_value},
+        {"$setOnInsert": {"explain_result": explain_result, "created_at": now}, "$set": {"features": features}},
+        upsert=True
+    )
+    if signature is not None:
+        await db[MONGODB_PLAN_CACHE_COLLECTION_NAME].replace_one({"_id": key}, {
+            "instance": slow_query["instance"],
+            "db": slow_query.get("db"),
+            "digest": digest,
+            "plan_hash": hash_value,
+            "features": features,
+            "schema_signature": signature,
+            "explained_at": now,
+            "expires_at": now + timedelta(seconds=PLAN_CACHE_TTL),
+        }, upsert=True)
+    await save_plan(build_plan_document(slow_query, digest, hash_value, features, source, False))
+    return hash_value, False
+
+
+async def save_plan(document: Dict[str, Any]) -> None:
+    db = await MongoDBConnector.get_database()
+    await db[MONGODB_PLAN_COLLECTION_NAME].update_one(
+        {"instance": document["instance"], "pid": document["pid"]},
+        {"$set": document, "$unset": {"explain_result": ""}}, upsert=True
+    )
+
+
+async def load_plan_bodies(hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    db = await MongoDBConnector.get_database()
+    cursor = db[MONGODB_PLAN_BODY_COLLECTION_NAME].find({"_id": {"$in": hashes}})
+    return {document["_id"]: document["explain_result"] async for document in cursor}
+
+
+async def attach_plan_bodies(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """PID 기록에 explain_result를 채운다. 본문을 직접 담은 기존 문서는 그대로 둔다."""
+    bodies = await load_plan_bodies(
+        document["plan_hash"] for document in documents
+        if "explain_result" not in document and document.get("plan_hash")
+    )
+    for document in documents:
+        if "explain_result" not in document:
+            document["explain_result"] = bodies.get(document.get("plan_hash"))
+    return documents
+
+
+def get_stats() -> Dict[str, Any]:
+    return {**stats, 'cached_signatures': len(_signatures)}
+
+
+async def migrate_inline_plans() -> int:
+    """explain_result를 직접 담은 플랜 문서를 본문 컬렉션 참조로 바꾸고 변환한 문서 수를 반환한다."""
+    db = await MongoDBConnector.get_database()
+    plans = db[MONGODB_PLAN_COLLECTION_NAME]
+    bodies = db[MONGODB_PLAN_BODY_COLLECTION_NAME]
+    migrated = 0
+    while True:
+        batch = await plans.find({"explain_result": {"$exists": True}}).limit(MIGRATE_BATCH_SIZE).to_list(length=None)
+        if not batch:
+            return migrated
+        body_operations, plan_operations = {}, []
+        for document in batch:
+            hash_value = plan_hash(document["explain_result"])
+            features = analyze_plan(document["explain_result"])
+            body_operations[hash_value] = UpdateOne(
+                {"_id": hash_value},
+                {"$setOnInsert": {"explain_result": document["explain_result"],
+                                  "created_at": document.get("created_at") or datetime.now(timezone.utc)},
+                 "$set": {"features": features}},
+                upsert=True
+            )
+            plan_operations.append(UpdateOne(
+                {"_id": document["_id"]},
+                {"$set": {"plan_hash": hash_value, "features": features}, "$unset": {"explain_result": ""}}
+            ))
+        await bodies.bulk_write(list(body_operations.values()), ordered=False)
+        await plans.bulk_write(plan_operations, ordered=False)
+        migrated += len(batch)
+        logger.info(f"Migrated {migrated} plan documents")
+
+
+async def analyze_plans() -> int:
+    """features가 없거나 FEATURE_VERSION이 다른 PID 기록(과 본문)의 특징을 다시 계산하고 처리한 문서 수를 반환한다."""
+    db = await MongoDBConnector.get_database()
+    plans = db[MONGODB_PLAN_COLLECTION_NAME]
+    bodies = db[MONGODB_PLAN_BODY_COLLECTION_NAME]
+    query = {"plan_hash": {"$exists": True}, "features.version": {"$ne": FEATURE_VERSION}}
+    analyzed = 0
+    while True:
+        batch = await plans.find(query, {"plan_hash": 1}).limit(MIGRATE_BATCH_SIZE).to_list(length=None)
+        if not batch:
+            return analyzed
+        # 본문이 없는 기록도 빈 특징으로 버전을 맞춰 다시 처리하지 않음
+        explain_results = await load_plan_bodies(document["plan_hash"] for document in batch)
+        features = {hash_value: analyze_plan(body) for hash_value, body in explain_results.items()}
+        if features:
+            await bodies.bulk_write([
+                UpdateOne({"_id": hash_value}, {"$set": {"features": value}}) for hash_value, value in features.items()
+            ], ordered=False)
+        await plans.bulk_write([
+            UpdateOne({"_id": document["_id"]},
+                      {"$set": {"features": features.get(document["plan_hash"]) or analyze_plan(None)}})
+            for document in batch
+        ], ordered=False)
+        analyzed += len(batch)
+        logger.info(f"Analyzed {analyzed} plan documents")
+
+
+async def main(command: str) -> None:
+    await MongoDBConnector.initialize()
+    try:
+        if command == 'migrate':
+            print(f"Migrated {await migrate_inline_plans()} plan documents")
+        else:
+            print(f"Analyzed {await analyze_plans()} plan documents")
+        await bump_data_version(MONGODB_PLAN_COLLECTION_NAME)
+    finally:
+        await MongoDBConnector.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] in ('migrate', 'analyze'):
+        asyncio.run(main(sys.argv[1]))
+    else:
+        print("usage: python -m modules.plan_store migrate|analyze")
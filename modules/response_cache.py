@@ -0,0 +1,226 @@
+"""
+읽기 API 응답 캐시.
+
+Grafana 패널 새로고침마다 MongoDB를 직접 읽지 않도록 라우트 응답을 프로세스 메모리에 보관한다.
+  - 라우트별 TTL, 최대 RESPONSE_CACHE_MAX_ENTRIES개 LRU
+  - 같은 키 요청이 동시에 들어오면 한 번만 읽고 결과를 나눠 가짐(single-flight)
+  - 수집기는 데이터를 쓴 뒤 bump_data_version()으로 데이터 버전 컬렉션의 버전을 올리고,
+    API 프로세스는 DATA_VERSION_POLL_INTERVAL초마다 버전을 확인해 바뀐 소스의 캐시만 비움
+
+캐시 키는 라우트와 인자로 만들며, Grafana $__from/$__to(epoch ms)는 TTL 단위로 내림해
+새로고침마다 바뀌는 시각 때문에 캐시가 적중하지 않는 것을 막는다.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from modules.mongodb_connector import MongoDBConnector
+from config import (
+    MONGODB_DATA_VERSION_COLLECTION_NAME, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_DEFAULT_TTL, DATA_VERSION_POLL_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+# 소스별로 마지막에 데이터 버전을 올린 시각(monotonic)
+_last_bumped: Dict[str, float] = {}
+
+# TTL 단위로 내림해 키를 만드는 Grafana 시각 인자(라우트 함수의 인자 이름)
+TIME_PARAMS = ('start', 'end')
+
+
+class CacheEntry:
+    __slots__ = ('value', 'expires_at', 'sources')
+
+    def __init__(self, value: Any, expires_at: float, sources: Tuple[str, ...]):
+        self.value = value
+        self.expires_at = expires_at
+        self.sources = sources
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self.inflight: Dict[str, asyncio.Task] = {}
+        # 소스(컬렉션 기본 이름)별 마지막으로 확인한 데이터 버전
+        self.versions: Dict[str, int] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'expired': 0, 'evictions': 0,
+                      'invalidations': 0, 'stale_discards': 0, 'errors': 0, 'version_poll_errors': 0}
+        self.route_stats: Dict[str, Dict[str, int]] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def _count(self, route: str, name: str) -> None:
+        self.stats[name] += 1
+        route_stats = self.route_stats.setdefault(route, {'hits': 0, 'misses': 0, 'coalesced': 0})
+        if name in route_stats:
+            route_stats[name] += 1
+
+    def _versions_of(self, sources: Iterable[str]) -> Tuple[Optional[int], ...]:
+        return tuple(self.versions.get(source) for source in sources)
+
+    async def get_or_load(self, route: str, key: str, ttl: float, sources: Tuple[str, ...],
+                          loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self._count(route, 'hits')
+                return entry.value
+            del self.entries[key]
+            self.stats['expired'] += 1
+
+        task = self.inflight.get(key)
+        if task is None:
+            self._count(route, 'misses')
+            # 처음 요청한 클라이언트가 끊겨도 기다리는 다른 요청이 결과를 받도록 별도 태스크로 읽음
+            task = asyncio.ensure_future(self._load(key, ttl, sources, loader))
+            self.inflight[key] = task
+            task.add_done_callback(lambda done: self._load_done(key, done))
+        else:
+            self._count(route, 'coalesced')
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, ttl: float, sources: Tuple[str, ...],
+                    loader: Callable[[], Awaitable[Any]]) -> Any:
+        versions = self._versions_of(sources)
+        value = await loader()
+        # 읽는 동안 소스가 갱신됐으면 이전 데이터일 수 있으므로 응답만 하고 저장하지 않음
+        if self._versions_of(sources) != versions:
+            self.stats['stale_discards'] += 1
+            return value
+        self.entries[key] = CacheEntry(value, time.monotonic() + ttl, sources)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+        return value
+
+    def _load_done(self, key: str, task: asyncio.Task) -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        # 기다리던 요청이 모두 취소된 경우에도 예외가 처리되지 않았다는 경고가 남지 않도록 확인
+        if not task.cancelled() and task.exception() is not None:
+            self.stats['errors'] += 1
+
+    def invalidate(self, source: str) -> int:
+        keys = [key for key, entry in self.entries.items() if source in entry.sources]
+        for key in keys:
+            del self.entries[key]
+        self.stats['invalidations'] += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def apply_versions(self, versions: Dict[str, int]) -> None:
+        for source, version in versions.items():
+            if self.versions.get(source) != version:
+                self.versions[source] = version
+                removed = self.invalidate(source)
+                if removed:
+                    logger.debug(f"Invalidated {removed} cached responses for {source} (version {version})")
+
+    async def poll_versions(self) -> None:
+        db = await MongoDBConnector.get_database()
+        cursor = db[MONGODB_DATA_VERSION_COLLECTION_NAME].find({}, {'version': 1})
+        self.apply_versions({document['_id']: document.get('version', 0) async for document in cursor})
+
+    async def _watch_versions(self) -> None:
+        while True:
+            try:
+                await self.poll_versions()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['version_poll_errors'] += 1
+                # 버전을 확인하지 못하는 동안에는 오래된 응답이 남지 않도록 캐시를 비움
+                self.clear()
+                logger.warning(f"Failed to poll data versions, response cache cleared: {e}")
+            await asyncio.sleep(DATA_VERSION_POLL_INTERVAL)
+
+    def start(self) -> None:
+        if RESPONSE_CACHE_ENABLED and (self._watch_task is None or self._watch_task.done()):
+            self._watch_task = asyncio.create_task(self._watch_versions())
+
+    async def stop(self) -> None:
+        if self._watch_task:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+        self.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+        return {
+            'enabled': RESPONSE_CACHE_ENABLED,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'inflight': len(self.inflight),
+            'hit_ratio': round((self.stats['hits'] + self.stats['coalesced']) / lookups, 4) if lookups else None,
+            **self.stats,
+            'routes': {route: dict(stats) for route, stats in self.route_stats.items()},
+            'versions': dict(self.versions),
+        }
+
+
+response_cache = ResponseCache()
+
+
+def _key_value(name: str, value: Any, ttl: float) -> Any:
+    if name in TIME_PARAMS and isinstance(value, str) and value.isdigit():
+        return int(value) // int(max(ttl, 1) * 1000)
+    return value
+
+
+def cached(*sources: str, ttl: float = RESPONSE_CACHE_DEFAULT_TTL):
+    """
+    읽기 라우트 응답을 캐시한다. sources는 응답이 읽는 컬렉션 기본 이름으로, 해당 데이터 버전이 바뀌면 비워진다.
+    FastAPI가 인자를 키워드로 넘기므로 키워드 인자만 키에 반영한다. StreamingResponse를 반환하는 라우트에는 쓰지 않는다.
+    """
+    sources = tuple(source for source in sources if source)
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        route = f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not RESPONSE_CACHE_ENABLED:
+                return await func(*args, **kwargs)
+            key = route + repr(sorted((name, _key_value(name, value, ttl)) for name, value in kwargs.items()))
+            return await response_cache.get_or_load(route, key, ttl, sources, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+async def bump_data_version(*sources: str, min_interval: float = 0) -> None:
+    """
+    수집기/쓰기 API가 데이터를 저장한 뒤 호출한다. 실패해도 수집에는 영향을 주지 않으며 캐시는 TTL로 만료된다.
+    같은 프로세스의 캐시는 바로 비운다.
+    min_interval초 안에 이미 올린 소스는 건너뛴다. 자주 쓰는 소스가 캐시를 계속 비우지 않게 하기 위함이며,
+    그 사이의 변경은 캐시 항목의 TTL이 지나면 반영된다.
+    """
+    now_monotonic = time.monotonic()
+    sources = tuple(
+        source for source in sources
+        if source and (source not in _last_bumped or now_monotonic - _last_bumped[source] >= min_interval)
+    )
+    if not sources:
+        return
+    for source in sources:
+        response_cache.invalidate(source)
+    try:
+        db = await MongoDBConnector.get_database()
+        collection = db[MONGODB_DATA_VERSION_COLLECTION_NAME]
+        now = datetime.now(timezone.utc)
+        for source in sources:
+            await collection.update_one({'_id': source}, {'$inc': {'version': 1}, '$set': {'updated_at': now}},
+                                        upsert=True)
+            # 실제로 올린 소스만 기록해, 실패한 소스는 다음 호출에서 바로 다시 시도함
+            _last_bumped[source] = now_monotonic
+    except Exception as e:
+        logger.warning(f"Failed to bump data version for {sources}: {e}")
@@ -0,0 +1,201 @@
+"""
+슬로우 쿼리 일별 요약.
+
+(KST 일자, instance, db, user, digest) 단위로 건수/총 실행 시간/최대 실행 시간과
+실행 시간 분포 스케치(modules.latency_sketch, `sketch.<버킷>` 필드)를 유지한다.
+수집기는 새로 저장된 슬로우 쿼리만 $inc/$max로 반영하고, 통계 API는 원본 컬렉션 대신 요약 문서를 읽는다.
+요약이 원본과 어긋난 경우(수집기 중단 중 반영 실패, 기존 데이터 등) 원본에서 다시 만든다.
+
+    python -m modules.slow_query_summary rebuild [days]   # 최근 days일(기본 전체) 재계산
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from modules.mongodb_connector import MongoDBConnector
+from modules.latency_sketch import bucket_key, bucket_key_expression
+from modules.response_cache import bump_data_version
+from config import (
+    MONGODB_SLOWLOG_COLLECTION_NAME, MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME, DATA_VERSION_BUMP_MIN_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+KST = timezone(timedelta(hours=9))
+KST_TIMEZONE = 'Asia/Seoul'
+
+
+def kst_day(timestamp: datetime) -> Tuple[str, datetime]:
+    """(YYYY-MM-DD, 해당 KST 자정의 UTC 시각). 시간대가 없는 값은 UTC로 본다."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    local = timestamp.astimezone(KST)
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.strftime('%Y-%m-%d'), midnight.astimezone(timezone.utc)
+
+
+def summary_id(day: str, instance: str, db: Optional[str], user: Optional[str], digest: Optional[str]) -> str:
+    return f"{day}|{instance}|{db or ''}|{user or ''}|{digest or ''}"
+
+
+class SlowQuerySummary:
+    """새로 저장된 슬로우 쿼리 문서를 일별 요약 컬렉션에 누적한다."""
+
+    def __init__(self, collection: Any):
+        self.collection = collection
+        self.stats = {'applied': 0, 'upserts': 0, 'errors': 0}
+
+    def build_updates(self, documents: Iterable[Dict[str, Any]]) -> List[UpdateOne]:
+        groups: Dict[str, Dict[str, Any]] = {}
+        for document in documents:
+            day, day_start = kst_day(document['start'])
+            key = summary_id(day, document['instance'], document.get('db'), document.get('user'),
+                             document.get('digest'))
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    'fields': {
+                        'day': day_start,
+                        'instance': document['instance'],
+                        'db': document.get('db'),
+                        'user': document.get('user'),
+                        'digest': document.get('digest'),
+                    },
+                    'fingerprint': document.get('fingerprint'),
+                    'count': 0,
+                    'total_time': 0,
+                    'max_time': 0,
+                    'sketch': {},
+                }
+            time = document.get('time') or 0
+            group['count'] += 1
+            group['total_time'] += time
+            group['max_time'] = max(group['max_time'], time)
+            sketch_key = f'sketch.{bucket_key(time)}'
+            group['sketch'][sketch_key] = group['sketch'].get(sketch_key, 0) + 1
+
+        return [
+            UpdateOne(
+                {'_id': key},
+                {
+                    '$setOnInsert': {**group['fields'], 'fingerprint': group['fingerprint']},
+                    '$inc': {'count': group['count'], 'total_time': group['total_time'], **group['sketch']},
+                    '$max': {'max_time': group['max_time']},
+                },
+                upsert=True
+            )
+            for key, group in groups.items()
+        ]
+
+    async def apply(self, documents: List[Dict[str, Any]]) -> None:
+        """WriteBehindBuffer가 실제로 저장한 문서만 넘겨주므로 중복 반영되지 않는다."""
+        if not documents:
+            return
+        updates = self.build_updates(documents)
+        # 원본 문서는 이미 저장되었으므로 요약 반영에 실패해도 원본 컬렉션의 버전은 올림
+        sources = [MONGODB_SLOWLOG_COLLECTION_NAME]
+        try:
+            await self.collection.bulk_write(updates, ordered=False)
+            self.stats['applied'] += len(documents)
+            self.stats['upserts'] += len(updates)
+            sources.append(MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Failed to update slow query summary for {len(documents)} queries "
+                         f"(run 'python -m modules.slow_query_summary rebuild' to repair): {e}")
+        await bump_data_version(*sources, min_interval=DATA_VERSION_BUMP_MIN_INTERVAL)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+def rebuild_pipeline(since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """원본 컬렉션에서 요약 문서를 다시 계산해 $merge로 덮어쓰는 집계 파이프라인."""
+    day = {'$dateToString': {'date': '$start', 'format': '%Y-%m-%d', 'timezone': KST_TIMEZONE}}
+    pipeline = []
+    if since is not None:
+        pipeline.append({'$match': {'start': {'$gte': since}}})
+    pipeline += [
+        # 스케치 버킷별로 먼저 센 뒤 요약 키 단위로 다시 묶어 {버킷: 개수} 객체를 만듦
+        {'$group': {
+            '_id': {
+                'day': day,
+                'instance': '$instance',
+                'db': '$db',
+                'user': '$user',
+                'digest': '$digest',
+                'bucket': bucket_key_expression('time'),
+            },
+            'fingerprint': {'$first': '$fingerprint'},
+            'count': {'$sum': 1},
+            'total_time': {'$sum': '$time'},
+            'max_time': {'$max': '$time'},
+        }},
+        {'$group': {
+            '_id': {
+                'day': '$_id.day',
+                'instance': '$_id.instance',
+                'db': '$_id.db',
+                'user': '$_id.user',
+                'digest': '$_id.digest',
+            },
+            'fingerprint': {'$first': '$fingerprint'},
+            'count': {'$sum': '$count'},
+            'total_time': {'$sum': '$total_time'},
+            'max_time': {'$max': '$max_time'},
+            'sketch': {'$push': {'k': '$_id.bucket', 'v': '$count'}},
+        }},
+        {'$project': {
+            '_id': {'$concat': [
+                '$_id.day', '|', '$_id.instance', '|', {'$ifNull': ['$_id.db', '']}, '|',
+                {'$ifNull': ['$_id.user', '']}, '|', {'$ifNull': ['$_id.digest', '']},
+            ]},
+            'day': {'$dateFromString': {'dateString': '$_id.day', 'format': '%Y-%m-%d', 'timezone': KST_TIMEZONE}},
+            'instance': '$_id.instance',
+            'db': '$_id.db',
+            'user': '$_id.user',
+            'digest': '$_id.digest',
+            'fingerprint': 1,
+            'count': 1,
+            'total_time': 1,
+            'max_time': 1,
+            'sketch': {'$arrayToObject': '$sketch'},
+        }},
+        {'$merge': {'into': MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME, 'on': '_id',
+                    'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ]
+    return pipeline
+
+
+async def rebuild(days: Optional[int] = None) -> None:
+    """
+    최근 days일(KST 자정 기준) 또는 전체 요약을 원본에서 다시 만든다.
+    원본에 더 이상 없는 요약 문서(보관 기간 만료 등)는 지우지 않는다.
+    """
+    db = await MongoDBConnector.get_database()
+    since = None
+    if days is not None:
+        _, since = kst_day(datetime.now(timezone.utc) - timedelta(days=days - 1))
+    await db[MONGODB_SLOWLOG_COLLECTION_NAME].aggregate(rebuild_pipeline(since)).to_list(length=None)
+    await bump_data_version(MONGODB_SLOWLOG_SUMMARY_COLLECTION_NAME)
+    logger.info(f"Rebuilt slow query summary{f' since {since}' if since else ''}")
+
+
+async def main(days: Optional[int]) -> None:
+    await MongoDBConnector.initialize()
+    try:
+        await rebuild(days)
+    finally:
+        await MongoDBConnector.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        asyncio.run(main(int(sys.argv[2]) if len(sys.argv) > 2 else None))
+    else:
+        print("usage: python -m modules.slow_query_summary rebuild [days]")
@@ -0,0 +1,60 @@
+import re
+import hashlib
+from functools import lru_cache
+from typing import Tuple
+
+from config import SQL_FINGERPRINT_CACHE_SIZE
+
+# 같은 문장이 실행되는 동안 매 초 다시 수집되므로 패턴은 미리 컴파일해 두고 결과는 원문 기준으로 캐시한다.
+# 주석, 문자열 리터럴, 백쿼트 식별자를 왼쪽부터 한 번에 토큰으로 잘라야
+# 리터럴/식별자 안의 `#`, `-- `, `/*`가 주석으로 잘못 해석되지 않는다.
+_TOKEN = re.compile(
+    r"(?P<comment>/\*.*?\*/|(?:--\s|#)[^\n]*)"
+    r"|(?P<identifier>`(?:[^`]|``)*`)"
+    r"|(?P<literal>\bx'[0-9a-f]*'|'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\")",
+    re.DOTALL
+)
+_HEX_LITERAL = re.compile(r'\b0x[0-9a-f]+')
+_NUMBER_LITERAL = re.compile(r'(?<![\w`.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b')
+_IN_LIST = re.compile(r'\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_VALUES_LIST = re.compile(r'\bvalues?\s*\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*')
+_WHITESPACE = re.compile(r'\s+')
+# 리터럴 치환이 끝날 때까지 식별자를 숨겨 두는 자리표시자 (MySQL에서 빈 식별자는 쓸 수 없음)
+_IDENTIFIER_PLACEHOLDER = '``'
+
+
+def normalize_sql(sql_text: str) -> str:
+    """리터럴, IN/VALUES 목록, 주석을 제거해 쿼리 형태(fingerprint)만 남긴다."""
+    # 먼저 소문자로 바꿔 대소문자 무시 매칭을 피하고, 해당 문자가 없는 패턴은 건너뛴다.
+    normalized = sql_text.lower()
+    identifiers = []
+    if any(char in normalized for char in "/-#`'\""):
+        def replace_token(match: re.Match) -> str:
+            if match.lastgroup == 'comment':
+                return ' '
+            if match.lastgroup == 'literal':
+                return '?'
+            identifiers.append(match.group())
+            return _IDENTIFIER_PLACEHOLDER
+
+        normalized = _TOKEN.sub(replace_token, normalized)
+    if '0x' in normalized:
+        normalized = _HEX_LITERAL.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    if 'in' in normalized:
+        normalized = _IN_LIST.sub('in (?+)', normalized)
+    if 'value' in normalized:
+        normalized = _VALUES_LIST.sub('values (?+)', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    if identifiers:
+        parts = normalized.split(_IDENTIFIER_PLACEHOLDER)
+        normalized = ''.join(part + identifier for part, identifier in zip(parts, identifiers + ['']))
+    return normalized
+
+
+@lru_cache(maxsize=SQL_FINGERPRINT_CACHE_SIZE)
+def fingerprint_sql(sql_text: str) -> Tuple[str, str]:
+    """(fingerprint, digest) 반환. digest는 fingerprint의 SHA-1 해시."""
+    fingerprint = normalize_sql(sql_text)
+    digest = hashlib.sha1(fingerprint.encode('utf-8', 'ignore')).hexdigest()
+    return fingerprint, digest
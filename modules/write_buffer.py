@@ -0,0 +1,169 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+# 문서 자체 문제로 보이는 실패(크기 초과, 검증 실패 등)를 다시 시도하는 최대 횟수
+DEFAULT_MAX_RETRIES = 3
+
+
+class WriteBehindBuffer:
+    """
+    수집된 문서를 메모리에 모아 두었다가 크기 또는 시간 조건이 충족되면
+    unordered insert_many 한 번으로 MongoDB에 기록하는 버퍼.
+    중복 키 에러(11000)는 이미 저장된 문서로 간주하고 무시한다.
+    연결 장애는 횟수 제한 없이 다시 시도하고, 그 밖의 실패는 문서마다 max_retries번까지만 다시 시도한 뒤 버린다.
+    on_flushed를 주면 flush마다 새로 저장된 문서만 넘겨 파생 데이터(요약 등)를 갱신할 수 있다.
+    """
+
+    def __init__(self, collection: Any, batch_size: int = 100, flush_interval: float = 5.0,
+                 max_buffer_size: int = 10000,
+                 on_flushed: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        self.collection = collection
+        self.on_flushed = on_flushed
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer_size = max_buffer_size
+        self.max_retries = max_retries
+        # (문서, 실패 횟수). 가득 차면 deque가 가장 오래된 항목을 버림
+        self.buffer: Deque[Tuple[Dict[str, Any], int]] = deque(maxlen=max_buffer_size)
+        self.stats: Dict[str, Any] = {
+            'flush_count': 0,
+            'inserted': 0,
+            'duplicates': 0,
+            'dropped': 0,
+            'discarded': 0,
+            'errors': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_latency_ms': 0.0,
+            'max_flush_latency_ms': 0.0,
+            'total_flush_latency_ms': 0.0,
+        }
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, document: Dict[str, Any]) -> None:
+        if len(self.buffer) >= self.max_buffer_size:
+            # MongoDB 장애가 길어져 버퍼가 가득 찬 경우 append가 가장 오래된 문서를 버린다.
+            self.stats['dropped'] += 1
+        self.buffer.append((document, 0))
+        if len(self.buffer) >= self.batch_size:
+            self._flush_event.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
+    async def flush(self) -> List[Dict[str, Any]]:
+        """버퍼를 비우고 실제로 새로 저장된 문서 목록을 반환한다."""
+        async with self._flush_lock:
+            if not self.buffer:
+                return []
+
+            # 실패했던 문서는 다른 문서와 함께 다시 실패하지 않도록 한 건씩 저장
+            size = 1 if self.buffer[0][1] else min(self.batch_size, len(self.buffer))
+            entries = [self.buffer.popleft() for _ in range(size)]
+            batch = [document for document, _ in entries]
+            if self.buffer:
+                self._flush_event.set()
+
+            started = time.perf_counter()
+            failed_indexes = set()
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                retry = []
+                for error in e.details.get('writeErrors', []):
+                    failed_indexes.add(error['index'])
+                    if error.get('code') == DUPLICATE_KEY_ERROR:
+                        self.stats['duplicates'] += 1
+                    else:
+                        self.stats['errors'] += 1
+                        retry.append(entries[error['index']])
+                if retry:
+                    logger.error(f"Failed to insert {len(retry)} documents: {e.details.get('writeErrors', [])[:1]}")
+                    self._requeue(retry, count_failure=True)
+            except ConnectionFailure as e:
+                self.stats['errors'] += 1
+                logger.error(f"Failed to flush {len(batch)} documents, will retry: {e}")
+                self._requeue(entries, count_failure=False)
+                return []
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Failed to flush {len(batch)} documents: {e}")
+                self._requeue(entries, count_failure=True)
+                return []
+            finally:
+                latency_ms = (time.perf_counter() - started) * 1000
+                self.stats['flush_count'] += 1
+                self.stats['last_batch_size'] = len(batch)
+                self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+                self.stats['last_flush_latency_ms'] = round(latency_ms, 3)
+                self.stats['max_flush_latency_ms'] = max(self.stats['max_flush_latency_ms'], round(latency_ms, 3))
+                self.stats['total_flush_latency_ms'] += latency_ms
+
+            inserted = [doc for idx, doc in enumerate(batch) if idx not in failed_indexes]
+            self.stats['inserted'] += len(inserted)
+            logger.debug(f"Flushed {len(inserted)}/{len(batch)} documents in {latency_ms:.1f} ms")
+            if self.on_flushed is not None and inserted:
+                try:
+                    await self.on_flushed(inserted)
+                except Exception as e:
+                    logger.error(f"on_flushed callback failed for {len(inserted)} documents: {e}")
+            return inserted
+
+    def _requeue(self, entries: List[Tuple[Dict[str, Any], int]], count_failure: bool) -> None:
+        if count_failure:
+            retry = [(document, failures + 1) for document, failures in entries if failures < self.max_retries]
+            if len(retry) < len(entries):
+                self.stats['discarded'] += len(entries) - len(retry)
+                logger.error(f"Discarding {len(entries) - len(retry)} documents after "
+                             f"{self.max_retries + 1} failed attempts")
+            entries = retry
+        room = self.max_buffer_size - len(self.buffer)
+        if room < len(entries):
+            self.stats['dropped'] += len(entries) - max(room, 0)
+            entries = entries[:max(room, 0)]
+        # 맨 앞으로 되돌리되 원래 순서를 유지
+        self.buffer.extendleft(reversed(entries))
+
+    def get_stats(self) -> Dict[str, Any]:
+        flush_count = self.stats['flush_count']
+        return {
+            **self.stats,
+            'pending': len(self.buffer),
+            'avg_flush_latency_ms': round(self.stats['total_flush_latency_ms'] / flush_count, 3) if flush_count else 0.0,
+        }
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self.buffer:
+            pending = len(self.buffer)
+            await self.flush()
+            if len(self.buffer) >= pending:
+                logger.error(f"Could not flush {len(self.buffer)} pending documents on shutdown")
+                break
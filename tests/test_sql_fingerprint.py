@@ -0,0 +1,36 @@
+from modules.sql_fingerprint import normalize_sql, fingerprint_sql
+
+
+def test_hash_inside_string_literal_is_not_a_comment():
+    assert normalize_sql("SELECT * FROM t WHERE tag = '#foo' AND id = 1") == \
+        "select * from t where tag = ? and id = ?"
+
+
+def test_dash_comment_marker_inside_string_literal_is_not_a_comment():
+    assert normalize_sql("SELECT * FROM t WHERE note = '-- x' AND id = 1") == \
+        "select * from t where note = ? and id = ?"
+
+
+def test_comment_markers_inside_backquoted_identifier_are_kept():
+    assert normalize_sql("SELECT `col#1`, `a-- b` FROM t WHERE id = 1") == \
+        "select `col#1`, `a-- b` from t where id = ?"
+
+
+def test_comments_are_removed():
+    assert normalize_sql("SELECT /* hint */ a FROM t # trailing\nWHERE id = 1 -- done") == \
+        "select a from t where id = ?"
+
+
+def test_comment_containing_quote_does_not_swallow_query():
+    assert normalize_sql("SELECT a FROM t -- don't\nWHERE id = 1") == "select a from t where id = ?"
+
+
+def test_literals_and_lists_are_normalized():
+    assert normalize_sql("SELECT * FROM t WHERE a IN (1, 2, 3) AND b = x'0a' AND c = 0xff AND d = \"s\"") == \
+        "select * from t where a in (?+) and b = ? and c = ? and d = ?"
+
+
+def test_different_shapes_get_different_digests():
+    first = fingerprint_sql("SELECT * FROM t WHERE tag = '#foo' AND id = 1")[1]
+    second = fingerprint_sql("SELECT * FROM t WHERE tag = '#bar' AND name = 'x'")[1]
+    assert first != second